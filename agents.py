@@ -1,104 +1,313 @@
-from crewai import Agent, Task, Crew, LLM
-from analyzer import research_competitors, analyze_trends, find_content_gaps
+from pipeline import Stage, current_stage, run_pipeline
+from cache import get_report_cache, make_cache_key, normalize_text
+from tracing import Trace, new_run_id, start_trace
+from compaction import CONTEXT_BUDGETS, compact_context, context_budget
+from routing import STAGE_ROUTES, over_budget, stage_budget, stage_route, validate
+from checkpoints import content_hash, get_checkpoint_store, inputs_hash
+from singleflight import get_single_flight
+import tracing
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from functools import lru_cache
+import asyncio
+import contextvars
+import hashlib
 import os
+import queue
+import threading
+import time
 
 load_dotenv()
 
-# Get API key from Streamlit secrets or environment
-try:
-    import streamlit as st
-    gemini_api_key = st.secrets.get("GOOGLE_API_KEY", os.getenv("GOOGLE_API_KEY"))
-except:
-    gemini_api_key = os.getenv("GOOGLE_API_KEY")
-
-if not gemini_api_key:
-    raise ValueError("❌ GOOGLE_API_KEY not found!")
-
-# Configure Gemini using direct model specification
-gemini_llm = LLM(
-    model="gemini-1.5-flash-002",  # Use specific version
-    api_key=gemini_api_key,
-    base_url="https://generativelanguage.googleapis.com/v1beta"
-)
-
-print(f"✅ Using Gemini 1.5 Flash via CrewAI LLM")
-
-
-# Agent 1: Competitor Intelligence Researcher
-intelligence_agent = Agent(
-    role='Competitive Intelligence Researcher',
-    goal='Identify and analyze top competitors, their strategies, and market positioning in the {topic} space',
-    backstory="""You are an expert competitive intelligence analyst with 10+ years of experience 
-    researching market leaders. You excel at identifying key players, understanding their content 
-    strategies, and spotting patterns in what makes competitors successful.""",
-    tools=[research_competitors],
-    llm=gemini_llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-# Agent 2: Trend Analysis Specialist
-trend_agent = Agent(
-    role='Trend Analysis Specialist',
-    goal='Discover viral content patterns, trending topics, and engagement drivers in the {topic} niche',
-    backstory="""You are a trend forecasting expert who can spot emerging patterns before they 
-    go mainstream. You understand what makes content viral and can identify the hooks, angles, 
-    and formats that drive maximum engagement.""",
-    tools=[analyze_trends],
-    llm=gemini_llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-# Agent 3: Strategic Gap Analyzer
-gap_agent = Agent(
-    role='Strategic Gap Analyzer',
-    goal='Identify underserved audiences, missed content angles, and opportunities competitors are ignoring',
-    backstory="""You are a strategic consultant who specializes in finding white space opportunities. 
-    You can see what competitors are missing and identify content gaps that represent untapped 
-    potential for engagement and authority building.""",
-    tools=[find_content_gaps],
-    llm=gemini_llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-# Agent 4: Content Strategist & Creator
-content_strategist = Agent(
-    role='Content Strategist & Idea Generator',
-    goal='Generate 25-30 unique, high-value content ideas that fill gaps and outperform competitors',
-    backstory="""You are a creative content strategist who combines competitive intelligence with 
-    audience psychology. You craft content ideas that stop scrolls, spark conversations, and 
-    establish thought leadership. You understand different content formats (carousels, threads, 
-    videos, long-form) and can adapt ideas for maximum impact.""",
-    llm=gemini_llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-# Agent 5: Multi-Platform Content Writer
-content_writer = Agent(
-    role='Multi-Platform Content Writer',
-    goal='Write 5 platform-optimized posts ready for LinkedIn, Instagram, Twitter, TikTok, and Facebook',
-    backstory="""You are a multi-platform content writer who understands the unique voice, format, 
-    and engagement patterns of each social platform. You write hooks that grab attention, body 
-    content that delivers value, and CTAs that drive action. You know LinkedIn prefers professional 
-    insights, Instagram loves storytelling with visuals, Twitter rewards punchy threads, TikTok 
-    thrives on hooks and quick value, and Facebook builds community through relatable content.""",
-    llm=gemini_llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-def generate_competitor_intelligence(topic: str, brand_name: str) -> dict:
+# Model every agent uses unless its tier names another - also part of the report cache key
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-002")
+
+# Model calls move to when GEMINI_MODEL keeps failing (see llm_client.CallPolicy);
+# empty for none
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+
+# Models of the tiers stages are routed to (see routing.py); empty for the
+# backend's default model (GEMINI_MODEL)
+TIER_MODELS = {
+    'fast': os.getenv("LLM_FAST_MODEL", ""),
+    'strong': os.getenv("LLM_STRONG_MODEL", ""),
+}
+
+# "gemini" for the real API, "fake" for the offline FakeLLM (see fake_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+MODEL_ID = GEMINI_MODEL if LLM_BACKEND == "gemini" else f"{LLM_BACKEND}:{os.getenv('FAKE_LLM_MODEL', 'fake-llm')}"
+
+# Console output from every agent - turned off for benchmarks
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "1") != "0"
+
+# The LLM client and agents are built on first use and then reused for the
+# life of the process. Importing this module stays cheap: the crewai/litellm
+# import chain is only paid when a report actually has to run, so cache hits
+# and Streamlit reruns never touch it.
+
+def get_llm(tier: str = 'fast'):
     """
-    Orchestrates the 5-agent system to generate comprehensive competitor intelligence and content strategy.
+    The shared LLM client for a model tier (see TIER_MODELS), created on
+    first call. Tiers configured with the same model share one client.
+    """
+    return _llm_for_model(TIER_MODELS[tier])
+
+@lru_cache(maxsize=None)
+def _llm_for_model(model: str):
+    """
+    LLM client for `model` (empty for GEMINI_MODEL). LLM_BACKEND=fake swaps in
+    the offline FakeLLM for benchmarks and tests. The client is wrapped in a
+    ManagedLLM so every call is recorded on the report's trace and runs
+    under the LLM_* call policy, with LLM_FALLBACK_MODEL as the fallback,
+    and within the shared rate limits (see rate_limit.py).
     """
+    from llm_client import ManagedLLM
+    from rate_limit import get_rate_limiter
     
-    # Task 1: Research Competitors
-    research_task = Task(
-        description=f"""
+    if LLM_BACKEND == "fake":
+        from fake_llm import FakeLLM
+        primary = FakeLLM.from_env()
+        if model:
+            primary = primary.model_copy(update={'model': model})
+        fallback = primary.model_copy(update={'model': FALLBACK_MODEL}) if FALLBACK_MODEL else None
+        return ManagedLLM.wrap(primary, fallback, limiter=get_rate_limiter())
+    if LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected 'gemini' or 'fake'")
+    
+    from crewai import LLM
+    
+    # Get API key from Streamlit secrets or environment
+    try:
+        import streamlit as st
+        gemini_api_key = st.secrets.get("GOOGLE_API_KEY", os.getenv("GOOGLE_API_KEY"))
+    except:
+        gemini_api_key = os.getenv("GOOGLE_API_KEY")
+    
+    if not gemini_api_key:
+        raise ValueError("❌ GOOGLE_API_KEY not found!")
+    
+    # Configure Gemini using direct model specification
+    gemini_llm = LLM(
+        model=model or GEMINI_MODEL,  # Use specific version
+        api_key=gemini_api_key,
+        base_url="https://generativelanguage.googleapis.com/v1beta"
+    )
+    
+    fallback_llm = None
+    if FALLBACK_MODEL:
+        fallback_llm = LLM(
+            model=FALLBACK_MODEL,
+            api_key=gemini_api_key,
+            base_url="https://generativelanguage.googleapis.com/v1beta"
+        )
+    
+    print(f"✅ Using {model or GEMINI_MODEL} via CrewAI LLM" + (f" (fallback: {FALLBACK_MODEL})" if FALLBACK_MODEL else ""))
+    return ManagedLLM.wrap(gemini_llm, fallback_llm, limiter=get_rate_limiter())
+
+@lru_cache(maxsize=None)
+def get_agents(tier: str = 'fast') -> dict:
+    """
+    The five pipeline agents on a model tier's LLM, created on first call
+    and shared afterwards. Stages run on per-task copies (see _task_runner),
+    so sharing is safe.
+    """
+    from crewai import Agent
+    from analyzer import research_competitors, analyze_trends, find_content_gaps
+    
+    gemini_llm = get_llm(tier)
+    
+    # Agent 1: Competitor Intelligence Researcher
+    intelligence_agent = Agent(
+        role='Competitive Intelligence Researcher',
+        goal='Identify and analyze top competitors, their strategies, and market positioning in the {topic} space',
+        backstory="""You are an expert competitive intelligence analyst with 10+ years of experience 
+        researching market leaders. You excel at identifying key players, understanding their content 
+        strategies, and spotting patterns in what makes competitors successful.""",
+        tools=[research_competitors],
+        llm=gemini_llm,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False
+    )
+    
+    # Agent 2: Trend Analysis Specialist
+    trend_agent = Agent(
+        role='Trend Analysis Specialist',
+        goal='Discover viral content patterns, trending topics, and engagement drivers in the {topic} niche',
+        backstory="""You are a trend forecasting expert who can spot emerging patterns before they 
+        go mainstream. You understand what makes content viral and can identify the hooks, angles, 
+        and formats that drive maximum engagement.""",
+        tools=[analyze_trends],
+        llm=gemini_llm,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False
+    )
+    
+    # Agent 3: Strategic Gap Analyzer
+    gap_agent = Agent(
+        role='Strategic Gap Analyzer',
+        goal='Identify underserved audiences, missed content angles, and opportunities competitors are ignoring',
+        backstory="""You are a strategic consultant who specializes in finding white space opportunities. 
+        You can see what competitors are missing and identify content gaps that represent untapped 
+        potential for engagement and authority building.""",
+        tools=[find_content_gaps],
+        llm=gemini_llm,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False
+    )
+    
+    # Agent 4: Content Strategist & Creator
+    content_strategist = Agent(
+        role='Content Strategist & Idea Generator',
+        goal='Generate 25-30 unique, high-value content ideas that fill gaps and outperform competitors',
+        backstory="""You are a creative content strategist who combines competitive intelligence with 
+        audience psychology. You craft content ideas that stop scrolls, spark conversations, and 
+        establish thought leadership. You understand different content formats (carousels, threads, 
+        videos, long-form) and can adapt ideas for maximum impact.""",
+        llm=gemini_llm,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False
+    )
+    
+    # Agent 5: Multi-Platform Content Writer
+    content_writer = Agent(
+        role='Multi-Platform Content Writer',
+        goal='Write 5 platform-optimized posts ready for LinkedIn, Instagram, Twitter, TikTok, and Facebook',
+        backstory="""You are a multi-platform content writer who understands the unique voice, format, 
+        and engagement patterns of each social platform. You write hooks that grab attention, body 
+        content that delivers value, and CTAs that drive action. You know LinkedIn prefers professional 
+        insights, Instagram loves storytelling with visuals, Twitter rewards punchy threads, TikTok 
+        thrives on hooks and quick value, and Facebook builds community through relatable content.""",
+        llm=gemini_llm,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False
+    )
+    
+    return {
+        'intelligence_agent': intelligence_agent,
+        'trend_agent': trend_agent,
+        'gap_agent': gap_agent,
+        'content_strategist': content_strategist,
+        'content_writer': content_writer,
+    }
+
+# Per-platform writing briefs for the content writer, in report order
+PLATFORM_LABELS = {
+    'linkedin': 'LinkedIn Post',
+    'instagram': 'Instagram Caption',
+    'twitter': 'Twitter/X Thread',
+    'tiktok': 'TikTok Script',
+    'facebook': 'Facebook Post',
+}
+
+# Words that tie a content idea to a platform - the writer's digest of the
+# ideas puts matching ones first
+PLATFORM_FOCUS = {
+    'linkedin': ('linkedin', 'article', 'long-form', 'professional'),
+    'instagram': ('instagram', 'carousel', 'reel', 'story', 'stories'),
+    'twitter': ('twitter', 'tweet', 'thread', ' x '),
+    'tiktok': ('tiktok', 'video', 'short-form', 'reel'),
+    'facebook': ('facebook', 'poll', 'community', 'group'),
+}
+
+PLATFORM_BRIEFS = {
+    'linkedin': """LINKEDIN POST:
+           - Professional tone with valuable insights
+           - 1200-1500 characters
+           - Strong hook, 3-5 key points, clear CTA
+           - Include relevant hashtags (5-8)""",
+    'instagram': """INSTAGRAM CAPTION:
+           - Storytelling approach with visual cues
+           - 1000-1300 characters
+           - Engaging hook, narrative flow, emotion
+           - 10-15 relevant hashtags
+           - Mention "Link in bio" or CTA""",
+    'twitter': """TWITTER/X THREAD:
+           - 5-7 tweets forming a cohesive thread
+           - First tweet = killer hook
+           - Each tweet = one clear point
+           - Final tweet = CTA or summary
+           - Conversational, punchy tone""",
+    'tiktok': """TIKTOK SCRIPT:
+           - Hook in first 3 seconds
+           - Visual cues for video editing
+           - 60-90 seconds of content
+           - Clear value delivery
+           - Trending sound suggestions""",
+    'facebook': """FACEBOOK POST:
+           - Community-building tone
+           - Question or discussion starter
+           - 500-800 characters
+           - Relatable and conversational
+           - Encourages comments and shares""",
+}
+
+def _run_on_tier(task, tier: str, context: str) -> str:
+    # The stage's agent role, on the tier's LLM
+    agent = next(agent for agent in get_agents(tier).values() if agent.role == task.agent.role)
+    # Agents keep per-task executor state, so stages that share a role
+    # (e.g. the platform writers) each run on their own copy
+    return task.execute_sync(agent=agent.copy(), context=context or None).raw
+
+def _task_runner(task, section: str, focus: tuple = ()):
+    """
+    Wraps a task as a pipeline stage callable. Upstream outputs are handed to
+    the agent as context in the same format a sequential Crew would use,
+    compacted to the stage's context budget (see compaction.py).
+    The stage runs on the model tier its route picks (see routing.py); an
+    'escalate' stage whose fast answer fails validation is run again on the
+    strong tier while it is within budget. The model used, the budgets and
+    any budget overrun are noted on the trace.
+    """
+    budget = context_budget(section)
+    route = stage_route(section)
+    latency_budget, token_budget = stage_budget(section)
+    def run(inputs: dict):
+        # Multi-brand stage names carry a "<brand>/" prefix
+        outputs = {name.rsplit('/', 1)[-1]: output for name, output in inputs.items()}
+        parts = compact_context(outputs, budget, focus)
+        tracing.count('context_tokens_raw', sum(tracing.estimate_tokens(str(o)) for o in outputs.values()))
+        tracing.count('context_tokens', sum(tracing.estimate_tokens(part) for part in parts))
+        context = "\n\n----------\n\n".join(parts)
+
+        started = time.monotonic()
+        tier = 'fast' if route == 'escalate' else route
+        output = _run_on_tier(task, tier, context)
+        over = over_budget(section, time.monotonic() - started, tracing.stage_tokens())
+        problem = None
+        if route == 'escalate' and get_llm('strong') is not get_llm('fast'):
+            problem = validate(section, output)
+            if problem and over:
+                problem += f" (not escalated: over the {' and '.join(over)} budget)"
+            elif problem:
+                from tool_cache import forget_stage_calls
+                tracing.count('escalations')
+                tier = 'strong'
+                # The strong run makes its own tool calls, not repeats of the fast run's
+                forget_stage_calls(current_stage.get())
+                output = _run_on_tier(task, tier, context)
+                over = over_budget(section, time.monotonic() - started, tracing.stage_tokens())
+        tracing.note(model=get_llm(tier).model, tier=tier, escalation_reason=problem,
+                     latency_budget_s=latency_budget, token_budget=token_budget, over_budget=over)
+        return output
+    return run
+
+def _posts_merger(platforms: list, prefix: str = ''):
+    """
+    Stage callable that combines the per-platform writer outputs back into a
+    single posts section, in platform order.
+    """
+    def run(inputs: dict) -> str:
+        return "\n\n---\n\n".join(
+            f"## {PLATFORM_LABELS[platform].upper()}\n\n{inputs[f'{prefix}post_{platform}']}"
+            for platform in platforms
+        )
+    return run
+
+# Prompt templates for each stage, filled in with topic and brand_name.
+# Research and trend prompts only use the topic so they can be shared by
+# every brand analysed in the same niche.
+# Any edit here changes PROMPT_VERSION and so invalidates cached reports.
+RESEARCH_PROMPT = """
         Research and analyze the top 5-10 competitors in the {topic} space. Identify:
         1. Who are the major players and thought leaders
         2. What content formats they use (videos, carousels, threads, articles)
@@ -107,15 +316,9 @@ def generate_competitor_intelligence(topic: str, brand_name: str) -> dict:
         5. What makes their best-performing content successful
         
         Topic: {topic}
-        Brand: {brand_name}
-        """,
-        agent=intelligence_agent,
-        expected_output="Detailed competitor analysis with 5-10 major players, their strategies, and content patterns"
-    )
-    
-    # Task 2: Analyze Trends
-    trend_task = Task(
-        description=f"""
+        """
+
+TREND_PROMPT = """
         Based on the competitor research, analyze trending content in the {topic} niche. Identify:
         1. What content angles are getting the most engagement right now
         2. Emerging topics and themes gaining traction
@@ -124,14 +327,9 @@ def generate_competitor_intelligence(topic: str, brand_name: str) -> dict:
         5. Timing and frequency patterns of top performers
         
         Topic: {topic}
-        """,
-        agent=trend_agent,
-        expected_output="Trend analysis report with viral patterns, top-performing content types, and engagement drivers"
-    )
-    
-    # Task 3: Find Content Gaps
-    gap_task = Task(
-        description=f"""
+        """
+
+GAP_PROMPT = """
         Identify strategic content gaps and opportunities that competitors are missing. Find:
         1. Underserved audience segments or pain points not being addressed
         2. Content formats competitors aren't using effectively
@@ -141,14 +339,9 @@ def generate_competitor_intelligence(topic: str, brand_name: str) -> dict:
         
         Topic: {topic}
         Brand: {brand_name}
-        """,
-        agent=gap_agent,
-        expected_output="Gap analysis with 5-7 major opportunities for differentiation and unique content angles"
-    )
-    
-    # Task 4: Generate Content Ideas
-    content_ideas_task = Task(
-        description=f"""
+        """
+
+IDEAS_PROMPT = """
         Based on competitor research, trends, and gaps, generate 25-30 unique content ideas for {brand_name}.
         
         Requirements:
@@ -161,74 +354,624 @@ def generate_competitor_intelligence(topic: str, brand_name: str) -> dict:
         
         Topic: {topic}
         Brand: {brand_name}
-        """,
-        agent=content_strategist,
-        expected_output="25-30 unique content ideas with hooks, formats, and platform recommendations"
-    )
-    
-    # Task 5: Write Platform-Specific Posts
-    content_writing_task = Task(
-        description=f"""
-        Write 5 complete, ready-to-publish posts for {brand_name}, one for each platform:
-        
-        1. LINKEDIN POST:
-           - Professional tone with valuable insights
-           - 1200-1500 characters
-           - Strong hook, 3-5 key points, clear CTA
-           - Include relevant hashtags (5-8)
-        
-        2. INSTAGRAM CAPTION:
-           - Storytelling approach with visual cues
-           - 1000-1300 characters
-           - Engaging hook, narrative flow, emotion
-           - 10-15 relevant hashtags
-           - Mention "Link in bio" or CTA
-        
-        3. TWITTER/X THREAD:
-           - 5-7 tweets forming a cohesive thread
-           - First tweet = killer hook
-           - Each tweet = one clear point
-           - Final tweet = CTA or summary
-           - Conversational, punchy tone
-        
-        4. TIKTOK SCRIPT:
-           - Hook in first 3 seconds
-           - Visual cues for video editing
-           - 60-90 seconds of content
-           - Clear value delivery
-           - Trending sound suggestions
+        """
+
+POST_PROMPT = """
+        Write 1 complete, ready-to-publish post for {brand_name}:
         
-        5. FACEBOOK POST:
-           - Community-building tone
-           - Question or discussion starter
-           - 500-800 characters
-           - Relatable and conversational
-           - Encourages comments and shares
+        {platform_brief}
         
         Topic: {topic}
         Brand: {brand_name}
         
-        Make each post authentic to the platform while maintaining {brand_name}'s voice.
-        """,
-        agent=content_writer,
-        expected_output="5 complete, platform-optimized posts ready for publishing"
+        Make the post authentic to the platform while maintaining {brand_name}'s voice.
+        """
+
+PROMPT_VERSION = hashlib.sha256("\x00".join(
+    [RESEARCH_PROMPT, TREND_PROMPT, GAP_PROMPT, IDEAS_PROMPT, POST_PROMPT]
+    + [f"{platform}={brief}" for platform, brief in PLATFORM_BRIEFS.items()]
+).encode()).hexdigest()[:16]
+
+# Report sections that depend only on the topic, shared by every brand
+TOPIC_SECTIONS = ('competitor_research', 'trend_analysis')
+
+# What topic-level outputs depend on besides the topic: near-duplicate
+# topics only share research and trends produced under the same setup
+TOPIC_CONFIG_KEY = make_cache_key(model=MODEL_ID, tiers=TIER_MODELS, routes=STAGE_ROUTES,
+                                  prompts=PROMPT_VERSION, context=CONTEXT_BUDGETS)
+
+def report_cache_key(topic: str, brand_name: str, platforms: list) -> str:
+    """
+    Cache key for a full report: normalized topic and brand, the configured
+    models and stage routes, the prompt version and the context budgets, so
+    changing any of them misses the cache.
+    """
+    return make_cache_key(
+        topic=normalize_text(topic),
+        brand=normalize_text(brand_name),
+        platforms=list(platforms),
+        model=MODEL_ID,
+        tiers=TIER_MODELS,
+        routes=STAGE_ROUTES,
+        prompts=PROMPT_VERSION,
+        context=CONTEXT_BUDGETS,
+    )
+
+def run_request_key(topic: str, brand_names: list, platforms: list) -> str:
+    """
+    Identifies a report request for resuming runs: like report_cache_key, over
+    every requested brand.
+    """
+    return make_cache_key(
+        topic=normalize_text(topic),
+        brands=sorted(normalize_text(brand_name) for brand_name in brand_names),
+        platforms=list(platforms),
+        model=MODEL_ID,
+        tiers=TIER_MODELS,
+        routes=STAGE_ROUTES,
+        prompts=PROMPT_VERSION,
+        context=CONTEXT_BUDGETS,
+    )
+
+def _resolve_platforms(platforms: list = None) -> list:
+    unknown = [platform for platform in (platforms or []) if platform not in PLATFORM_BRIEFS]
+    if unknown:
+        raise ValueError(f"Unknown platforms {unknown}, expected any of {list(PLATFORM_BRIEFS)}")
+    return [platform for platform in PLATFORM_BRIEFS if not platforms or platform in platforms]
+
+def _topic_stages(topic: str) -> list:
+    """
+    Stages that depend only on the topic: competitor research and trend analysis.
+    """
+    from crewai import Task
+    agents = get_agents()
+    
+    # Task 1: Research Competitors
+    research_task = Task(
+        description=RESEARCH_PROMPT.format(topic=topic),
+        agent=agents['intelligence_agent'],
+        expected_output="Detailed competitor analysis with 5-10 major players, their strategies, and content patterns"
     )
     
-    # Create and run the crew
-    crew = Crew(
-        agents=[intelligence_agent, trend_agent, gap_agent, content_strategist, content_writer],
-        tasks=[research_task, trend_task, gap_task, content_ideas_task, content_writing_task],
-        verbose=True
+    # Task 2: Analyze Trends
+    trend_task = Task(
+        description=TREND_PROMPT.format(topic=topic),
+        agent=agents['trend_agent'],
+        expected_output="Trend analysis report with viral patterns, top-performing content types, and engagement drivers"
     )
     
-    # Execute the crew
-    result = crew.kickoff()
+    return [
+        Stage('competitor_research', _task_runner(research_task, 'competitor_research')),
+        Stage('trend_analysis', _task_runner(trend_task, 'trend_analysis'), deps=['competitor_research']),
+    ]
+
+def _brand_stages(topic: str, brand_name: str, platforms: list, prefix: str = '') -> list:
+    """
+    Stages that need the brand: gap analysis, content ideas and the platform
+    posts. Stage names get `prefix` so several brands fit in one pipeline.
+    """
+    from crewai import Task
+    agents = get_agents()
+    fields = {'topic': topic, 'brand_name': brand_name}
     
+    # Task 3: Find Content Gaps
+    gap_task = Task(
+        description=GAP_PROMPT.format(**fields),
+        agent=agents['gap_agent'],
+        expected_output="Gap analysis with 5-7 major opportunities for differentiation and unique content angles"
+    )
+    
+    # Task 4: Generate Content Ideas
+    content_ideas_task = Task(
+        description=IDEAS_PROMPT.format(**fields),
+        agent=agents['content_strategist'],
+        expected_output="25-30 unique content ideas with hooks, formats, and platform recommendations"
+    )
+    
+    # Task 5: Write Platform-Specific Posts - one writer per platform, all
+    # working from the same content ideas
+    post_tasks = {
+        platform: Task(
+            description=POST_PROMPT.format(platform_brief=PLATFORM_BRIEFS[platform], **fields),
+            agent=agents['content_writer'],
+            expected_output=f"1 complete, platform-optimized {PLATFORM_LABELS[platform]} ready for publishing"
+        )
+        for platform in platforms
+    }
+    
+    # Gap analysis only needs the research output, so it runs alongside
+    # trend analysis once research is done
+    stages = [
+        Stage(f'{prefix}content_gaps', _task_runner(gap_task, 'content_gaps'), deps=['competitor_research']),
+        Stage(f'{prefix}content_ideas', _task_runner(content_ideas_task, 'content_ideas'),
+              deps=['competitor_research', 'trend_analysis', f'{prefix}content_gaps']),
+    ]
+    stages += [
+        Stage(f'{prefix}post_{platform}', _task_runner(task, f'post_{platform}', PLATFORM_FOCUS[platform]),
+              deps=[f'{prefix}content_ideas'])
+        for platform, task in post_tasks.items()
+    ]
+    stages.append(Stage(f'{prefix}platform_posts', _posts_merger(platforms, prefix),
+                        deps=[f'{prefix}post_{platform}' for platform in platforms]))
+    return stages
+
+def _brand_report(outputs: dict, platforms: list, prefix: str = '') -> dict:
     return {
-        'competitor_research': research_task.output,
-        'trend_analysis': trend_task.output,
-        'content_gaps': gap_task.output,
-        'content_ideas': content_ideas_task.output,
-        'platform_posts': content_writing_task.output,
-        'full_report': result
+        'competitor_research': outputs['competitor_research'],
+        'trend_analysis': outputs['trend_analysis'],
+        'content_gaps': outputs[f'{prefix}content_gaps'],
+        'content_ideas': outputs[f'{prefix}content_ideas'],
+        'platform_posts': outputs[f'{prefix}platform_posts'],
+        'posts_by_platform': {platform: outputs[f'{prefix}post_{platform}'] for platform in platforms},
+        'full_report': outputs[f'{prefix}platform_posts']
+    }
+
+def _stage_outputs(report: dict, platforms: list) -> dict:
+    """
+    Inverse of _brand_report for a single brand: the report as stage outputs.
+    """
+    outputs = {name: report[name] for name in
+               ['competitor_research', 'trend_analysis', 'content_gaps', 'content_ideas', 'platform_posts']}
+    outputs.update({f'post_{platform}': report['posts_by_platform'][platform] for platform in platforms})
+    return outputs
+
+def _plan_reports(topic: str, brand_names: list, platforms: list, use_cache: bool, resume=True) -> dict:
+    """
+    Looks every brand up in the report cache and builds the pipeline for the
+    ones that still have to run. Shared by the sync and async entry points.
+    With `resume` (True for the latest failed run of the same request, or a
+    run id) the stages that run already finished are restored from its
+    checkpoints and only the rest are planned to run.
+    With `use_cache`, research and trends still to run are instead reused
+    from a near-identical earlier topic if there is one (see topic_cache.py).
+    """
+    platforms = _resolve_platforms(platforms)
+    
+    # Brands differing only in case/spacing are the same brand
+    brands = {}
+    for brand_name in brand_names:
+        brands.setdefault(normalize_text(brand_name), brand_name)
+    if not brands:
+        raise ValueError("At least one brand name is required")
+    
+    cache = get_report_cache()
+    cached = {}
+    to_run = []
+    for brand_name in brands.values():
+        report = cache.get(report_cache_key(topic, brand_name, platforms)) if use_cache else None
+        if report is not None:
+            cached[brand_name] = report
+        else:
+            to_run.append(brand_name)
+    
+    # A single brand keeps the plain stage names
+    prefixes = {brand_name: (f'{brand_name}/' if len(to_run) > 1 else '') for brand_name in to_run}
+    stages = _topic_stages(topic) if to_run else []
+    for brand_name in to_run:
+        stages += _brand_stages(topic, brand_name, platforms, prefixes[brand_name])
+    
+    plan = {
+        'topic': topic,
+        'platforms': platforms,
+        'brands': list(brands.values()),
+        'cached': cached,
+        'prefixes': prefixes,
+        'stages': stages,
+        'request': {'topic': topic, 'brand_names': list(brands.values()), 'platforms': platforms},
+        'request_key': run_request_key(topic, list(brands.values()), platforms),
+        'run_id': None,
+        'completed': {},
+        'reused_topic': None,
+    }
+    if stages and resume:
+        _restore_checkpoints(plan, resume)
+    if stages and use_cache and not any(section in plan['completed'] for section in TOPIC_SECTIONS):
+        _reuse_topic_outputs(plan)
+    plan['run_id'] = plan['run_id'] or new_run_id()
+    return plan
+
+def _reuse_topic_outputs(plan: dict) -> None:
+    """
+    Marks the topic stages completed with the outputs of the most similar
+    earlier topic, if one is close enough.
+    """
+    from topic_cache import get_topic_cache
+    
+    match = get_topic_cache().lookup(plan['topic'], TOPIC_CONFIG_KEY)
+    if match is None or any(section not in match['outputs'] for section in TOPIC_SECTIONS):
+        return
+    hashes = plan.setdefault('output_hashes', {})
+    for section in TOPIC_SECTIONS:
+        plan['completed'][section] = match['outputs'][section]
+        hashes[section] = content_hash(match['outputs'][section])
+    plan['reused_topic'] = {'topic': match['topic'], 'similarity': match['similarity']}
+
+def _checkpoint_name(plan: dict, stage_name: str) -> str:
+    """
+    Brand-qualified stage name for checkpoints, independent of how the
+    pipeline prefixed it: 'trend_analysis', 'acme/content_ideas'.
+    """
+    brand_name, section = _describe_stage(plan, stage_name)
+    return section if brand_name is None else f"{normalize_text(brand_name)}/{section}"
+
+def _restore_checkpoints(plan: dict, resume, rerun: set = frozenset()) -> None:
+    """
+    Fills plan['completed'] from a saved run. A stage is restored only when
+    its dependencies were and it was produced from exactly their outputs -
+    a stage whose upstream output changed since is stale and runs again, as
+    does every stage named in `rerun`.
+    """
+    store = get_checkpoint_store()
+    run_id = resume if isinstance(resume, str) else store.latest_run(plan['request_key'])
+    saved = store.run(run_id) if run_id else None
+    if isinstance(resume, str):
+        if saved is None:
+            raise ValueError(f"No checkpoints for run {run_id!r} - it may have expired")
+        if saved['request_key'] != plan['request_key']:
+            raise ValueError(f"Run {run_id!r} was for a different request or configuration")
+    if saved is None:
+        return
+    
+    hashes = {}
+    for stage in plan['stages']:
+        checkpoint = saved['stages'].get(_checkpoint_name(plan, stage.name))
+        if (checkpoint is None or stage.name in rerun or any(dep not in hashes for dep in stage.deps)
+                or checkpoint['input_hash'] != inputs_hash([hashes[dep] for dep in stage.deps])):
+            continue
+        hashes[stage.name] = checkpoint['output_hash']
+        plan['completed'][stage.name] = checkpoint['output']
+    plan['run_id'] = run_id
+    plan['output_hashes'] = hashes
+
+def _checkpoint_recorder(plan: dict):
+    """
+    on_event handler saving each finished stage's output under the run id.
+    """
+    store = get_checkpoint_store()
+    deps = {stage.name: stage.deps for stage in plan['stages']}
+    hashes = dict(plan.get('output_hashes', {}))
+    def on_event(event):
+        # Reused topic outputs are saved too, so a resumed run does not look them up again
+        if event['type'] == 'stage_finished' or (event['type'] == 'stage_restored' and plan['reused_topic']
+                                                 and event['stage'] in TOPIC_SECTIONS):
+            hashes[event['stage']] = store.save_stage(
+                plan['run_id'], _checkpoint_name(plan, event['stage']), event['output'],
+                inputs_hash([hashes[dep] for dep in deps[event['stage']]]))
+    return on_event
+
+@contextmanager
+def _report_run(plan: dict, on_event=None):
+    """
+    Traces and checkpoints one pipeline run. Yields (trace, on_event) where
+    on_event feeds the trace, the checkpoint store and the caller's handler.
+    """
+    store = get_checkpoint_store() if plan['stages'] else None
+    if store:
+        store.start_run(plan['run_id'], plan['request_key'], plan['request'])
+    with start_trace(plan['topic'], plan['brands'], list(plan['cached']), plan['run_id']) as trace:
+        handler = _fan_out(trace.on_event, _checkpoint_recorder(plan) if store else None, on_event)
+        try:
+            yield trace, handler
+        except BaseException as e:
+            if store:
+                store.finish_run(plan['run_id'], e)
+            raise
+        finally:
+            if plan.get('flight') is not None:
+                trace.coalesced = plan['flight'].waiters
+        if store:
+            store.finish_run(plan['run_id'])
+
+def _finish_reports(plan: dict, outputs: dict, trace: Trace) -> dict:
+    """
+    Turns pipeline outputs into per-brand reports, caching the fresh ones
+    and the topic's research and trends if this run produced them.
+    Every report carries the run's trace summary (not cached with it) and
+    says which earlier topic its research and trends came from, if any.
+    """
+    cache = get_report_cache()
+    if plan['stages'] and not any(section in plan['completed'] for section in TOPIC_SECTIONS):
+        from topic_cache import get_topic_cache
+        get_topic_cache().set(plan['topic'], TOPIC_CONFIG_KEY, {section: outputs[section] for section in TOPIC_SECTIONS})
+    reports = {brand_name: {**report, 'cached': True} for brand_name, report in plan['cached'].items()}
+    for brand_name, prefix in plan['prefixes'].items():
+        report = {**_brand_report(outputs, plan['platforms'], prefix), 'reused_topic': plan['reused_topic']}
+        cache.set(report_cache_key(plan['topic'], brand_name, plan['platforms']), report)
+        reports[brand_name] = {**report, 'cached': False}
+    summary = trace.summary()
+    return {brand_name: {**reports[brand_name], 'run_id': plan['run_id'] if plan['stages'] else None,
+                         'trace': summary}
+            for brand_name in plan['brands']}
+
+def _fan_out(*handlers):
+    """
+    One on_event callback that forwards each event to every given handler.
+    """
+    handlers = [handler for handler in handlers if handler is not None]
+    def on_event(event):
+        for handler in handlers:
+            handler(event)
+    return on_event
+
+def generate_competitor_intelligence(topic: str, brand_name: str, platforms: list = None,
+                                     use_cache: bool = True, resume=True) -> dict:
+    """
+    Orchestrates the 5-agent system to generate comprehensive competitor intelligence and content strategy.
+    Pass `platforms` (keys of PLATFORM_BRIEFS) to only write posts for those platforms.
+    Finished reports are cached on disk; `use_cache=False` bypasses the lookup
+    and refreshes the stored copy.
+    The result's 'trace' holds per-stage timings, LLM calls, tokens and cost
+    (see tracing.Trace); each run is also appended to the trace log.
+    Every stage is checkpointed under the result's 'run_id'. If an earlier
+    run of the same request failed, its finished stages are reused and only
+    the rest run again; pass `resume=False` to start from scratch, or a run
+    id to resume that run (see resume_intelligence).
+    """
+    reports = generate_multi_brand_intelligence(topic, [brand_name], platforms, use_cache, resume)
+    return _report_for(reports, brand_name)
+
+def _report_for(reports: dict, brand_name: str) -> dict:
+    # A coalesced run reports under the spelling its first caller used
+    return next(report for name, report in reports.items() if normalize_text(name) == normalize_text(brand_name))
+
+def generate_multi_brand_intelligence(topic: str, brand_names: list, platforms: list = None,
+                                      use_cache: bool = True, resume=True) -> dict:
+    """
+    Runs one topic for several brands. Competitor research and trend analysis
+    run once and are shared; gaps, ideas and posts run per brand, all brands
+    in parallel. Returns a {brand name: report} dict, each report shaped like
+    the result of generate_competitor_intelligence.
+    """
+    # Identical requests already running are joined rather than run twice
+    for event in iter_multi_brand_intelligence(topic, brand_names, platforms, use_cache, resume):
+        if event['type'] == 'report_ready':
+            return event['reports']
+
+def resume_intelligence(run_id: str) -> dict:
+    """
+    Resumes a failed run from its checkpoints: the stages it finished are
+    reused and the rest run again. Returns {brand name: report} like
+    generate_multi_brand_intelligence.
+    """
+    saved = get_checkpoint_store().run(run_id)
+    if saved is None:
+        raise ValueError(f"No checkpoints for run {run_id!r} - it may have expired")
+    request = saved['request']
+    return generate_multi_brand_intelligence(request['topic'], request['brand_names'], request['platforms'],
+                                             resume=run_id)
+
+def _describe_stage(plan: dict, stage_name: str) -> tuple:
+    """
+    Maps a pipeline stage name to (brand name, report section). Topic stages
+    are shared by every brand and map to brand None.
+    """
+    for brand_name, prefix in plan['prefixes'].items():
+        if prefix and stage_name.startswith(prefix):
+            return brand_name, stage_name[len(prefix):]
+    if stage_name in ('competitor_research', 'trend_analysis'):
+        return None, stage_name
+    # Only one brand runs, unprefixed - not necessarily the first requested
+    return next(iter(plan['prefixes']), plan['brands'][0]), stage_name
+
+def iter_multi_brand_intelligence(topic: str, brand_names: list, platforms: list = None,
+                                  use_cache: bool = True, resume=True):
+    """
+    Streaming form of generate_multi_brand_intelligence. Runs the pipeline on
+    a background thread and yields events as they happen:
+    
+    - {'type': 'planned', 'stages': [...], 'brands': [...], 'cached': [...],
+       'run_id', 'restored': [...]}
+    - {'type': 'stage_started' | 'stage_finished' | 'stage_restored', 'stage', 'brand', 'section', ...}
+      (stage_finished and stage_restored carry 'output'; brand is None for
+      shared topic stages; restored stages come from a resumed run)
+    - {'type': 'report_ready', 'reports': {brand name: report}} as the last event
+    
+    A failing stage re-raises its exception from the generator.
+    A request identical to one still running in this process (see
+    request_flight_key) attaches to that run: it is replayed the events so
+    far and then follows the rest, and the run's trace counts it under
+    'coalesced'.
+    """
+    key = request_flight_key(topic, brand_names, platforms, use_cache, resume)
+    yield from get_single_flight().follow(
+        key, lambda flight: _iter_plan(_plan_reports(topic, brand_names, platforms, use_cache, resume), flight))
+
+def request_flight_key(topic: str, brand_names: list, platforms: list, use_cache: bool = True, resume=True) -> str:
+    """
+    Identifies identical report requests for coalescing in-flight runs: the
+    request's run key plus how it treats the cache and earlier runs.
+    """
+    return make_cache_key(request=run_request_key(topic, brand_names, _resolve_platforms(platforms)),
+                          use_cache=use_cache, resume=resume)
+
+def _iter_plan(plan: dict, flight=None):
+    """
+    Runs a planned pipeline on a background thread, yielding its events
+    (see iter_multi_brand_intelligence). `flight` is the single-flight run
+    it is the source of, if any.
+    """
+    plan['flight'] = flight
+    yield {
+        'type': 'planned',
+        'stages': [stage.name for stage in plan['stages']],
+        'brands': plan['brands'],
+        'cached': list(plan['cached']),
+        'run_id': plan['run_id'],
+        'restored': list(plan['completed']),
+        'reused_topic': plan['reused_topic'],
     }
+    
+    # Cached brands are complete already - replay their sections first
+    for brand_name, report in plan['cached'].items():
+        for section, output in _stage_outputs(report, plan['platforms']).items():
+            yield {'type': 'stage_finished', 'stage': section, 'brand': brand_name, 'section': section,
+                   'output': output, 'cached': True}
+    
+    events = queue.Queue()
+    
+    def work():
+        try:
+            with _report_run(plan, events.put) as (trace, on_event):
+                outputs = run_pipeline(plan['stages'], on_event, plan['completed']) if plan['stages'] else {}
+            events.put({'type': 'report_ready', 'reports': _finish_reports(plan, outputs, trace)})
+        except Exception as e:
+            events.put({'type': 'pipeline_failed', 'error': e})
+    
+    # Started in a copy of the caller's context so its rate-limit lane applies
+    threading.Thread(target=contextvars.copy_context().run, args=(work,), name="report-stream",
+                     daemon=True).start()
+    
+    while True:
+        event = events.get()
+        if event['type'] == 'pipeline_failed':
+            raise event['error']
+        if event['type'] == 'report_ready':
+            yield event
+            return
+        if event['type'] == 'stage_failed':
+            continue  # surfaced by pipeline_failed once running stages settle
+        brand_name, section = _describe_stage(plan, event['stage'])
+        yield {**event, 'brand': brand_name, 'section': section}
+
+def _plan_regeneration(run_id: str, section: str, brand_name: str = None) -> dict:
+    """
+    Plans re-running one section of a checkpointed run plus every stage
+    downstream of it, with the rest restored from the run's checkpoints.
+    Topic sections are shared, so regenerating one covers every brand of
+    the run; other sections only `brand_name` (the run's first brand by
+    default). 'platform_posts' re-runs every platform writer.
+    """
+    saved = get_checkpoint_store().run(run_id)
+    if saved is None:
+        raise ValueError(f"No checkpoints for run {run_id!r} - it may have expired")
+    request = saved['request']
+    if section in TOPIC_SECTIONS:
+        brand_names = request['brand_names']
+    else:
+        brands = {normalize_text(name): name for name in request['brand_names']}
+        requested = brand_name or request['brand_names'][0]
+        if normalize_text(requested) not in brands:
+            raise ValueError(f"Run {run_id!r} has no brand {requested!r}, expected one of {request['brand_names']}")
+        brand_names = [brands[normalize_text(requested)]]
+    
+    plan = _plan_reports(request['topic'], brand_names, request['platforms'], use_cache=False, resume=False)
+    plan.update(run_id=run_id, request=request, request_key=saved['request_key'])
+    sections = [f'post_{platform}' for platform in plan['platforms']] if section == 'platform_posts' else [section]
+    rerun = {stage.name for stage in plan['stages'] if _describe_stage(plan, stage.name)[1] in sections}
+    if not rerun:
+        raise ValueError(f"Unknown report section {section!r}")
+    
+    # Everything downstream of a regenerated stage is stale too (stages are
+    # planned in dependency order)
+    for stage in plan['stages']:
+        if any(dep in rerun for dep in stage.deps):
+            rerun.add(stage.name)
+    _restore_checkpoints(plan, run_id, rerun)
+    return plan
+
+def regenerate_section(run_id: str, section: str, brand_name: str = None) -> dict:
+    """
+    Re-runs one report section (a report key such as 'content_ideas', or
+    post_<platform>) of an earlier run and the sections that depend on it,
+    reusing the run's stored outputs for everything upstream. The new
+    outputs replace the run's checkpoints and the refreshed reports replace
+    the cached ones. Returns {brand name: report} for the brands affected.
+    """
+    for event in iter_regenerate_section(run_id, section, brand_name):
+        if event['type'] == 'report_ready':
+            return event['reports']
+
+def iter_regenerate_section(run_id: str, section: str, brand_name: str = None):
+    """
+    Streaming form of regenerate_section, with the events of
+    iter_multi_brand_intelligence (the kept sections as stage_restored).
+    The same regeneration requested again while it runs joins it.
+    """
+    key = regenerate_flight_key(run_id, section, brand_name)
+    yield from get_single_flight().follow(
+        key, lambda flight: _iter_plan(_plan_regeneration(run_id, section, brand_name), flight))
+
+def regenerate_flight_key(run_id: str, section: str, brand_name: str = None) -> str:
+    """
+    Identifies identical regenerate requests, like request_flight_key.
+    """
+    return make_cache_key(regenerate=run_id, section=section,
+                          brand=normalize_text(brand_name) if brand_name else None)
+
+# Tasks following a flight for astart_competitor_intelligence - the event
+# loop only keeps weak references to them
+_followers = set()
+
+def astart_competitor_intelligence(topic: str, brand_name: str, platforms: list = None,
+                                   use_cache: bool = True, resume=True) -> dict:
+    """
+    Starts a report on the running event loop and returns {stage name: awaitable}
+    immediately, so callers can show each section as soon as it is ready.
+    Stage names are the report keys plus post_<platform> for each writer;
+    the extra 'report' awaitable resolves to the full report dict once it is
+    cached. A cached report resolves every awaitable straight away.
+    Identical requests in flight are joined, as in iter_multi_brand_intelligence.
+    """
+    loop = asyncio.get_running_loop()
+    sections = ['competitor_research', 'trend_analysis', 'content_gaps', 'content_ideas',
+                *(f'post_{platform}' for platform in _resolve_platforms(platforms)), 'platform_posts', 'report']
+    futures = {name: loop.create_future() for name in sections}
+    
+    async def follow():
+        try:
+            async for event in aiter_multi_brand_intelligence(topic, [brand_name], platforms, use_cache, resume):
+                if event['type'] in ('stage_finished', 'stage_restored') and event['section'] in futures:
+                    if not futures[event['section']].done():
+                        futures[event['section']].set_result(event['output'])
+                elif event['type'] == 'report_ready':
+                    futures['report'].set_result(_report_for(event['reports'], brand_name))
+        except BaseException as e:
+            for future in futures.values():
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+    follower = asyncio.ensure_future(follow())
+    _followers.add(follower)
+    follower.add_done_callback(_followers.discard)
+    return futures
+
+async def agenerate_competitor_intelligence(topic: str, brand_name: str, platforms: list = None,
+                                            use_cache: bool = True, on_event=None, resume=True) -> dict:
+    """
+    Async counterpart of generate_competitor_intelligence. Stages run on the
+    shared stage pool (see pipeline.MAX_CONCURRENT_STAGES), so one process can
+    keep many reports in flight while the event loop stays free.
+    `on_event` receives the report's stage events (see
+    iter_multi_brand_intelligence) on the event loop.
+    """
+    reports = await agenerate_multi_brand_intelligence(topic, [brand_name], platforms, use_cache, on_event, resume)
+    return _report_for(reports, brand_name)
+
+async def agenerate_multi_brand_intelligence(topic: str, brand_names: list, platforms: list = None,
+                                             use_cache: bool = True, on_event=None, resume=True) -> dict:
+    """
+    Async counterpart of generate_multi_brand_intelligence. Identical
+    requests in flight - sync or async - are joined, as there.
+    """
+    async for event in aiter_multi_brand_intelligence(topic, brand_names, platforms, use_cache, resume):
+        if event['type'] == 'report_ready':
+            return event['reports']
+        if on_event is not None and event['type'].startswith('stage_'):
+            on_event(event)
+
+async def aiter_multi_brand_intelligence(topic: str, brand_names: list, platforms: list = None,
+                                         use_cache: bool = True, resume=True):
+    """
+    Async form of iter_multi_brand_intelligence, with the same events and
+    the same in-flight runs to join. The run is driven by its own thread;
+    the caller's event loop only waits for its events.
+    """
+    key = request_flight_key(topic, brand_names, platforms, use_cache, resume)
+    async for event in get_single_flight().afollow(
+            key, lambda flight: _iter_plan(_plan_reports(topic, brand_names, platforms, use_cache, resume), flight)):
+        yield event
@@ -1,14 +1,83 @@
 from crewai.tools import tool
+from datetime import datetime, timezone
+
+from archetypes import niche_archetypes
+from corpus import get_corpus
+from gaps import score_gaps
+from trends import GROWTH_DAYS, SPIKE_Z, niche_trends
+from tool_cache import memoized_tool
+from tracing import traced_tool
+
+# How much of the local corpus the research tool hands to the agent
+RESEARCH_TOP_COMPETITORS = 8
+RESEARCH_POSTS_PER_COMPETITOR = 3
+SNIPPET_CHARS = 160
+
+def _format_post(post: dict) -> str:
+    snippet = " ".join(post['text'].split())
+    if len(snippet) > SNIPPET_CHARS:
+        snippet = snippet[:SNIPPET_CHARS].rstrip() + "…"
+    posted = (datetime.fromtimestamp(post['posted_at'], timezone.utc).strftime('%Y-%m-%d')
+              if post['posted_at'] else "undated")
+    details = ", ".join(part for part in [post['platform'], post['format'], posted] if part)
+    return (f'       - [{details}] "{snippet}" '
+            f"({post['likes']:,} likes, {post['comments']:,} comments, {post['shares']:,} shares"
+            + (f", {post['views']:,} views)" if post['views'] else ")"))
+
+def _corpus_research(topic: str):
+    """
+    Top competitors for the topic from the local corpus, or None when there
+    is no corpus or nothing in it matches.
+    """
+    corpus = get_corpus()
+    if corpus is None:
+        return None
+    competitors = corpus.top_competitors(topic, RESEARCH_TOP_COMPETITORS, RESEARCH_POSTS_PER_COMPETITOR)
+    if not competitors:
+        return None
+    
+    lines = [f"COMPETITOR RESEARCH FOR: {topic}",
+             f"Top {len(competitors)} competitors by relevance, from {len(corpus):,} posts in the local corpus:",
+             ""]
+    for rank, competitor in enumerate(competitors, 1):
+        profile = competitor['profile']
+        about = ", ".join(part for part in [
+            profile.get('platform'),
+            f"{profile['followers']:,} followers" if profile.get('followers') else None,
+        ] if part)
+        lines.append(f"    {rank}. {competitor['competitor']}" + (f" ({about})" if about else ""))
+        if profile.get('bio'):
+            lines.append(f"       Bio: {profile['bio']}")
+        lines.append(f"       {competitor['matching_posts']} matching posts, "
+                     f"avg engagement {competitor['avg_engagement']:,.0f} per post. Top posts:")
+        lines += [_format_post(post) for post in competitor['posts']]
+
+    # Large niches are summarized as archetypes rather than listed in full
+    archetypes = niche_archetypes(topic, corpus)
+    if archetypes:
+        lines += ["", f"COMPETITOR ARCHETYPES ({len(archetypes['archetypes'])} groups among the "
+                      f"{archetypes['competitors']} most similar competitors):"]
+        for archetype in archetypes['archetypes']:
+            lines.append(f"    - {' / '.join(archetype['label'])}: {archetype['competitors']} competitors, "
+                         f"{archetype['posts']:,} posts, avg engagement {archetype['avg_engagement']:,.0f}. "
+                         f"Representatives: {', '.join(archetype['representatives'])}")
+    return "\n".join(lines)
 
 @tool("Competitor Research Engine")
+@traced_tool
+@memoized_tool
 def research_competitors(topic: str) -> str:
     """
     Identifies top competitors and analyzes their content strategies in a given niche.
-    Simulates competitive intelligence gathering.
+    Ranks competitors from the local post corpus (see corpus.py) with their
+    best matching posts and engagement numbers, plus the archetypes the
+    wider set of similar competitors falls into (see archetypes.py).
     """
-    # In production, this would integrate with social media APIs, web scraping, etc.
-    # For now, using AI reasoning to simulate comprehensive market research
+    research_data = _corpus_research(topic)
+    if research_data:
+        return research_data
     
+    # No corpus loaded yet - fall back to letting the agent reason on its own
     research_data = f"""
     COMPETITOR RESEARCH FOR: {topic}
     
@@ -29,13 +98,63 @@ def research_competitors(topic: str) -> str:
     
     return research_data
 
+# How many rows of each trend table the agent gets
+TREND_TOP_HASHTAGS = 8
+TREND_TOP_FORMATS = 5
+TREND_TOP_SLOTS = 3
+
+def _format_signal(row: dict, last_day: int) -> str:
+    line = (f"engagement {row['engagement_growth']:+.0%}, posts {row['post_growth']:+.0%} "
+            f"vs previous {GROWTH_DAYS} days, momentum {row['momentum']:.2f}")
+    if row['spike_z'] >= SPIKE_Z:
+        spike_day = datetime.fromtimestamp(last_day + row['spike_day'] * 86400, timezone.utc)
+        line += f", spike z={row['spike_z']:.1f} on {spike_day:%Y-%m-%d}"
+    return line
+
+def _corpus_trends(topic: str):
+    """
+    Trend signals for the topic's niche from the local corpus, or None when
+    there is no corpus or no matching niche.
+    """
+    trends = niche_trends(topic)
+    if trends is None or not trends['hashtags']:
+        return None
+    
+    last_day = datetime.fromtimestamp(trends['last_day'], timezone.utc)
+    lines = [f"TREND ANALYSIS FOR: {topic}",
+             f"Last {trends['window_days']} days of the local corpus up to {last_day:%Y-%m-%d}, "
+             f"{trends['tagged_posts']:,} tagged posts. Momentum > 1 means engagement is accelerating.",
+             "",
+             "    Hashtags by momentum:"]
+    lines += [f"    - #{row['name']}: {_format_signal(row, trends['last_day'])}"
+              for row in trends['hashtags'][:TREND_TOP_HASHTAGS]]
+    lines += ["", "    Formats by momentum:"]
+    lines += [f"    - {row['name']}: {_format_signal(row, trends['last_day'])}"
+              for row in trends['formats'][:TREND_TOP_FORMATS]]
+    if trends['best_hours']:
+        lines += ["", "    Best posting hours (UTC): " + ", ".join(
+            f"{slot['slot']} ({slot['avg_engagement']:,.0f} avg engagement)"
+            for slot in trends['best_hours'][:TREND_TOP_SLOTS])]
+    if trends['best_days']:
+        lines.append("    Best posting days: " + ", ".join(
+            f"{slot['slot']} ({slot['avg_engagement']:,.0f})" for slot in trends['best_days'][:TREND_TOP_SLOTS]))
+    return "\n".join(lines)
+
 @tool("Trend Analysis Engine")
+@traced_tool
+@memoized_tool
 def analyze_trends(topic: str) -> str:
     """
     Analyzes current content trends, viral angles, and winning formats
     in the specified topic area.
+    Computes hashtag and format growth, momentum, engagement spikes and best
+    posting times from the local post corpus (see trends.py).
     """
+    trend_analysis = _corpus_trends(topic)
+    if trend_analysis:
+        return trend_analysis
     
+    # No corpus loaded yet - fall back to letting the agent reason on its own
     trend_analysis = f"""
     TREND ANALYSIS FOR: {topic}
     
@@ -51,13 +170,50 @@ def analyze_trends(topic: str) -> str:
     
     return trend_analysis
 
+# Gaps handed to the agent
+GAP_TOP_SUBTOPICS = 10
+
+def _corpus_gaps(topic: str, competitors_list: str):
+    """
+    Ranked high-demand, low-supply subtopics from the local corpus, or None
+    when there is no corpus or nothing matches.
+    """
+    result = score_gaps(topic, competitors_list, GAP_TOP_SUBTOPICS)
+    if result is None or not result['gaps']:
+        return None
+    
+    scope = (f"{result['competitors']} of the named competitors" if result['named_competitors']
+             else f"{result['competitors']} competitors")
+    lines = [f"GAP ANALYSIS FOR: {topic}",
+             f"{result['subtopics']:,} subtopics scored across {scope} and {result['posts']:,} niche posts. "
+             f"Gap score = engagement lift x share of competitors not covering the subtopic.",
+             ""]
+    for rank, gap in enumerate(result['gaps'], 1):
+        covered = ", ".join(f"{name} {share:.0%}" for name, share in gap['covered_by'])
+        lines.append(f"    {rank}. \"{gap['subtopic']}\" - score {gap['score']:.2f}: "
+                     f"{gap['engagement_lift']:.1f}x niche engagement over {gap['posts']} posts, "
+                     f"covered by {gap['covering']}/{result['competitors']} competitors"
+                     + (f" ({covered})" if covered else ""))
+        if gap['missed_by']:
+            lines.append(f"       Missed by: {', '.join(gap['missed_by'])}")
+    return "\n".join(lines)
+
 @tool("Gap Finder")
+@traced_tool
+@memoized_tool
 def find_content_gaps(topic: str, competitors_list: str) -> str:
     """
     Identifies content gaps, missed opportunities, and weaknesses
     in competitor strategies.
+    Scores subtopics from the local post corpus by audience demand against
+    competitor coverage (see gaps.py); name competitors, comma separated,
+    to measure coverage among just those.
     """
+    gap_analysis = _corpus_gaps(topic, competitors_list)
+    if gap_analysis:
+        return gap_analysis
     
+    # No corpus loaded yet - fall back to letting the agent reason on its own
     gap_analysis = f"""
     GAP ANALYSIS FOR: {topic}
     
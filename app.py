@@ -3,7 +3,10 @@ import time
 
 # Import agents after Streamlit is loaded
 try:
-    from agents import generate_competitor_intelligence
+    from agents import PLATFORM_LABELS, regenerate_flight_key, request_flight_key
+    from cache import get_report_cache
+    from jobs import ensure_workers, follow, get_job_queue
+    from rate_limit import get_rate_limiter
 except Exception as e:
     st.error(f"❌ Error loading agents: {str(e)}")
     st.stop()
@@ -403,120 +406,81 @@ st.markdown('''
 # Spacer
 st.markdown("<br>", unsafe_allow_html=True)
 
-# Input Form
-with st.form("intelligence_form", clear_on_submit=False):
-    col1, col2 = st.columns(2, gap="large")
-    
-    with col1:
-        topic = st.text_input(
-            "🎯 Topic or Niche",
-            placeholder="e.g., AI productivity tools, sustainable fashion",
-            help="Enter the industry or niche you want to analyze",
-            label_visibility="visible"
-        )
-    
-    with col2:
-        brand_name = st.text_input(
-            "🏢 Your Brand Name",
-            placeholder="e.g., TechVision, GreenStyle",
-            help="Your company or personal brand name",
-            label_visibility="visible"
-        )
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    submit = st.form_submit_button("🚀 Generate Intelligence Report", use_container_width=True)
+# Result sections in tab order: (result key, tab label, header)
+REPORT_SECTIONS = [
+    ('competitor_research', "🔍 Competitor Research", "Competitive Intelligence Report"),
+    ('trend_analysis', "📈 Trend Analysis", "Trending Content Patterns"),
+    ('content_gaps', "🎯 Content Gaps", "Strategic Content Gaps"),
+    ('content_ideas', "💡 Content Ideas (25-30)", "Unique Content Ideas"),
+    ('platform_posts', "✍️ Platform Posts", "Ready-to-Publish Posts"),
+]
 
-# Process Submission
-if submit:
-    if not topic or not brand_name:
-        st.error("⚠️ Please fill in both fields to continue!")
+# Status cards for the agent behind each stage
+STAGE_AGENTS = {
+    'competitor_research': ("🔍 Competitive Intelligence Researcher", "Analyzing top competitors and their strategies..."),
+    'trend_analysis': ("📊 Trend Analysis Specialist", "Identifying viral patterns and engagement drivers..."),
+    'content_gaps': ("🎯 Strategic Gap Analyzer", "Finding underserved opportunities..."),
+    'content_ideas': ("💡 Content Strategist", "Generating 25-30 unique content ideas..."),
+}
+
+def agent_card(section: str, brand_name: str = None) -> str:
+    if section.startswith('post_'):
+        agent_name = "✍️ Multi-Platform Writer"
+        agent_desc = f"Crafting the {PLATFORM_LABELS[section[len('post_'):]]}..."
     else:
-        # Progress Section
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        with st.container():
-            st.markdown('<div class="progress-container">', unsafe_allow_html=True)
-            st.markdown("### 🤖 AI Agents Working")
-            st.markdown("*Watch our intelligent agents collaborate in real-time*")
-            
-            progress_bar = st.progress(0, text="Initializing agents...")
-            status_placeholder = st.empty()
-            
-            # Agent Progress Animation
-            agents = [
-                ("🔍 Competitive Intelligence Researcher", "Analyzing top competitors and their strategies..."),
-                ("📊 Trend Analysis Specialist", "Identifying viral patterns and engagement drivers..."),
-                ("🎯 Strategic Gap Analyzer", "Finding underserved opportunities..."),
-                ("💡 Content Strategist", "Generating 25-30 unique content ideas..."),
-                ("✍️ Multi-Platform Writer", "Crafting platform-optimized posts...")
-            ]
-            
-            for i, (agent_name, agent_desc) in enumerate(agents):
-                progress = int((i + 1) / len(agents) * 100)
-                progress_bar.progress(progress, text=f"Agent {i+1}/5 Active")
-                
-                status_placeholder.markdown(f'''
-                <div class="agent-card">
-                    <strong>{agent_name}</strong><br>
-                    <small>{agent_desc}</small>
-                </div>
-                ''', unsafe_allow_html=True)
-                
-                time.sleep(0.8)
-            
-            # Execute AI Crew
-            try:
-                with st.spinner("🧠 Deep analysis in progress..."):
-                    result = generate_competitor_intelligence(topic, brand_name)
-                
-                progress_bar.progress(100, text="✅ Complete!")
-                status_placeholder.success("🎉 **All agents completed successfully!**")
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Results Section
-                st.markdown("<br><br>", unsafe_allow_html=True)
-                st.balloons()
-                
-                st.markdown('''
-                <div class="success-box">
-                    <h2>✅ Intelligence Report Generated</h2>
-                    <p>Your comprehensive content strategy is ready</p>
-                </div>
-                ''', unsafe_allow_html=True)
-                
-                # Tabs for Results
-                tab1, tab2, tab3, tab4, tab5 = st.tabs([
-                    "🔍 Competitor Research",
-                    "📈 Trend Analysis",
-                    "🎯 Content Gaps",
-                    "💡 Content Ideas (25-30)",
-                    "✍️ Platform Posts (5)"
-                ])
-                
-                with tab1:
-                    st.markdown('<p class="result-header">Competitive Intelligence Report</p>', unsafe_allow_html=True)
-                    st.markdown(str(result.get('competitor_research', 'No data available')))
-                
-                with tab2:
-                    st.markdown('<p class="result-header">Trending Content Patterns</p>', unsafe_allow_html=True)
-                    st.markdown(str(result.get('trend_analysis', 'No data available')))
-                
-                with tab3:
-                    st.markdown('<p class="result-header">Strategic Content Gaps</p>', unsafe_allow_html=True)
-                    st.markdown(str(result.get('content_gaps', 'No data available')))
-                
-                with tab4:
-                    st.markdown('<p class="result-header">Unique Content Ideas</p>', unsafe_allow_html=True)
-                    st.markdown(str(result.get('content_ideas', 'No data available')))
-                
-                with tab5:
-                    st.markdown('<p class="result-header">Ready-to-Publish Posts</p>', unsafe_allow_html=True)
-                    st.markdown(str(result.get('platform_posts', 'No data available')))
-                
-                # Download Section
-                st.markdown("<br><br>", unsafe_allow_html=True)
-                
-                full_report = f"""
+        agent_name, agent_desc = STAGE_AGENTS.get(section, ("⚙️ Pipeline", "Assembling results..."))
+    if brand_name:
+        agent_desc = f"{brand_name} · {agent_desc}"
+    return f'''
+    <div class="agent-card">
+        <strong>{agent_name}</strong><br>
+        <small>{agent_desc}</small>
+    </div>
+    '''
+
+def create_report_view(platforms: list) -> dict:
+    """
+    Lays out one brand's result tabs up front with an empty slot per section,
+    so each section can be filled in as soon as its agent finishes.
+    """
+    view = {'notice': st.empty(), 'actions': {}}
+    tabs = st.tabs([
+        f"✍️ Platform Posts ({len(platforms)})" if section == 'platform_posts' else label
+        for section, label, _ in REPORT_SECTIONS
+    ])
+    for tab, (section, _, header) in zip(tabs, REPORT_SECTIONS):
+        with tab:
+            st.markdown(f'<p class="result-header">{header}</p>', unsafe_allow_html=True)
+            view[section] = st.empty()
+            view[section].caption("⏳ Waiting for the agent...")
+            view['actions'][section] = st.empty()
+    view['download'] = st.empty()
+    view['posts'] = {}
+    view['platforms'] = platforms
+    return view
+
+def fill_report_view(view: dict, section: str, output: str):
+    """
+    Shows a finished stage in its tab. Platform posts appear one by one as
+    each writer finishes, then get replaced by the merged section.
+    """
+    if section.startswith('post_'):
+        view['posts'][section[len('post_'):]] = output
+        view['platform_posts'].markdown("\n\n---\n\n".join(
+            f"## {PLATFORM_LABELS[platform].upper()}\n\n{view['posts'][platform]}"
+            for platform in view['platforms'] if platform in view['posts']
+        ))
+    elif section in view:
+        view[section].markdown(str(output))
+
+def render_download(view: dict, result: dict, topic: str, brand_name: str, key: str = "report"):
+    """
+    Adds the markdown download button for a finished report.
+    """
+    if result.get('cached'):
+        view['notice'].info("⚡ Served from the report cache - untick \"Reuse a cached report\" to regenerate.")
+    
+    full_report = f"""
 # 🌙 COMPETITOR INTELLIGENCE REPORT
 **Topic:** {topic}
 **Brand:** {brand_name}
@@ -547,22 +511,367 @@ if submit:
 ## ✍️ PLATFORM POSTS
 {result.get('platform_posts', 'N/A')}
 """
-                
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    st.download_button(
-                        label="📥 Download Complete Report",
-                        data=full_report,
-                        file_name=f"competitor_intelligence_{topic.replace(' ', '_')}.md",
-                        mime="text/markdown",
-                        use_container_width=True
-                    )
-                
-            except Exception as e:
-                progress_bar.empty()
-                status_placeholder.error(f"❌ **Error:** {str(e)}")
-                st.error(f"**Details:** {str(e)}")
-                st.info("💡 Tip: Verify your API key is valid and has sufficient quota.")
+    
+    with view['download'].container():
+        st.markdown("<br><br>", unsafe_allow_html=True)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.download_button(
+                label="📥 Download Complete Report",
+                data=full_report,
+                file_name=f"competitor_intelligence_{topic.replace(' ', '_')}_{brand_name.replace(' ', '_')}.md",
+                mime="text/markdown",
+                use_container_width=True,
+                key=f"download_{key}"
+            )
+
+def queue_resume(request: dict):
+    """
+    Resume button callback: the next script run picks the request up and
+    resumes its failed run instead of waiting for the form.
+    """
+    st.session_state['resume_request'] = request
+
+def queue_regenerate(request: dict):
+    """
+    Regenerate button callback - like queue_resume, for one report section.
+    """
+    st.session_state['regenerate_request'] = request
+
+def render_regenerate(view: dict, result: dict, request: dict, brand_name: str, key: str = "report"):
+    """
+    Puts a Regenerate button under each section of a finished report. It
+    re-runs that section and the ones built on it, keeping everything else.
+    """
+    if not result.get('run_id'):
+        return  # served from the report cache - there are no checkpoints to build on
+    for section, label, _ in REPORT_SECTIONS:
+        view['actions'][section].button(
+            "🔁 Regenerate",
+            key=f"regenerate_{key}_{section}",
+            on_click=queue_regenerate,
+            args=({**request, 'run_id': result['run_id'], 'section': section, 'brand_name': brand_name},),
+            help="Re-run this section and the sections that build on it, keeping the rest"
+        )
+
+def render_performance(trace: dict):
+    """
+    Collapsible panel with the run's stage timeline and its token/cost
+    breakdown, from the trace attached to every report.
+    """
+    import altair as alt
+
+    totals = trace['totals']
+    with st.expander("⏱️ Performance"):
+        stat1, stat2, stat3, stat4 = st.columns(4)
+        stat1.metric("Wall Time", f"{trace['wall_s']:.1f}s")
+        stat2.metric("LLM Calls", totals['llm_calls'])
+        stat3.metric("Tokens (in / out)", f"{totals['prompt_tokens']:,} / {totals['completion_tokens']:,}")
+        stat4.metric("Est. Cost", f"${totals['cost_usd']:.4f}")
+
+        escalated = [f"{stage['stage']} ({stage['escalation_reason']})" for stage in trace['stages']
+                     if stage['escalation_reason']]
+        if escalated:
+            st.caption(f"⬆️ Failed validation on the fast model: {'; '.join(escalated)}")
+
+        restored = [stage['stage'] for stage in trace['stages'] if stage['status'] == 'restored']
+        if restored:
+            st.caption(f"♻️ Kept {len(restored)} stage(s) from earlier in this run: {', '.join(restored)}")
+
+        stages = [stage for stage in trace['stages'] if stage.get('started_offset_s') is not None]
+        if not stages:
+            st.caption("Every report came from the cache - no agents ran.")
+            return
+
+        timeline = [
+            {'stage': stage['stage'], 'phase': phase, 'start': start, 'end': end}
+            for stage in stages
+            for phase, start, end in [
+                ('queued', stage['queued_offset_s'], stage['started_offset_s']),
+                ('running', stage['started_offset_s'], stage.get('finished_offset_s', trace['wall_s'])),
+            ]
+        ]
+        st.altair_chart(
+            alt.Chart(alt.Data(values=timeline)).mark_bar().encode(
+                x=alt.X('start:Q', title="Seconds since start"),
+                x2='end:Q',
+                y=alt.Y('stage:N', sort=[stage['stage'] for stage in stages], title=None),
+                color=alt.Color('phase:N', scale=alt.Scale(domain=['queued', 'running'],
+                                                           range=['#4c3d77', '#a78bfa'])),
+                tooltip=['stage:N', 'phase:N', 'start:Q', 'end:Q'],
+            ),
+            use_container_width=True
+        )
+
+        st.dataframe([
+            {
+                'Stage': stage['stage'],
+                'Status': stage['status'],
+                'Model': stage['model'] or '',
+                'Wall (s)': round(stage['wall_s'], 2),
+                'Queued (s)': round(stage['queue_s'], 2),
+                'LLM Calls': stage['llm_calls'],
+                'Prompt Tokens': stage['prompt_tokens'],
+                'Completion Tokens': stage['completion_tokens'],
+                'Tool Calls': stage['tool_calls'],
+                'Tool Cache Hits': stage['tool_cache_hits'],
+                'Retries': stage['retries'],
+                'Hedges': stage['hedges'],
+                'Fallbacks': stage['fallbacks'],
+                'Rate Wait (s)': round(stage['rate_wait_s'], 2),
+                'Escalated': '⬆️' if stage['escalations'] else '',
+                'Over Budget': ', '.join(stage['over_budget']),
+                'Cost ($)': round(stage['cost_usd'], 5),
+            }
+            for stage in stages
+        ], use_container_width=True, hide_index=True)
+        st.caption(f"Run {trace['run_id']} · token counts are estimates · cost uses "
+                   f"LLM_PRICE_PER_MTOK_INPUT / LLM_PRICE_PER_MTOK_OUTPUT")
+
+# Analysis Mode - agencies can run one niche for several client brands and
+# share the topic-level research between them
+mode = st.radio(
+    "Mode",
+    ["🏢 Single Brand", "🏢🏢 Multiple Brands"],
+    horizontal=True,
+    label_visibility="collapsed"
+)
+multi_brand = mode != "🏢 Single Brand"
+
+# Input Form
+with st.form("intelligence_form", clear_on_submit=False):
+    col1, col2 = st.columns(2, gap="large")
+    
+    with col1:
+        topic = st.text_input(
+            "🎯 Topic or Niche",
+            placeholder="e.g., AI productivity tools, sustainable fashion",
+            help="Enter the industry or niche you want to analyze",
+            label_visibility="visible"
+        )
+    
+    with col2:
+        if multi_brand:
+            brand_input = st.text_area(
+                "🏢 Brand Names (one per line)",
+                placeholder="TechVision\nGreenStyle",
+                help="Research and trends are shared; gaps, ideas and posts are written for each brand"
+            )
+            brand_names = [line.strip() for line in brand_input.splitlines() if line.strip()]
+        else:
+            brand_name = st.text_input(
+                "🏢 Your Brand Name",
+                placeholder="e.g., TechVision, GreenStyle",
+                help="Your company or personal brand name",
+                label_visibility="visible"
+            )
+            brand_names = [brand_name] if brand_name.strip() else []
+    
+    platforms = st.multiselect(
+        "📱 Platforms",
+        options=list(PLATFORM_LABELS),
+        default=list(PLATFORM_LABELS),
+        format_func=lambda platform: PLATFORM_LABELS[platform],
+        help="Only the selected platforms get a written post"
+    )
+    
+    use_cache = st.checkbox(
+        "♻️ Reuse a cached report if one exists",
+        value=True,
+        help="Untick to run every agent again and refresh the cached copy"
+    )
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    submit = st.form_submit_button("🚀 Generate Intelligence Report", use_container_width=True)
+
+# Report cache controls
+with st.expander("⚡ Report Cache"):
+    report_cache = get_report_cache()
+    cache_stats = report_cache.stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Cached Reports", cache_stats['entries'])
+    stat2.metric("Hits", cache_stats['hits'])
+    stat3.metric("Misses", cache_stats['misses'])
+    stat4.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    if st.button("🗑️ Clear Cache"):
+        removed = report_cache.invalidate()
+        st.success(f"Removed {removed} cached report(s)")
+
+# Shared LLM rate limits (see rate_limit.py)
+with st.expander("🚦 LLM Rate Limits"):
+    limits = get_rate_limiter().stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Waiting (interactive)", limits['waiting']['interactive'])
+    stat2.metric("Waiting (batch)", limits['waiting']['batch'])
+    stat3.metric("Requests Available", "∞" if limits['requests_available'] is None
+                 else f"{limits['requests_available']:.0f}",
+                 help=f"Limit: {limits['requests_per_minute']:,.0f} per minute (LLM_REQUESTS_PER_MINUTE)")
+    stat4.metric("Tokens Available", "∞" if limits['tokens_available'] is None
+                 else f"{limits['tokens_available']:,.0f}",
+                 help=f"Limit: {limits['tokens_per_minute']:,.0f} per minute (LLM_TOKENS_PER_MINUTE)")
+
+# A failed run queued for resuming, or a section queued for regenerating,
+# replaces the form's inputs
+resume_request = st.session_state.pop('resume_request', None)
+regenerate_request = st.session_state.pop('regenerate_request', None)
+queued_request = resume_request or regenerate_request
+if queued_request:
+    topic, brand_names, platforms = queued_request['topic'], queued_request['brand_names'], queued_request['platforms']
+
+# Reports run as background jobs (see jobs.py). The job id is kept in the
+# URL, so a refresh or a dropped connection picks the run up where it is
+job_queue = get_job_queue()
+if submit or queued_request:
+    if not topic or not brand_names:
+        st.error("⚠️ Please fill in both fields to continue!")
+    elif not platforms:
+        st.error("⚠️ Please select at least one platform!")
+    else:
+        # The same request already queued or running elsewhere (another tab,
+        # another user) is joined instead of run again
+        if regenerate_request:
+            new_job = job_queue.submit('regenerate', regenerate_request, regenerate_flight_key(
+                regenerate_request['run_id'], regenerate_request['section'], regenerate_request['brand_name']))
+        else:
+            # Unticking the cache also starts over instead of resuming an
+            # earlier failed run of the same request
+            resume = resume_request['run_id'] if resume_request else use_cache
+            new_job = job_queue.submit('report', {
+                'topic': topic, 'brand_names': brand_names, 'platforms': platforms, 'use_cache': use_cache,
+                'resume': resume,
+            }, request_flight_key(topic, brand_names, platforms, use_cache, resume))
+        ensure_workers()
+        st.query_params['job'] = new_job
+
+job_id = st.query_params.get('job')
+job = job_queue.job(job_id) if job_id else None
+if job_id and job is None:
+    st.warning("⌛ That report job has expired - generate the report again.")
+    del st.query_params['job']
+
+# Process the job
+if job:
+    topic, brand_names, platforms = job['request']['topic'], job['request']['brand_names'], job['request']['platforms']
+    # Only celebrate runs finishing now, not ones replayed after a rerun
+    live = job['status'] in ('queued', 'running')
+    
+    # Progress Section
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    with st.container():
+        st.markdown('<div class="progress-container">', unsafe_allow_html=True)
+        st.markdown("### 🤖 AI Agents Working")
+        st.markdown("*Watch our intelligent agents collaborate in real-time*")
+        
+        progress_bar = st.progress(0, text="Initializing agents...")
+        status_placeholder = st.empty()
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Results Section - laid out before the run and filled in live
+    st.markdown("<br><br>", unsafe_allow_html=True)
+    banner_placeholder = st.empty()
+    
+    # Follow the job, streaming each stage as it completes
+    try:
+        views = {}
+        running = {}
+        finished = 0
+        total = 0
+        run_id = job['run_id']
+        reports = None
+        
+        for event in follow(job_id):
+            if event['type'] == 'job_queued':
+                status_placeholder.info(f"⏳ Waiting for a free worker - {event['ahead']} report(s) ahead")
+            
+            elif event['type'] == 'job_restarted':
+                st.rerun()  # its worker was lost - show the retry from the start
+            
+            elif event['type'] == 'planned':
+                total = len(event['stages'])
+                run_id = event['run_id']
+                if len(event['brands']) == 1:
+                    views[event['brands'][0]] = create_report_view(platforms)
+                else:
+                    brand_tabs = st.tabs([f"🏢 {brand_name}" for brand_name in event['brands']])
+                    for brand_tab, brand_name in zip(brand_tabs, event['brands']):
+                        with brand_tab:
+                            views[brand_name] = create_report_view(platforms)
+            
+            elif event['type'] == 'stage_started':
+                running[event['stage']] = agent_card(event['section'], event['brand'] if len(views) > 1 else None)
+            
+            elif event['type'] in ('stage_finished', 'stage_restored'):
+                running.pop(event['stage'], None)
+                if not event.get('cached'):
+                    finished += 1
+                # Topic stages (brand None) are shared by every brand
+                for brand_name, view in views.items():
+                    if event['brand'] in (None, brand_name):
+                        fill_report_view(view, event['section'], event['output'])
+            
+            elif event['type'] == 'report_ready':
+                reports = event['reports']
+            
+            if total:
+                progress_bar.progress(int(finished / total * 100),
+                                      text=f"{finished}/{total} agent tasks complete")
+            if running:
+                status_placeholder.markdown("".join(running.values()), unsafe_allow_html=True)
+        
+        if reports is None:
+            # The job finished without its report_ready event (e.g. its events
+            # were dropped on a restart) - fall back to the stored result
+            reports = (job_queue.job(job_id) or {}).get('result')
+            if not reports:
+                raise RuntimeError("The job finished without a report - please generate it again.")
+            for brand_name, result in reports.items():
+                if brand_name not in views:
+                    views[brand_name] = create_report_view(platforms)
+                for section, _, _ in REPORT_SECTIONS:
+                    fill_report_view(views[brand_name], section, result.get(section, ''))
+        
+        progress_bar.progress(100, text="✅ Complete!")
+        status_placeholder.success("🎉 **All agents completed successfully!**")
+        if live:
+            st.balloons()
+        
+        banner_placeholder.markdown('''
+        <div class="success-box">
+            <h2>✅ Intelligence Report Generated</h2>
+            <p>Your comprehensive content strategy is ready</p>
+        </div>
+        ''', unsafe_allow_html=True)
+        
+        trace = next(iter(reports.values()))['trace']
+        shared = job_queue.job(job_id)['waiters'] + trace.get('coalesced', 0)
+        if shared:
+            st.caption(f"👥 {shared} identical request(s) joined this run instead of starting their own")
+        reused = next(iter(reports.values())).get('reused_topic')
+        if reused:
+            st.caption(f"🔁 Competitor research and trends reused from the similar topic "
+                       f"\"{reused['topic']}\" (similarity {reused['similarity']:.2f})")
+        
+        request = {'topic': topic, 'brand_names': brand_names, 'platforms': platforms}
+        for i, (brand_name, result) in enumerate(reports.items()):
+            render_download(views[brand_name], result, topic, brand_name, key=f"brand_{i}")
+            render_regenerate(views[brand_name], result, request, brand_name, key=f"brand_{i}")
+
+        # One run, one trace - every report carries the same one
+        render_performance(trace)
+
+    except Exception as e:
+        progress_bar.empty()
+        status_placeholder.error(f"❌ **Error:** {str(e)}")
+        st.error(f"**Details:** {str(e)}")
+        st.info("💡 Tip: Verify your API key is valid and has sufficient quota.")
+        if run_id:
+            st.button(
+                "🔄 Resume",
+                on_click=queue_resume,
+                args=({'topic': topic, 'brand_names': brand_names, 'platforms': platforms, 'run_id': run_id},),
+                help="Run only the stages that did not finish - finished ones are kept"
+            )
 
 # Footer
 st.markdown('''
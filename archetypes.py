@@ -0,0 +1,250 @@
+"""
+Competitor archetypes for large niches.
+
+Every competitor gets a hashed embedding of its TF-IDF profile (the
+coverage rows from gaps.py, see embeddings.py), kept in an IVF index under
+<corpus>/competitors. For a topic the index returns the most similar
+competitors in sub-linear time, k-means groups them into a few archetypes,
+and only each archetype's representatives - the members closest to its
+centroid - go to the agent.
+
+Each competitor's summed coverage, post count and engagement are stored
+next to the index, by competitor id, so a query never goes back to the
+posts. When posts are appended only those are folded in: their
+competitors' profiles are updated and re-added to the existing buckets,
+which are retrained once they have become unbalanced. Appended posts are
+weighted with the IDF the profiles were built with, stored alongside
+them; once the corpus's own IDF has drifted too far from it, everything
+is rebuilt.
+"""
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from corpus import get_corpus, tokenize
+from embeddings import IVFIndex, hashing_projection, kmeans, normalize_rows
+from gaps import coverage_matrix, term_idf
+
+# Similar competitors fetched from the index for a topic, the archetypes
+# they are grouped into, and what is shown per archetype
+ARCHETYPE_CANDIDATES = 500
+ARCHETYPES = 6
+REPRESENTATIVES = 2
+LABEL_TERMS = 4
+
+# Below this many similar competitors a plain list is clearer
+MIN_COMPETITORS = 12
+
+# Index buckets scanned per lookup
+NPROBE = 8
+
+# Change of the corpus IDF against the one the stored profiles use
+# (sum of absolute changes / sum of stored weights) that forces a rebuild
+IDF_DRIFT_REBUILD = 0.05
+
+# Competitor profiles stored next to the index: summed coverage rows (CSR,
+# competitors x terms), posts and engagement, by competitor id, and the IDF
+# per term they were weighted with
+PROFILE_ARRAYS = {
+    'sums_data': '<f4',
+    'sums_indices': '<i4',
+    'sums_indptr': '<i8',
+    'posts': '<f8',
+    'engagement': '<f8',
+    'idf': '<f4',
+}
+
+
+def _padded(values: np.ndarray, size: int) -> np.ndarray:
+    # Competitors added to the dictionary since get zeros
+    return np.concatenate([values, np.zeros(size - len(values))])
+
+
+class CompetitorIndex:
+    """
+    The IVF index of competitor embeddings for one corpus, plus every
+    competitor's profile, brought up to date with the posts appended since
+    they were saved.
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.projection = hashing_projection(corpus.terms())
+        self.idf = term_idf(corpus)
+        self.index = IVFIndex(os.path.join(corpus.directory, 'competitors'))
+        indexed = self.index.meta.get('posts')
+        if indexed == len(corpus) and self._load_profiles():
+            pass
+        elif indexed and indexed < len(corpus) and self._load_profiles():
+            self._extend(indexed)
+        else:
+            self._rebuild()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index.directory, name)
+
+    def _load_profiles(self) -> bool:
+        shapes = self.index.meta.get('profiles')
+        if not shapes:
+            return False
+        arrays = {}
+        for name, dtype in PROFILE_ARRAYS.items():
+            path = self._path(f'{name}.bin')
+            if not os.path.exists(path) or os.path.getsize(path) != shapes[name] * np.dtype(dtype).itemsize:
+                return False  # saved by an older version, or cut short
+            arrays[name] = np.fromfile(path, dtype=dtype, count=shapes[name])
+        self.sums = sparse.csr_matrix((arrays['sums_data'], arrays['sums_indices'], arrays['sums_indptr']),
+                                      shape=tuple(shapes['sums']))
+        self.posts, self.engagement = arrays['posts'], arrays['engagement']
+        self.profile_idf = arrays['idf']
+        return True
+
+    def _save(self) -> None:
+        os.makedirs(self.index.directory, exist_ok=True)
+        arrays = {'sums_data': self.sums.data, 'sums_indices': self.sums.indices, 'sums_indptr': self.sums.indptr,
+                  'posts': self.posts, 'engagement': self.engagement, 'idf': self.profile_idf}
+        for name, dtype in PROFILE_ARRAYS.items():
+            path = self._path(f'{name}.bin')
+            np.asarray(arrays[name], dtype=dtype).tofile(f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+        shapes = {name: len(array) for name, array in arrays.items()}
+        self.index.save(posts=len(self.corpus), profiles={**shapes, 'sums': list(self.sums.shape)})
+
+    def _fold(self, docs: np.ndarray) -> np.ndarray:
+        # Adds the posts to their competitors' profiles; returns those competitors
+        competitors = len(self.corpus.dictionaries['competitor'])
+        terms = len(self.corpus.terms())
+        coverage, owners, posts = coverage_matrix(self.corpus, docs, idf=self.profile_idf)
+        totals = (sparse.diags(posts) @ coverage).tocoo()
+        self.sums.resize((competitors, terms))
+        self.sums = (self.sums + sparse.csr_matrix((totals.data, (owners[totals.row], totals.col)),
+                                                   shape=(competitors, terms))).tocsr()
+        self.posts = _padded(self.posts, competitors)
+        self.posts[owners] += posts
+        self.engagement = _padded(self.engagement, competitors) + np.bincount(
+            self.corpus.column('competitor')[docs].astype(np.int64), weights=self.corpus.engagement[docs],
+            minlength=competitors)
+        return owners
+
+    def _rebuild(self) -> None:
+        self.sums = sparse.csr_matrix((len(self.corpus.dictionaries['competitor']), len(self.corpus.terms())),
+                                      dtype=np.float32)
+        self.posts = self.engagement = np.zeros(0)
+        self.profile_idf = self.idf
+        competitors = self._fold(np.arange(len(self.corpus)))
+        self.index.build(competitors, self.embed(self.coverage(competitors)))
+        self._save()
+
+    def idf_drift(self) -> float:
+        """
+        How far the corpus IDF has moved from the one the stored profiles
+        were weighted with (see IDF_DRIFT_REBUILD).
+        """
+        stored = self.profile_idf.astype(np.float64)
+        return float(np.abs(self.idf[:len(stored)] - stored).sum() / max(stored.sum(), 1e-9))
+
+    def _extend(self, indexed: int) -> None:
+        if len(self.profile_idf) > len(self.idf) or self.idf_drift() > IDF_DRIFT_REBUILD:
+            self._rebuild()
+            return
+        # Only the new posts are read, weighted like the stored ones (terms
+        # new to the index with their current IDF); the competitors they
+        # belong to move (or are added) to the nearest existing bucket
+        self.profile_idf = np.concatenate([self.profile_idf, self.idf[len(self.profile_idf):]])
+        competitors = self._fold(np.arange(indexed, len(self.corpus)))
+        self.index.add(competitors, self.embed(self.coverage(competitors)))
+        if not self.index.balanced():
+            self.index.build(self.index.ids, self.index.vectors)
+        self._save()
+
+    def coverage(self, competitors: np.ndarray):
+        """
+        The competitors' coverage rows (see gaps.coverage_matrix).
+        """
+        return sparse.diags(1 / np.maximum(self.posts[competitors], 1)) @ self.sums[competitors]
+
+    def vectors(self, competitors: np.ndarray) -> np.ndarray:
+        """
+        The competitors' embeddings, as stored in the index.
+        """
+        order = np.argsort(self.index.ids)
+        return self.index.vectors[order[np.searchsorted(self.index.ids, competitors, sorter=order)]]
+
+    def embed(self, coverage) -> np.ndarray:
+        return normalize_rows(np.asarray((coverage @ self.projection).todense(), dtype=np.float32))
+
+    def embed_topic(self, topic: str) -> np.ndarray:
+        terms = [self.corpus.term_id(token) for token in set(tokenize(topic))]
+        terms = [term for term in terms if term is not None]
+        if not terms:
+            return None
+        vector = np.asarray(self.projection[terms].T @ self.idf[terms]).ravel()
+        norm = np.linalg.norm(vector)
+        return (vector / norm).astype(np.float32) if norm else None
+
+    def similar(self, topic: str, k: int = ARCHETYPE_CANDIDATES) -> np.ndarray:
+        """
+        Ids of up to k competitors whose content is closest to the topic.
+        """
+        query = self.embed_topic(topic)
+        if query is None:
+            return np.zeros(0, dtype=np.int64)
+        ids, similarities = self.index.search(query, k, NPROBE)
+        return ids[similarities > 0]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_competitor_index(corpus) -> CompetitorIndex:
+    with _indexes_lock:
+        cached = _indexes.get(corpus.directory)
+        if cached is None or cached.corpus is not corpus:
+            cached = _indexes[corpus.directory] = CompetitorIndex(corpus)
+        return cached
+
+
+def niche_archetypes(topic: str, corpus=None) -> dict:
+    """
+    Archetypes among the competitors most similar to the topic, or None when
+    there is no corpus or too few similar competitors to be worth grouping.
+    Each archetype has a label (its most characteristic terms), its size,
+    average engagement per post and its representatives.
+    """
+    corpus = corpus or get_corpus()
+    if corpus is None:
+        return None
+    index = get_competitor_index(corpus)
+    similar = index.similar(topic)
+    if len(similar) < MIN_COMPETITORS:
+        return None
+
+    competitors = np.sort(similar)
+    coverage = index.coverage(competitors).tocsr()
+    posts, engagement = index.posts[competitors], index.engagement[competitors]
+    vectors = index.vectors(competitors)
+    centroids, labels = kmeans(vectors, min(ARCHETYPES, len(competitors) // 3))
+    fit = np.einsum('ij,ij->i', vectors, centroids[labels])
+
+    names = corpus.dictionaries['competitor']
+    terms = corpus.terms()
+    skip = {corpus.term_id(token) for token in tokenize(topic)}
+    archetypes = []
+    for cluster in np.argsort(-np.bincount(labels, minlength=len(centroids)), kind='stable'):
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        weights = np.asarray(coverage[members].sum(axis=0)).ravel()
+        label = [terms[term] for term in np.argsort(-weights)[:LABEL_TERMS + len(skip)] if term not in skip]
+        representatives = members[np.argsort(-fit[members])[:REPRESENTATIVES]]
+        archetypes.append({
+            'label': label[:LABEL_TERMS],
+            'competitors': len(members),
+            'posts': int(posts[members].sum()),
+            'avg_engagement': float(engagement[members].sum() / max(posts[members].sum(), 1)),
+            'representatives': [names[competitors[i]] for i in representatives],
+        })
+    return {'topic': topic, 'competitors': len(competitors), 'archetypes': archetypes}
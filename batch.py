@@ -0,0 +1,275 @@
+"""
+Headless batch runs: one report per topic/brand pair, for as many pairs as
+an input file holds.
+
+Pairs come from a CSV file (columns `topic`, `brand` and optionally
+`platforms`, separated by spaces, commas or semicolons) or a JSONL file
+(objects with the same keys, `platforms` as a list). A pool of worker
+threads runs `generate_competitor_intelligence` for each pair, and every
+report is written out as soon as it is done - appended to a JSONL file, or
+as one JSON file per pair in a directory. Running the same command again
+skips the pairs already written, so an interrupted batch picks up where it
+stopped (a report that was cut off mid-run resumes from its checkpoints).
+
+LLM calls queue in the 'batch' lane of the shared rate limiter (see
+rate_limit.py), so a batch never starves the app of quota.
+
+    python batch.py pairs.csv --output reports.jsonl [--workers 4]
+    python batch.py pairs.jsonl --output-dir reports/ [--requests-per-minute 60]
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cache import make_cache_key, normalize_text
+from rate_limit import LANES, lane
+
+# Pairs in flight at once
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Progress is printed at least this often while reports are running
+PROGRESS_INTERVAL = 30.0
+
+
+def pair_key(topic: str, brand_name: str, platforms: list) -> str:
+    """
+    Identifies a pair in the output, so reruns can tell it is done.
+    """
+    return make_cache_key(topic=normalize_text(topic), brand=normalize_text(brand_name),
+                          platforms=sorted(platforms))
+
+
+def _pair(row: dict, line: int) -> dict:
+    topic = str(row.get('topic') or '').strip()
+    brand_name = str(row.get('brand') or row.get('brand_name') or '').strip()
+    if not topic or not brand_name:
+        raise ValueError(f"line {line}: a pair needs a topic and a brand")
+    platforms = row.get('platforms') or []
+    if isinstance(platforms, str):
+        platforms = [platform for platform in re.split(r"[\s,;]+", platforms) if platform]
+    return {'key': pair_key(topic, brand_name, platforms), 'topic': topic, 'brand_name': brand_name,
+            'platforms': list(platforms)}
+
+
+def read_pairs(path: str) -> list:
+    """
+    The distinct pairs in a CSV or JSONL input file, in file order.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            rows = [(line, json.loads(text)) for line, text in enumerate(f, 1) if text.strip()]
+        else:
+            rows = list(enumerate(csv.DictReader(f), 2))
+    pairs = {}
+    for line, row in rows:
+        pair = _pair(row, line)
+        pairs.setdefault(pair['key'], pair)
+    return list(pairs.values())
+
+
+class JsonlOutput:
+    """
+    Reports appended to one JSONL file, a line per pair.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._repaired = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _repair(self) -> None:
+        # A batch killed mid-write leaves a last line without its newline -
+        # end it, so the next record starts a line of its own
+        with open(self.path, 'rb+') as f:
+            if not f.seek(0, os.SEEK_END):
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def done(self) -> set:
+        keys = set()
+        if not os.path.exists(self.path):
+            return keys
+        with open(self.path, encoding='utf-8') as f:
+            for text in f:
+                try:
+                    keys.add(json.loads(text)['key'])
+                except (ValueError, KeyError):
+                    pass  # a line cut short when the last batch was killed
+        return keys
+
+    def write(self, record: dict) -> None:
+        if not self._repaired:
+            if os.path.exists(self.path):
+                self._repair()
+            self._repaired = True
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+class DirectoryOutput:
+    """
+    Reports written to a directory, one `<pair key>.json` file per pair.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def done(self) -> set:
+        return {name[:-len('.json')] for name in os.listdir(self.path) if name.endswith('.json')}
+
+    def write(self, record: dict) -> None:
+        path = os.path.join(self.path, f"{record['key']}.json")
+        # Written under a temporary name first, so a file that exists is complete
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(path + '.tmp', path)
+
+
+def _run_pair(pair: dict, lane_name: str, use_cache: bool) -> dict:
+    from agents import generate_competitor_intelligence
+
+    with lane(lane_name):
+        report = generate_competitor_intelligence(pair['topic'], pair['brand_name'], pair['platforms'] or None,
+                                                  use_cache=use_cache)
+    return {**pair, 'report': report}
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Progress:
+    """
+    Counts finished pairs and reports throughput and ETA on stderr.
+    """
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.printed_at = self.started
+
+    def print(self) -> None:
+        finished = self.succeeded + self.failed
+        elapsed = time.monotonic() - self.started
+        remaining = self.total - self.skipped - finished
+        line = (f"[{self.skipped + finished}/{self.total}] {self.succeeded} done, {self.failed} failed, "
+                f"{self.skipped} skipped | {_duration(elapsed)} elapsed")
+        if finished:
+            rate = finished / elapsed
+            line += f" | {rate * 60:.1f} reports/min | ETA {_duration(remaining / rate)}"
+        print(line, file=sys.stderr, flush=True)
+        self.printed_at = time.monotonic()
+
+
+def run_batch(pairs: list, output, workers: int = BATCH_WORKERS, lane_name: str = 'batch',
+              use_cache: bool = True) -> Progress:
+    """
+    Runs every pair not already in `output` on `workers` threads, writing
+    each report as it completes. Failed pairs are not written, so the next
+    run tries them again.
+    """
+    done = output.done()
+    todo = [pair for pair in pairs if pair['key'] not in done]
+    progress = Progress(len(pairs), len(pairs) - len(todo))
+    progress.print()
+    if not todo:
+        return progress
+
+    pending = iter(todo)
+    with ThreadPoolExecutor(workers, thread_name_prefix="batch") as pool:
+        running = {}
+
+        def fill():
+            # Submitted as workers free up, so an interrupted batch leaves little queued
+            while len(running) < workers:
+                pair = next(pending, None)
+                if pair is None:
+                    return
+                running[pool.submit(_run_pair, pair, lane_name, use_cache)] = pair
+
+        fill()
+        stopping = False
+        while running:
+            try:
+                finished, _ = wait(running, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                if stopping:
+                    # The pool would otherwise wait for the running reports at exit
+                    os._exit(130)
+                # Reports already running are finished and written; a second
+                # Ctrl-C abandons them (they resume from checkpoints next time)
+                stopping = True
+                pending = iter(())
+                print(f"⏹️  Finishing {len(running)} running report(s) - Ctrl-C again to abandon them",
+                      file=sys.stderr, flush=True)
+                continue
+            for future in finished:
+                pair = running.pop(future)
+                try:
+                    output.write(future.result())
+                    progress.succeeded += 1
+                except Exception as e:
+                    progress.failed += 1
+                    print(f"❌ {pair['topic']!r} / {pair['brand_name']!r}: {e}", file=sys.stderr, flush=True)
+            fill()
+            if finished or time.monotonic() - progress.printed_at >= PROGRESS_INTERVAL:
+                progress.print()
+        if stopping:
+            raise KeyboardInterrupt
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or JSONL file of topic/brand pairs")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", help="JSONL file to append reports to")
+    target.add_argument("--output-dir", help="directory to write one JSON report per pair to")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="pairs in flight at once")
+    parser.add_argument("--lane", choices=LANES, default='batch', help="rate-limiter lane for the LLM calls")
+    parser.add_argument("--requests-per-minute", type=float,
+                        help="LLM request limit, shared with every process using the same limiter file")
+    parser.add_argument("--tokens-per-minute", type=float, help="LLM token limit, shared likewise")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the report cache")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' console output")
+    args = parser.parse_args()
+
+    # Read when agents and the rate limiter are first used
+    if args.requests_per_minute is not None:
+        os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.requests_per_minute)
+    if args.tokens_per_minute is not None:
+        os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.tokens_per_minute)
+    if not args.verbose:
+        os.environ.setdefault("AGENT_VERBOSE", "0")
+
+    pairs = read_pairs(args.input)
+    output = JsonlOutput(args.output) if args.output else DirectoryOutput(args.output_dir)
+    try:
+        # CrewAI prints its task panels to stdout whatever the agents' verbosity
+        with open(os.devnull, 'w') if not args.verbose else contextlib.nullcontext(sys.stdout) as stdout, \
+                contextlib.redirect_stdout(stdout):
+            progress = run_batch(pairs, output, max(args.workers, 1), args.lane, not args.no_cache)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    sys.exit(1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
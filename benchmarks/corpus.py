@@ -0,0 +1,148 @@
+"""
+Corpus benchmark: builds a synthetic competitor corpus and times loading,
+BM25 index construction, topic queries against the memory-mapped store, the
+trend engine's full and incremental refresh, and competitor archetypes.
+
+    python benchmarks/corpus.py [--posts 1000000] [--competitors 5000]
+                                [--queries 50] [--dir /tmp/bench-corpus]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import Corpus, CorpusWriter, build_index  # noqa: E402
+from trends import TrendStore, niche_trends  # noqa: E402
+from archetypes import CompetitorIndex, niche_archetypes  # noqa: E402
+
+NICHES = {
+    "ai productivity": "ai productivity tools automation workflow assistant notion chatgpt prompts",
+    "sustainable fashion": "sustainable fashion thrift upcycle wardrobe ethical brands capsule",
+    "fitness coaching": "fitness coaching workout strength nutrition protein habit mobility",
+    "personal finance": "personal finance budgeting investing index funds savings debt",
+    "indie saas": "indie saas founders mrr launch pricing churn bootstrapped",
+    "home cooking": "home cooking recipes meal prep pasta sourdough weeknight",
+}
+FILLER = ("how why best guide tips mistakes story thread lessons framework playbook "
+          "checklist beginners results week month year simple honest").split()
+FORMATS = ["carousel", "thread", "video", "article", "reel", "poll", "image"]
+PLATFORMS = ["linkedin", "instagram", "twitter", "tiktok", "facebook"]
+
+
+def _generate(writer: CorpusWriter, posts: int, competitors: int, seed: int = 7, start_day: int = 0) -> None:
+    rng = random.Random(seed)
+    niches = list(NICHES.values())
+    owners = [(f"creator_{i}", niches[i % len(niches)].split(), rng.choice(PLATFORMS)) for i in range(competitors)]
+    for name, _, platform in owners:
+        writer.add_profile({'competitor': name, 'platform': platform,
+                            'followers': int(rng.paretovariate(1.2) * 1000), 'bio': ""})
+    start = 1_700_000_000 + start_day * 86400
+    for _ in range(posts):
+        name, vocabulary, platform = owners[rng.randrange(competitors)]
+        words = rng.sample(vocabulary, 3) + rng.sample(FILLER, 6)
+        rng.shuffle(words)
+        likes = int(rng.paretovariate(1.5) * 50)
+        writer.add_post({
+            'competitor': name,
+            'text': " ".join(words),
+            'platform': platform,
+            'format': rng.choice(FORMATS),
+            'posted_at': start + rng.randrange(180 * 86400),
+            'likes': likes,
+            'comments': likes // rng.randint(5, 30),
+            'shares': likes // rng.randint(10, 50),
+            'views': likes * rng.randint(10, 40),
+            'hashtags': rng.sample(vocabulary, 2),
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--competitors", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dir", help="store location (default: a temporary directory, removed afterwards)")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="bench-corpus-")
+    try:
+        start = time.perf_counter()
+        with CorpusWriter(directory) as writer:
+            _generate(writer, args.posts, args.competitors)
+        print(f"load         {args.posts:,} posts in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        info = build_index(directory)
+        print(f"index        {info['terms']:,} terms, {info['postings']:,} postings in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        corpus = Corpus(directory)
+        corpus.search("warm up")
+        print(f"open         {(time.perf_counter() - start) * 1000:.1f}ms (memory-mapped)")
+
+        topics = [f"{niche} {random.choice(FILLER)}" for niche in NICHES] * (args.queries // len(NICHES) + 1)
+        for label, query in [("search", lambda topic: corpus.search(topic, 100)),
+                             ("competitors", lambda topic: corpus.top_competitors(topic))]:
+            timings = []
+            for topic in topics[:args.queries]:
+                start = time.perf_counter()
+                query(topic)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{label:<12} p50 {statistics.median(timings):.1f}ms, "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f}ms over {len(timings)} topics")
+
+        start = time.perf_counter()
+        TrendStore(directory).refresh(corpus)
+        print(f"trends       full refresh of {len(corpus):,} posts in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = CompetitorIndex(corpus).index
+        print(f"archetypes   ANN index over {len(index):,} competitors ({len(index.centroids)} buckets) in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        # A daily load of 1% more posts, then an incremental refresh
+        daily = max(1, args.posts // 100)
+        with CorpusWriter(directory) as writer:
+            _generate(writer, daily, args.competitors, seed=8, start_day=180)
+        corpus = Corpus(directory)
+        start = time.perf_counter()
+        TrendStore(directory).refresh(corpus)
+        print(f"trends       incremental refresh of {daily:,} new posts in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        corpus.search("warm up")
+        print(f"index        extended with the new posts in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        niche_trends("ai productivity tools", corpus)
+        print(f"trends       niche signals in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        index = CompetitorIndex(corpus).index
+        print(f"archetypes   index extended with the new posts in {time.perf_counter() - start:.2f}s "
+              f"({len(index.centroids)} buckets)")
+
+        timings = []
+        for topic in topics[:args.queries]:
+            start = time.perf_counter()
+            niche_archetypes(topic, corpus)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"archetypes   p50 {statistics.median(timings):.1f}ms, "
+              f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f}ms over {len(timings)} topics")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Tail-latency benchmark for the LLM call policy (llm_client.CallPolicy) on the
+offline FakeLLM - no network needed.
+
+Sends the same sequence of calls through ManagedLLM under three policies:
+  none    no retries, no hedging - a failed call fails the caller
+  retry   timeouts plus retries with backoff and jitter
+  hedge   retry, plus a hedged second request past the latency percentile
+
+against a FakeLLM where a share of calls straggle (take --slow-factor times
+longer) and a share fail with HTTP 503. Reports p50/p95/p99 call latency,
+failed calls, and the retries, timeouts and hedges taken from the run trace.
+
+    python benchmarks/llm_policy.py [--calls 400] [--latency 0.05]
+                                    [--slow-rate 0.05] [--failure-rate 0.02]
+                                    [--hedge-percentile 90] [--json results.json]
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values: list, percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _run(llm, calls: int, concurrency: int) -> dict:
+    import tracing
+    from pipeline import current_stage
+
+    def one(i):
+        current_stage.set("bench")
+        start = time.perf_counter()
+        try:
+            llm.call(f"benchmark prompt {i}")
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    with tracing.start_trace("llm policy benchmark", []) as trace:
+        started = time.perf_counter()
+        # Each call runs in a copy of this context so it is counted on the trace
+        with ThreadPoolExecutor(concurrency) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, one, i) for i in range(calls)]
+            results = [future.result() for future in futures]
+        wall = time.perf_counter() - started
+    totals = trace.summary()["totals"]
+    latencies = [latency for latency, _ in results]
+    return {
+        "calls": calls,
+        "wall_s": wall,
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "p99_s": _percentile(latencies, 99),
+        "failed": sum(failed for _, failed in results),
+        **{field: totals[field] for field in ("retries", "timeouts", "hedges", "hedge_wins")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8, help="calls in flight at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean fake LLM latency per call in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of calls that straggle")
+    parser.add_argument("--slow-factor", type=float, default=20.0, help="how much longer a straggler takes")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="fraction of calls failing with HTTP 503")
+    parser.add_argument("--hedge-percentile", type=float, default=90.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("TRACE_PATH", os.path.join(tempfile.gettempdir(), "bench-traces.jsonl"))
+    sys.path.insert(0, ROOT)
+    from fake_llm import FakeLLM
+    from llm_client import CallPolicy, ManagedLLM
+
+    # A straggler's timeout: well past the normal tail, well short of the straggler
+    timeout = args.latency * max(3.0, args.slow_factor / 2)
+    policies = {
+        "none": CallPolicy(timeout=0, max_retries=0),
+        "retry": CallPolicy(timeout=timeout, max_retries=3, backoff_base=args.latency),
+        "hedge": CallPolicy(timeout=timeout, max_retries=3, backoff_base=args.latency,
+                            hedge_percentile=args.hedge_percentile),
+    }
+
+    results = {"config": vars(args), "policies": {}}
+    for name, policy in policies.items():
+        # Same seed per policy, so every policy sees the same stragglers and failures
+        fake = FakeLLM(model="fake-llm", latency=args.latency, slow_rate=args.slow_rate,
+                       slow_factor=args.slow_factor, failure_rate=args.failure_rate,
+                       use_tools=False, completion_tokens=20)
+        llm = ManagedLLM.wrap(fake, policy=policy)
+        # Warm-up fills the latency window the hedge threshold comes from
+        _run(llm, policy.hedge_min_samples * 2, args.concurrency)
+        results["policies"][name] = _run(llm, args.calls, args.concurrency)
+
+    print(f"{'policy':<8} {'p50':>8} {'p95':>8} {'p99':>8} {'failed':>7} {'retries':>8} "
+          f"{'timeouts':>9} {'hedges':>7} {'won':>5}")
+    for name, row in results["policies"].items():
+        print(f"{name:<8} {row['p50_s']:>7.3f}s {row['p95_s']:>7.3f}s {row['p99_s']:>7.3f}s {row['failed']:>7} "
+              f"{row['retries']:>8} {row['timeouts']:>9} {row['hedges']:>7} {row['hedge_wins']:>5}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
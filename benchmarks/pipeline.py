@@ -0,0 +1,186 @@
+"""
+End-to-end pipeline benchmark on the offline FakeLLM - no network needed.
+
+Runs these scenarios with the report cache bypassed:
+  single      one report for one brand
+  single_raw  the same report with context compaction off, to show how much
+              prompt the compacted context saves
+  multi       one topic for several brands (shared topic stages)
+  concurrent  several independent reports in flight at once (asyncio)
+
+and reports end-to-end latency, per-stage latency and queue time, LLM calls
+and tokens per stage (taken from each run's trace), and throughput. FakeLLM latency, answer length and failure rate come
+from the flags below (or the FAKE_LLM_* environment variables).
+
+    python benchmarks/pipeline.py [--latency 0.2] [--tokens 300] [--brands 3]
+                                  [--concurrency 4] [--json results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configure(args) -> None:
+    # Must happen before agents is imported - it reads these at import time
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["AGENT_VERBOSE"] = "0"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["FAKE_LLM_TOKENS"] = str(args.tokens)
+    os.environ["FAKE_LLM_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ.setdefault("REPORT_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite3"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tempfile.gettempdir(), "bench-traces.jsonl"))
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    sys.path.insert(0, ROOT)
+
+
+def _section(stage_name: str) -> str:
+    # Multi-brand stages are prefixed "<brand>/"
+    return stage_name.rsplit("/", 1)[-1]
+
+
+def _stage_table(traces: list) -> dict:
+    rows = defaultdict(lambda: {"wall": [], "queue": [], "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    for trace in traces:
+        for record in trace["stages"]:
+            row = rows[_section(record["stage"])]
+            row["wall"].append(record["wall_s"])
+            row["queue"].append(record["queue_s"])
+            for field in ("llm_calls", "prompt_tokens", "completion_tokens"):
+                row[field] += record[field]
+
+    table = {}
+    for section in sorted(rows):
+        row = rows[section]
+        table[section] = {
+            "runs": len(row["wall"]),
+            "latency_s": statistics.mean(row["wall"]),
+            "queue_s": statistics.mean(row["queue"]),
+            "llm_calls": row["llm_calls"],
+            "prompt_tokens": row["prompt_tokens"],
+            "completion_tokens": row["completion_tokens"],
+        }
+    return table
+
+
+def _run_streamed(agents, topic: str, brands: list) -> tuple:
+    start = time.perf_counter()
+    for event in agents.iter_multi_brand_intelligence(topic, brands, use_cache=False):
+        if event["type"] == "report_ready":
+            # Every brand's report carries the same run trace
+            trace = next(iter(event["reports"].values()))["trace"]
+    return time.perf_counter() - start, [trace]
+
+
+async def _run_concurrent(agents, topics: list) -> tuple:
+    async def one(topic):
+        start = time.perf_counter()
+        report = await agents.agenerate_competitor_intelligence(topic, "BenchBrand", use_cache=False)
+        return time.perf_counter() - start, report["trace"]
+
+    results = await asyncio.gather(*(one(topic) for topic in topics))
+    return [latency for latency, _ in results], [trace for _, trace in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=float(os.getenv("FAKE_LLM_LATENCY", "0.2")),
+                        help="mean fake LLM latency per call in seconds")
+    parser.add_argument("--tokens", type=int, default=int(os.getenv("FAKE_LLM_TOKENS", "300")),
+                        help="approximate tokens per fake answer")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake LLM calls that fail")
+    parser.add_argument("--brands", type=int, default=3, help="brands in the multi-brand scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="reports in flight in the concurrent scenario")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    _configure(args)
+
+    import agents
+    import compaction
+
+    results = {"config": vars(args), "scenarios": {}}
+
+    # CrewAI prints task panels even with verbose agents off
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm-up: imports, agent construction and tool setup
+        agents.generate_competitor_intelligence("warm up", "BenchBrand", use_cache=False)
+
+        elapsed, traces = _run_streamed(agents, "AI productivity tools", ["BenchBrand"])
+        results["scenarios"]["single"] = {
+            "reports": 1,
+            "wall_s": elapsed,
+            "reports_per_min": 60 / elapsed,
+            "prompt_tokens": sum(trace["totals"]["prompt_tokens"] for trace in traces),
+            "stages": _stage_table(traces),
+        }
+
+        budgets = dict(compaction.CONTEXT_BUDGETS)
+        compaction.CONTEXT_BUDGETS.update({section: 0 for section in budgets})
+        try:
+            elapsed, traces = _run_streamed(agents, "AI productivity tools", ["BenchBrand"])
+        finally:
+            compaction.CONTEXT_BUDGETS.update(budgets)
+        results["scenarios"]["single_raw"] = {
+            "reports": 1,
+            "wall_s": elapsed,
+            "reports_per_min": 60 / elapsed,
+            "prompt_tokens": sum(trace["totals"]["prompt_tokens"] for trace in traces),
+            "stages": _stage_table(traces),
+        }
+
+        brands = [f"Brand {i + 1}" for i in range(args.brands)]
+        elapsed, traces = _run_streamed(agents, "AI productivity tools", brands)
+        results["scenarios"]["multi"] = {
+            "reports": len(brands),
+            "wall_s": elapsed,
+            "reports_per_min": 60 * len(brands) / elapsed,
+            "stages": _stage_table(traces),
+        }
+
+        topics = [f"benchmark niche {i + 1}" for i in range(args.concurrency)]
+        start = time.perf_counter()
+        latencies, traces = asyncio.run(_run_concurrent(agents, topics))
+        elapsed = time.perf_counter() - start
+        results["scenarios"]["concurrent"] = {
+            "reports": len(topics),
+            "wall_s": elapsed,
+            "report_latency_p50_s": statistics.median(latencies),
+            "report_latency_max_s": max(latencies),
+            "reports_per_min": 60 * len(topics) / elapsed,
+            "stages": _stage_table(traces),
+        }
+
+    for name, scenario in results["scenarios"].items():
+        print(f"\n== {name}: {scenario['reports']} report(s) in {scenario['wall_s']:.2f}s "
+              f"({scenario['reports_per_min']:.1f} reports/min)")
+        if "report_latency_p50_s" in scenario:
+            print(f"   per-report latency p50 {scenario['report_latency_p50_s']:.2f}s, "
+                  f"max {scenario['report_latency_max_s']:.2f}s")
+        print(f"   {'stage':<22} {'runs':>5} {'latency':>9} {'queued':>8} {'calls':>6} "
+              f"{'prompt tok':>11} {'output tok':>11}")
+        for section, row in scenario["stages"].items():
+            print(f"   {section:<22} {row['runs']:>5} {row['latency_s']:>8.2f}s {row['queue_s']:>7.2f}s "
+                  f"{row['llm_calls']:>6} {row['prompt_tokens']:>11} {row['completion_tokens']:>11}")
+
+    compacted = results["scenarios"]["single"]["prompt_tokens"]
+    raw = results["scenarios"]["single_raw"]["prompt_tokens"]
+    print(f"\n== context compaction: {raw} -> {compacted} prompt tokens per report "
+          f"({1 - compacted / raw:.0%} smaller)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
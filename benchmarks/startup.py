@@ -0,0 +1,73 @@
+"""
+Startup benchmark for the lazy agent factory.
+
+Measures, in fresh interpreters, what a cold start pays for `import agents`
+(all the Streamlit app does per script run) against importing and building
+the LLM client and agents up front, which is what the module used to do at
+import time. Also times a cached get_agents() call against a fresh build.
+
+    python benchmarks/startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_SNIPPETS = {
+    "import agents (lazy)": "import agents",
+    "import agents + build agents (old eager import)": "import agents; agents.get_agents()",
+}
+
+
+def _time_cold(snippet: str, runs: int) -> list:
+    code = f"import time; t = time.perf_counter(); {snippet}; print(time.perf_counter() - t)"
+    env = {**os.environ, "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark-placeholder-key")}
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def _time_warm(runs: int) -> tuple:
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+    sys.path.insert(0, ROOT)
+    import agents
+
+    agents.get_agents()
+    start = time.perf_counter()
+    for _ in range(runs):
+        agents.get_agents()
+    cached = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        agents.get_agents.__wrapped__()
+    fresh = (time.perf_counter() - start) / runs
+    return cached, fresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per measurement")
+    args = parser.parse_args()
+
+    print(f"{'cold start':<50} {'median':>10} {'min':>10}")
+    for label, snippet in COLD_SNIPPETS.items():
+        timings = _time_cold(snippet, args.runs)
+        print(f"{label:<50} {statistics.median(timings) * 1000:>8.1f}ms {min(timings) * 1000:>8.1f}ms")
+
+    cached, fresh = _time_warm(args.runs)
+    print()
+    print(f"{'per call, warm process':<50} {'mean':>10}")
+    print(f"{'get_agents() cached':<50} {cached * 1e6:>8.1f}us")
+    print(f"{'get_agents() fresh build':<50} {fresh * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "reports.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500
+
+
+def normalize_text(value: str) -> str:
+    """
+    Case- and whitespace-insensitive form of a user input, so "AI Tools " and
+    "ai  tools" share a cache entry.
+    """
+    return " ".join(str(value).lower().split())
+
+
+def make_cache_key(**parts) -> str:
+    """
+    Stable hash of the given key parts (any JSON-serializable values).
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Disk-backed JSON cache in a single SQLite file. Entries expire after
+    `ttl_seconds` and the least recently used ones are evicted once the table
+    holds more than `max_entries`. Hit/miss counters are stored alongside the
+    entries so every process sharing the file sees the same numbers.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, table: str = "entries"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table}_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the cache safe to use from
+        # pipeline worker threads and from several processes at once
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(f"""
+            INSERT INTO {self.table}_stats (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1""", (name,))
+
+    def get(self, key: str):
+        """
+        Returns the cached value, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, value) -> None:
+        """
+        Stores a JSON-serializable value, then drops expired entries and
+        evicts the least recently used ones above the size bound.
+        """
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?)""", (key, payload, now, now))
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+            evicted = conn.execute(f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,)).rowcount
+            if evicted > 0:
+                conn.execute(f"""
+                    INSERT INTO {self.table}_stats (name, value) VALUES ('evictions', ?)
+                    ON CONFLICT(name) DO UPDATE SET value = value + excluded.value""", (evicted,))
+
+    def invalidate(self, key: str = None) -> int:
+        """
+        Removes one entry, or every entry when no key is given. Returns the
+        number of entries removed.
+        """
+        with self._lock, self._connect() as conn:
+            if key is None:
+                return conn.execute(f"DELETE FROM {self.table}").rowcount
+            return conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+
+    def stats(self) -> dict:
+        """
+        Entry count plus hit/miss/eviction counters and the hit rate.
+        """
+        with self._connect() as conn:
+            counters = dict(conn.execute(f"SELECT name, value FROM {self.table}_stats").fetchall())
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_report_cache() -> ResultCache:
+    """
+    Process-wide cache for full intelligence reports, configured through
+    REPORT_CACHE_PATH, REPORT_CACHE_TTL (seconds) and REPORT_CACHE_MAX_ENTRIES.
+    """
+    return ResultCache(
+        os.getenv("REPORT_CACHE_PATH", DEFAULT_CACHE_PATH),
+        ttl_seconds=float(os.getenv("REPORT_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+        max_entries=int(os.getenv("REPORT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+    )
@@ -0,0 +1,184 @@
+"""
+Stage checkpoints for report runs.
+
+Every stage output is saved under the run's id the moment the stage
+finishes, so a run that fails part-way (a timeout or quota error while
+writing posts, say) can be resumed from the stages that did not finish
+instead of starting again from research. Outputs are stored with a content
+hash, and each stage with the hash of the inputs it was produced from, so
+a stage whose upstream output has since changed can be told apart from one
+that is still current.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(".cache", "checkpoints.sqlite3")
+DEFAULT_CHECKPOINT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_RUNS = 200
+
+
+def content_hash(value) -> str:
+    """
+    Short stable hash of any JSON-serializable value.
+    """
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def inputs_hash(output_hashes: list) -> str:
+    """
+    Hash of a stage's inputs, from the content hashes of its dependencies'
+    outputs in dependency order.
+    """
+    return content_hash(list(output_hashes))
+
+
+class CheckpointStore:
+    """
+    Run and stage-output records in a single SQLite file, shared safely by
+    threads and processes like the report cache. Runs untouched for longer
+    than `ttl_seconds`, and the oldest beyond `max_runs`, are pruned when a
+    new run starts.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_CHECKPOINT_TTL, max_runs: int = DEFAULT_MAX_RUNS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_runs = max_runs
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    request_key TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_request ON runs (request_key, updated_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    output_hash TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    finished_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, stage)
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def start_run(self, run_id: str, request_key: str, request: dict) -> None:
+        """
+        Records a run as running - a new one, or an earlier one being resumed
+        (its saved stages are kept).
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT INTO runs (run_id, request_key, request, status, error, created_at, updated_at)
+                VALUES (?, ?, ?, 'running', NULL, ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET status = 'running', error = NULL, updated_at = excluded.updated_at
+                """, (run_id, request_key, json.dumps(request, ensure_ascii=False), now, now))
+            self._prune(conn, now)
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM runs WHERE updated_at < ?", (now - self.ttl_seconds,))
+        conn.execute("""
+            DELETE FROM runs WHERE run_id IN (
+                SELECT run_id FROM runs ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )""", (self.max_runs,))
+        conn.execute("DELETE FROM stages WHERE run_id NOT IN (SELECT run_id FROM runs)")
+
+    def save_stage(self, run_id: str, stage: str, output, input_hash: str) -> str:
+        """
+        Stores (or replaces) one stage's output. Returns its content hash.
+        """
+        output_hash = content_hash(output)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO stages (run_id, stage, output, output_hash, input_hash, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                         (run_id, stage, json.dumps(output, ensure_ascii=False), output_hash, input_hash, now))
+            conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+        return output_hash
+
+    def finish_run(self, run_id: str, error: BaseException = None) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                         ('failed' if error else 'finished', str(error) if error else None, time.time(), run_id))
+
+    def run(self, run_id: str):
+        """
+        A run's request, status and error plus its saved stages as
+        {stage: {'output', 'output_hash', 'input_hash', 'finished_at'}},
+        or None for an unknown (or pruned) run.
+        """
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT request, status, error, created_at, updated_at, request_key FROM runs
+                WHERE run_id = ?""", (run_id,)).fetchone()
+            if row is None:
+                return None
+            stages = conn.execute("""
+                SELECT stage, output, output_hash, input_hash, finished_at FROM stages
+                WHERE run_id = ? ORDER BY finished_at""", (run_id,)).fetchall()
+        return {
+            'run_id': run_id,
+            'request_key': row[5],
+            'request': json.loads(row[0]),
+            'status': row[1],
+            'error': row[2],
+            'created_at': row[3],
+            'updated_at': row[4],
+            'stages': {
+                stage: {'output': json.loads(output), 'output_hash': output_hash,
+                        'input_hash': input_hash, 'finished_at': finished_at}
+                for stage, output, output_hash, input_hash, finished_at in stages
+            },
+        }
+
+    def latest_run(self, request_key: str, status: str = 'failed'):
+        """
+        Id of the most recently updated run for a request with the given
+        status, or None.
+        """
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT run_id FROM runs WHERE request_key = ? AND status = ?
+                ORDER BY updated_at DESC LIMIT 1""", (request_key, status)).fetchone()
+        return row[0] if row else None
+
+
+@lru_cache(maxsize=None)
+def get_checkpoint_store() -> CheckpointStore:
+    """
+    Process-wide checkpoint store, configured through CHECKPOINT_PATH,
+    CHECKPOINT_TTL (seconds) and CHECKPOINT_MAX_RUNS.
+    """
+    return CheckpointStore(
+        os.getenv("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH),
+        ttl_seconds=float(os.getenv("CHECKPOINT_TTL", DEFAULT_CHECKPOINT_TTL)),
+        max_runs=int(os.getenv("CHECKPOINT_MAX_RUNS", DEFAULT_MAX_RUNS)),
+    )
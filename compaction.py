@@ -0,0 +1,142 @@
+import os
+import re
+
+from tracing import estimate_tokens
+
+# Token budget for the upstream context handed to each stage. Downstream
+# stages get a structured digest of earlier outputs instead of the raw text
+# once that text would not fit. 0 turns compaction off for a stage.
+# CONTEXT_TOKEN_BUDGET overrides every default, CONTEXT_BUDGET_<SECTION>
+# (e.g. CONTEXT_BUDGET_CONTENT_IDEAS, CONTEXT_BUDGET_POST) a single stage.
+# Sized for full-length answers (about 1500 tokens, 25 tokens a point): the
+# research digest keeps ~30 points (10 competitors x 3 facts), the ideas
+# stage ~18 points of each of its three inputs, and a writer one point for
+# each of the 25-30 ideas.
+DEFAULT_CONTEXT_BUDGETS = {
+    'trend_analysis': 800,
+    'content_gaps': 800,
+    'content_ideas': 1500,
+    'post': 900,
+}
+CONTEXT_BUDGETS = {
+    section: int(os.getenv(f"CONTEXT_BUDGET_{section.upper()}", os.getenv("CONTEXT_TOKEN_BUDGET", budget)))
+    for section, budget in DEFAULT_CONTEXT_BUDGETS.items()
+}
+
+# Digest heading for each upstream section
+DIGEST_TITLES = {
+    'competitor_research': "KEY COMPETITORS",
+    'trend_analysis': "TOP TRENDS",
+    'content_gaps': "RANKED GAPS",
+    'content_ideas': "CHOSEN IDEAS",
+}
+
+# Longest single point kept in a digest
+MAX_POINT_WORDS = 40
+
+_HEADING = re.compile(r"^\s*#{1,6}\s+(.+)")
+_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+)")
+_BOLD_LINE = re.compile(r"^\s*\*\*(.+?)\*\*:?\s*$")
+_MARKUP = re.compile(r"[*_`>]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def context_budget(section: str) -> int:
+    """
+    Context token budget for a stage, by report section (post_<platform>
+    stages share the 'post' budget). None means no limit.
+    """
+    key = 'post' if section.startswith('post_') else section
+    return CONTEXT_BUDGETS.get(key) or None
+
+
+def _clean(text: str) -> str:
+    words = _MARKUP.sub("", text).split()
+    if len(words) > MAX_POINT_WORDS:
+        words = words[:MAX_POINT_WORDS] + ["…"]
+    return " ".join(words)
+
+
+def extract_points(text: str) -> list:
+    """
+    Splits an agent's markdown answer into [(heading, [points])] groups in
+    document order. List items become points under the closest heading;
+    text without any list items falls back to one point per sentence.
+    """
+    groups = [(None, [])]
+    for line in text.splitlines():
+        heading = _HEADING.match(line) or _BOLD_LINE.match(line)
+        if heading:
+            groups.append((_clean(heading.group(1)), []))
+            continue
+        item = _ITEM.match(line)
+        if item and _clean(item.group(1)):
+            groups[-1][1].append(_clean(item.group(1)))
+
+    groups = [(heading, points) for heading, points in groups if points]
+    if not groups:
+        sentences = [_clean(sentence) for sentence in _SENTENCE.split(" ".join(text.split()))]
+        groups = [(None, [sentence for sentence in sentences if sentence])]
+    return groups
+
+
+def digest(section: str, text: str, budget: int, focus: tuple = ()) -> str:
+    """
+    Bounded digest of one upstream output. Points are taken breadth-first -
+    the first point under every heading, then the second, ... - until the
+    token budget is spent, and rendered back in document order. Points that
+    mention any `focus` term are taken before the others in their group.
+    """
+    title = DIGEST_TITLES.get(section, section.replace('_', ' ').upper())
+    groups = extract_points(text)
+    if focus:
+        terms = [term.lower() for term in focus]
+        groups = [(heading, sorted(points, key=lambda point: not any(t in point.lower() for t in terms)))
+                  for heading, points in groups]
+
+    # Budget is spent in characters of the rendered digest, the unit
+    # estimate_tokens counts in, so the result never overshoots it
+    first_line = f"{title} (digest of {section.replace('_', ' ')})"
+    limit = budget * 4
+    used = len(first_line)
+    chosen = [[] for _ in groups]
+    rank = 0
+    while any(rank < len(points) for _, points in groups):
+        for i, (heading, points) in enumerate(groups):
+            if rank >= len(points):
+                continue
+            cost = len(points[rank]) + 3 + (len(heading) + 2 if heading and not chosen[i] else 0)
+            if used + cost <= limit:
+                chosen[i].append(points[rank])
+                used += cost
+        rank += 1
+
+    lines = [first_line]
+    for (heading, _), points in zip(groups, chosen):
+        if not points:
+            continue
+        if heading:
+            lines.append(f"{heading}:")
+        lines += [f"- {point}" for point in points]
+    return "\n".join(lines)
+
+
+def compact_context(outputs: dict, budget: int = None, focus: tuple = ()) -> list:
+    """
+    Fits {section: upstream output} into `budget` tokens and returns the
+    context parts in input order. Outputs that fit their share are passed on
+    untouched; the rest are replaced by a digest. Smaller outputs are placed
+    first so whatever they leave of their share goes to the larger ones.
+    """
+    if not budget:
+        return [str(output) for output in outputs.values()]
+
+    parts = {}
+    remaining = budget
+    pending = sorted(outputs, key=lambda section: len(str(outputs[section])))
+    for i, section in enumerate(pending):
+        share = remaining // (len(pending) - i)
+        text = str(outputs[section])
+        parts[section] = text if estimate_tokens(text) <= share else digest(section, text, share, focus)
+        remaining -= min(share, estimate_tokens(parts[section]))
+    return [parts[section] for section in outputs]
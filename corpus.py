@@ -0,0 +1,816 @@
+"""
+Local corpus of competitor posts and profiles behind the analyzer tools.
+
+Posts live in a columnar store on disk - one raw little-endian array per
+column, a UTF-8 text blob, and JSON dictionaries for the repeated strings
+(competitor, platform, format, hashtag) - so every tool can memory-map it
+and only touch the columns it needs. A BM25 inverted index over post text
+sits next to it in the same format.
+
+    python corpus.py posts.jsonl profiles.csv   # build data/corpus
+
+Multi-gigabyte dumps are better loaded with ingest.py, which streams and
+parses them in parallel.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+
+DEFAULT_CORPUS_DIR = os.path.join("data", "corpus")
+
+STORE_VERSION = 2
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Per-post numeric columns and their on-disk dtypes. Strings are stored as
+# ids into the matching dictionary; text and hashtags as (start, count)
+# slices of text.bin / tags.bin.
+POST_COLUMNS = {
+    'competitor': '<i4',
+    'platform': '<i4',
+    'format': '<i4',
+    'posted_at': '<i8',   # unix seconds, 0 when unknown
+    'likes': '<i8',
+    'comments': '<i8',
+    'shares': '<i8',
+    'views': '<i8',
+    'text_start': '<i8',
+    'text_len': '<i4',
+    'tag_start': '<i8',
+    'tag_count': '<i4',
+    'key': '<u8',         # post_key, for de-duplication
+}
+DICTIONARIES = ('competitor', 'platform', 'format', 'hashtag')
+
+# Accepted spellings of each field in source files
+FIELD_ALIASES = {
+    'competitor': ('competitor', 'author', 'account', 'handle', 'brand', 'username', 'name'),
+    'text': ('text', 'content', 'caption', 'body', 'post'),
+    'platform': ('platform', 'network', 'source'),
+    'format': ('format', 'type', 'post_type', 'media_type'),
+    'posted_at': ('posted_at', 'timestamp', 'created_at', 'date', 'published_at'),
+    'likes': ('likes', 'like_count', 'reactions'),
+    'comments': ('comments', 'comment_count', 'replies'),
+    'shares': ('shares', 'share_count', 'reposts', 'retweets'),
+    'views': ('views', 'view_count', 'impressions', 'plays'),
+    'hashtags': ('hashtags', 'tags'),
+    'followers': ('followers', 'follower_count', 'subscribers'),
+    'bio': ('bio', 'description', 'about'),
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_HASHTAG = re.compile(r"#(\w+)")
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have how i if in into is it its
+    me my of on or our so that the their them they this to up us was we what
+    when which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased word tokens without stopwords - shared by indexing and queries.
+    """
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def _field(record: dict, name: str, default=None):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return default
+
+
+def _to_int(value) -> int:
+    if value in (None, ''):
+        return 0
+    try:
+        return int(float(str(value).replace(',', '').strip()))
+    except ValueError:
+        return 0
+
+
+def _to_timestamp(value) -> int:
+    if value in (None, ''):
+        return 0
+    if isinstance(value, (int, float)) or str(value).strip().isdigit():
+        seconds = float(value)
+        return int(seconds / 1000 if seconds > 1e11 else seconds)  # millisecond epochs
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def normalize_record(record: dict):
+    """
+    Maps a raw source record onto the store's schema. Returns ('post', dict),
+    ('profile', dict) or None for records with neither text nor a profile.
+    """
+    competitor = str(_field(record, 'competitor', '')).strip().lstrip('@')
+    if not competitor:
+        return None
+    text = _field(record, 'text')
+    if text is None:
+        if _field(record, 'followers') is None and _field(record, 'bio') is None:
+            return None
+        return 'profile', {
+            'competitor': competitor,
+            'platform': str(_field(record, 'platform', '')).strip().lower(),
+            'followers': _to_int(_field(record, 'followers')),
+            'bio': str(_field(record, 'bio', '')).strip(),
+        }
+
+    text = str(text)
+    hashtags = _field(record, 'hashtags')
+    if isinstance(hashtags, str):
+        hashtags = re.split(r"[\s,;]+", hashtags)
+    hashtags = hashtags or _HASHTAG.findall(text)
+    return 'post', {
+        'competitor': competitor,
+        'text': text,
+        'platform': str(_field(record, 'platform', '')).strip().lower(),
+        'format': str(_field(record, 'format', '')).strip().lower(),
+        'posted_at': _to_timestamp(_field(record, 'posted_at')),
+        'likes': _to_int(_field(record, 'likes')),
+        'comments': _to_int(_field(record, 'comments')),
+        'shares': _to_int(_field(record, 'shares')),
+        'views': _to_int(_field(record, 'views')),
+        'hashtags': sorted({tag.lstrip('#').lower() for tag in hashtags if tag.strip('#')}),
+    }
+
+
+def post_key(post: dict) -> int:
+    """
+    64-bit hash identifying a normalized post: the same text by the same
+    competitor on the same platform at the same time is the same post, even
+    if its engagement numbers changed between exports.
+    """
+    identity = "\0".join([post['competitor'].lower(), post['platform'], str(post['posted_at']),
+                          " ".join(post['text'].split())])
+    return int.from_bytes(hashlib.blake2b(identity.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def open_source(path: str):
+    """
+    Opens a source file as text, decompressing .gz transparently.
+    """
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, newline='', encoding='utf-8')
+
+
+def is_csv(path: str) -> bool:
+    return path.removesuffix('.gz').endswith('.csv')
+
+
+def read_records(path: str):
+    """
+    Yields raw records from a .jsonl/.ndjson or .csv file (optionally
+    gzipped), one at a time.
+    """
+    with open_source(path) as f:
+        if is_csv(path):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _temp_path(path: str) -> str:
+    # A temp file of its own next to `path`, so concurrent writers of the
+    # same file never write into each other's temp file
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp', dir=os.path.dirname(path))
+    os.close(fd)
+    return tmp
+
+
+def _write_json(path: str, value) -> None:
+    # Write-then-rename so readers never see a half-written file
+    tmp = _temp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _store_lock(directory: str, name: str):
+    # Exclusive lock on `name` in the store directory, across processes.
+    # Without fcntl (Windows) only the renames keep the files whole.
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, name), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _meta_lock(directory: str):
+    # Held across every read-modify-write of meta.json: a writer appending
+    # posts and an index build (possibly in another process) each update
+    # their own keys, and neither may write back the other's from a stale
+    # copy.
+    return _store_lock(directory, 'meta.lock')
+
+
+def _index_lock(directory: str):
+    # Held for a whole index build, so readers that find the index stale at
+    # the same time build it once rather than each overwriting the arrays.
+    # Separate from the meta lock so appends don't wait for a build.
+    return _store_lock(directory, 'index.lock')
+
+
+def _write_array(path: str, array: np.ndarray) -> None:
+    # Same for index arrays - open memory maps keep reading the old file
+    tmp = _temp_path(path)
+    array.tofile(tmp)
+    os.replace(tmp, path)
+
+
+class CorpusWriter:
+    """
+    Appends posts and profiles to the columnar store. Rows are buffered and
+    written with `flush`; meta.json is updated last, so readers only ever
+    see complete rows and a crash mid-write loses at most the last batch.
+
+    Posts whose post_key is already in the store (or earlier in the same
+    load) are skipped and counted in `duplicates`, and records that are
+    neither a post nor a profile in `skipped`. The seen keys are held as a
+    sorted uint64 array - 8 bytes per stored post.
+    """
+
+    def __init__(self, directory: str = None, batch_size: int = 50_000):
+        self.directory = directory or corpus_dir()
+        self.batch_size = batch_size
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta = _read_json(self._path('meta.json'), {
+            'version': STORE_VERSION, 'posts': 0, 'text_bytes': 0, 'tags': 0, 'index': None,
+        })
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"The corpus at {self.directory} uses store version {self.meta.get('version')}, "
+                             f"expected {STORE_VERSION} - remove it and load the sources again")
+        self.dictionaries = _read_json(self._path('dictionaries.json'), {name: [] for name in DICTIONARIES})
+        self.profiles = _read_json(self._path('profiles.json'), {})
+        self._ids = {name: {value: i for i, value in enumerate(values)}
+                     for name, values in self.dictionaries.items()}
+        self._truncate_to_meta()
+        self._seen = np.sort(np.fromfile(self._path('key.bin'), dtype='<u8', count=self.meta['posts'])
+                             if self.meta['posts'] else np.zeros(0, dtype=np.uint64))
+        self.duplicates = 0
+        self.skipped = 0
+        self._reset_buffers()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _truncate_to_meta(self) -> None:
+        # Drop bytes a crashed writer appended after the last committed meta
+        sizes = {f'{column}.bin': self.meta['posts'] * np.dtype(dtype).itemsize
+                 for column, dtype in POST_COLUMNS.items()}
+        sizes['text.bin'] = self.meta['text_bytes']
+        sizes['tags.bin'] = self.meta['tags'] * 4
+        for name, size in sizes.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _reset_buffers(self) -> None:
+        self._columns = {column: [] for column in POST_COLUMNS}
+        self._text = []
+        self._text_bytes = 0
+        self._tags = []
+        self._pending = set()
+
+    def _id(self, dictionary: str, value: str) -> int:
+        ids = self._ids[dictionary]
+        if value not in ids:
+            ids[value] = len(ids)
+            self.dictionaries[dictionary].append(value)
+        return ids[value]
+
+    def add(self, record: dict) -> None:
+        """
+        Adds one raw record (a post or a profile, see normalize_record).
+        """
+        normalized = normalize_record(record)
+        if normalized is None:
+            self.skipped += 1
+            return
+        kind, row = normalized
+        if kind == 'profile':
+            self.add_profile(row)
+        else:
+            self.add_post(row)
+
+    def add_profile(self, profile: dict) -> None:
+        self._id('competitor', profile['competitor'])
+        self.profiles[profile['competitor']] = {
+            'platform': profile['platform'], 'followers': profile['followers'], 'bio': profile['bio'],
+        }
+
+    def _is_duplicate(self, key: int) -> bool:
+        if key in self._pending:
+            return True
+        # np.uint64, or NumPy casts the whole array to compare a Python int
+        position = np.searchsorted(self._seen, np.uint64(key))
+        return position < len(self._seen) and self._seen[position] == key
+
+    def add_post(self, post: dict, key: int = None) -> bool:
+        """
+        Adds one normalized post unless it is a duplicate. `key` is its
+        post_key when the caller already computed it. Returns whether the
+        post was added.
+        """
+        key = post_key(post) if key is None else key
+        if self._is_duplicate(key):
+            self.duplicates += 1
+            return False
+        self._pending.add(key)
+        text = post['text'].encode('utf-8')
+        text_start = self.meta['text_bytes'] + self._text_bytes
+        tag_start = self.meta['tags'] + len(self._tags)
+
+        columns = self._columns
+        columns['competitor'].append(self._id('competitor', post['competitor']))
+        columns['platform'].append(self._id('platform', post['platform']))
+        columns['format'].append(self._id('format', post['format']))
+        for column in ('posted_at', 'likes', 'comments', 'shares', 'views'):
+            columns[column].append(post[column])
+        columns['text_start'].append(text_start)
+        columns['text_len'].append(len(text))
+        columns['tag_start'].append(tag_start)
+        columns['tag_count'].append(len(post['hashtags']))
+        columns['key'].append(key)
+        self._text.append(text)
+        self._text_bytes += len(text)
+        self._tags += [self._id('hashtag', tag) for tag in post['hashtags']]
+
+        if len(self._text) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        if self._text:
+            for column, dtype in POST_COLUMNS.items():
+                with open(self._path(f'{column}.bin'), 'ab') as f:
+                    np.asarray(self._columns[column], dtype=dtype).tofile(f)
+            with open(self._path('text.bin'), 'ab') as f:
+                f.write(b''.join(self._text))
+            with open(self._path('tags.bin'), 'ab') as f:
+                np.asarray(self._tags, dtype='<i4').tofile(f)
+            self.meta['posts'] += len(self._text)
+            self.meta['text_bytes'] += self._text_bytes
+            self.meta['tags'] += len(self._tags)
+            # Merge the batch's keys into the sorted ones rather than sorting them all again
+            batch = np.sort(np.asarray(self._columns['key'], dtype=np.uint64))
+            self._seen = np.insert(self._seen, np.searchsorted(self._seen, batch), batch)
+            self._reset_buffers()
+
+        _write_json(self._path('dictionaries.json'), self.dictionaries)
+        _write_json(self._path('profiles.json'), self.profiles)
+        with _meta_lock(self.directory):
+            # The index entry belongs to build_index - keep whatever it last wrote
+            stored = _read_json(self._path('meta.json'), {})
+            self.meta['index'] = stored.get('index', self.meta['index'])
+            _write_json(self._path('meta.json'), self.meta)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _tokenize_posts(text, starts, lengths, docs: range, vocabulary: dict, chunk_size: int) -> tuple:
+    # (term << 32 | doc) keys sorted by term then doc, their counts, and the
+    # token count of every post in `docs`
+    doc_lengths = np.zeros(len(docs), dtype='<i4')
+    keys = []
+    counts = []
+    for chunk in range(docs.start, docs.stop, chunk_size):
+        chunk_keys = []
+        chunk_counts = []
+        for doc in range(chunk, min(chunk + chunk_size, docs.stop)):
+            raw = bytes(text[starts[doc]:starts[doc] + lengths[doc]]).decode('utf-8', errors='ignore')
+            tokens = tokenize(raw)
+            doc_lengths[doc - docs.start] = len(tokens)
+            for token, count in Counter(tokens).items():
+                term = vocabulary.setdefault(token, len(vocabulary))
+                chunk_keys.append((term << 32) | doc)
+                chunk_counts.append(count)
+        keys.append(np.asarray(chunk_keys, dtype=np.int64))
+        counts.append(np.asarray(chunk_counts, dtype=np.int32))
+
+    # Sorting (term, doc) keys puts every term's postings together, in doc order
+    keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int32)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], counts[order], doc_lengths
+
+
+def _index_is_intact(index_dir: str, info: dict) -> bool:
+    # An interrupted build can leave arrays that don't match the index meta
+    expected = {'indptr.bin': (info['terms'] + 1) * 8, 'docs.bin': info['postings'] * 4,
+                'tf.bin': info['postings'] * 2, 'doclen.bin': info['posts'] * 4}
+    return all(os.path.exists(os.path.join(index_dir, name)) and os.path.getsize(os.path.join(index_dir, name)) == size
+               for name, size in expected.items())
+
+
+def build_index(directory: str = None, chunk_size: int = 200_000) -> dict:
+    """
+    Builds the BM25 inverted index over every post in the store: a term
+    list plus CSR postings (indptr, doc ids, term frequencies) and document
+    lengths, all as raw arrays next to the columns. When the store only had
+    posts appended since the last build, just the new posts are tokenized
+    and their postings merged in. Builds are serialized across processes;
+    one that finds the index already covering every post returns it as is.
+    Returns the index meta.
+    """
+    directory = directory or corpus_dir()
+    with _index_lock(directory):
+        return _build_index(directory, chunk_size)
+
+
+def _build_index(directory: str, chunk_size: int) -> dict:
+    meta = _read_json(os.path.join(directory, 'meta.json'), None)
+    if not meta or not meta['posts']:
+        raise ValueError(f"No posts in the corpus at {directory}")
+    if meta.get('index') and meta['index']['posts'] == meta['posts']:
+        return meta['index']
+
+    n = meta['posts']
+    text = np.memmap(os.path.join(directory, 'text.bin'), dtype=np.uint8, mode='r', shape=(meta['text_bytes'],))
+    starts = np.fromfile(os.path.join(directory, 'text_start.bin'), dtype='<i8', count=n)
+    lengths = np.fromfile(os.path.join(directory, 'text_len.bin'), dtype='<i4', count=n)
+    index_dir = os.path.join(directory, 'index')
+    os.makedirs(index_dir, exist_ok=True)
+
+    previous = meta.get('index')
+    incremental = bool(previous) and previous['posts'] <= n and _index_is_intact(index_dir, previous)
+    indexed = previous['posts'] if incremental else 0
+    terms_list = _read_json(os.path.join(index_dir, 'terms.json'), []) if incremental else []
+    vocabulary = {token: term for term, token in enumerate(terms_list)}
+    keys, counts, doc_lengths = _tokenize_posts(text, starts, lengths, range(indexed, n), vocabulary, chunk_size)
+
+    new_counts = np.bincount(keys >> 32, minlength=len(vocabulary))
+    if incremental:
+        old_indptr = np.fromfile(os.path.join(index_dir, 'indptr.bin'), dtype='<i8')
+        old_docs = np.fromfile(os.path.join(index_dir, 'docs.bin'), dtype='<i4')
+        old_tf = np.fromfile(os.path.join(index_dir, 'tf.bin'), dtype='<u2')
+        doc_lengths = np.concatenate([np.fromfile(os.path.join(index_dir, 'doclen.bin'), dtype='<i4'), doc_lengths])
+        old_counts = np.zeros(len(vocabulary), dtype=np.int64)
+        old_counts[:len(old_indptr) - 1] = np.diff(old_indptr)
+    else:
+        old_indptr = np.zeros(1, dtype='<i8')
+        old_docs, old_tf = np.zeros(0, dtype='<i4'), np.zeros(0, dtype='<u2')
+        old_counts = np.zeros(len(vocabulary), dtype=np.int64)
+
+    # Every term's old postings keep their order and the new ones (higher
+    # doc ids) follow them, so both sets are scattered straight into place
+    indptr = np.zeros(len(vocabulary) + 1, dtype='<i8')
+    np.cumsum(old_counts + new_counts, out=indptr[1:])
+    docs = np.empty(indptr[-1], dtype='<i4')
+    tf = np.empty(indptr[-1], dtype='<u2')
+    old_positions = np.arange(len(old_docs)) + np.repeat(indptr[:len(old_indptr) - 1] - old_indptr[:-1],
+                                                         old_counts[:len(old_indptr) - 1])
+    docs[old_positions], tf[old_positions] = old_docs, old_tf
+    new_starts = np.cumsum(new_counts) - new_counts
+    new_positions = np.arange(len(keys)) + np.repeat(indptr[:-1] + old_counts - new_starts, new_counts)
+    docs[new_positions] = keys & 0xFFFFFFFF
+    tf[new_positions] = np.minimum(counts, np.iinfo(np.uint16).max)
+
+    _write_array(os.path.join(index_dir, 'indptr.bin'), indptr)
+    _write_array(os.path.join(index_dir, 'docs.bin'), docs)
+    _write_array(os.path.join(index_dir, 'tf.bin'), tf)
+    _write_array(os.path.join(index_dir, 'doclen.bin'), doc_lengths)
+    terms_list += [None] * (len(vocabulary) - len(terms_list))
+    for token, term in vocabulary.items():
+        terms_list[term] = token
+    _write_json(os.path.join(index_dir, 'terms.json'), terms_list)
+
+    index = {
+        'posts': n,
+        'terms': len(vocabulary),
+        'postings': int(len(docs)),
+        'avgdl': float(doc_lengths.mean()),
+    }
+    with _meta_lock(directory):
+        # Re-read, as posts may have been appended since the build started
+        meta = _read_json(os.path.join(directory, 'meta.json'), meta)
+        meta['index'] = index
+        _write_json(os.path.join(directory, 'meta.json'), meta)
+    return index
+
+
+class Corpus:
+    """
+    Read-only, memory-mapped view of the store. Columns are exposed as NumPy
+    arrays (`corpus.column('likes')`) and `search` ranks posts with BM25.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or corpus_dir()
+        self.meta = _read_json(self._path('meta.json'), None)
+        if not self.meta or self.meta.get('version') != STORE_VERSION:
+            raise FileNotFoundError(f"No corpus store at {self.directory}")
+        self.size = self.meta['posts']
+        self.dictionaries = _read_json(self._path('dictionaries.json'), {name: [] for name in DICTIONARIES})
+        self.profiles = _read_json(self._path('profiles.json'), {})
+        self._columns = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _path(self, *names) -> str:
+        return os.path.join(self.directory, *names)
+
+    def _reload(self, posts: int) -> None:
+        # Moves the view up to the first `posts` posts of the store
+        self.meta = _read_json(self._path('meta.json'), self.meta)
+        self.size = posts
+        self.dictionaries = _read_json(self._path('dictionaries.json'), self.dictionaries)
+        self.profiles = _read_json(self._path('profiles.json'), self.profiles)
+        self._columns = {}
+
+    def __len__(self):
+        return self.size
+
+    def _memmap(self, path: str, dtype, count: int):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        A post column as a read-only memory-mapped array of length len(corpus).
+        """
+        if name not in self._columns:
+            self._columns[name] = self._memmap(self._path(f'{name}.bin'), POST_COLUMNS[name], self.size)
+        return self._columns[name]
+
+    @property
+    def engagement(self) -> np.ndarray:
+        return self.column('likes') + self.column('comments') + self.column('shares')
+
+    def text(self, doc: int) -> str:
+        if 'text' not in self._columns:
+            self._columns['text'] = self._memmap(self._path('text.bin'), np.uint8, self.meta['text_bytes'])
+        start = int(self.column('text_start')[doc])
+        return bytes(self._columns['text'][start:start + int(self.column('text_len')[doc])]).decode('utf-8', 'ignore')
+
+    def tag_ids(self) -> np.ndarray:
+        """
+        Every post's hashtag ids back to back (see tag_start / tag_count).
+        """
+        if 'tags' not in self._columns:
+            self._columns['tags'] = self._memmap(self._path('tags.bin'), '<i4', self.meta['tags'])
+        return self._columns['tags']
+
+    def hashtags(self, doc: int) -> list:
+        start = int(self.column('tag_start')[doc])
+        ids = self.tag_ids()[start:start + int(self.column('tag_count')[doc])]
+        return [self.dictionaries['hashtag'][i] for i in ids]
+
+    def post_hashtags(self, docs: np.ndarray) -> tuple:
+        """
+        Hashtag ids of the given posts as one flat array, plus how many each
+        post has - gathered without a Python loop over the posts.
+        """
+        counts = self.column('tag_count')[docs].astype(np.int64)
+        starts = self.column('tag_start')[docs].astype(np.int64)
+        slots = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.tag_ids()[slots].astype(np.int64), counts
+
+    def _load_index(self) -> dict:
+        with self._lock:
+            if self._index is None:
+                if not self.meta.get('index') or self.meta['index']['posts'] != self.size:
+                    index = build_index(self.directory)
+                    if index['posts'] != self.size:
+                        # Posts were appended since this view was opened
+                        # and the index covers them too - catch up
+                        self._reload(index['posts'])
+                    self.meta['index'] = index
+                info = self.meta['index']
+                terms = _read_json(self._path('index', 'terms.json'), [])
+                self._index = {
+                    'term_list': terms,
+                    'terms': {term: i for i, term in enumerate(terms)},
+                    'indptr': self._memmap(self._path('index', 'indptr.bin'), '<i8', info['terms'] + 1),
+                    'docs': self._memmap(self._path('index', 'docs.bin'), '<i4', info['postings']),
+                    'tf': self._memmap(self._path('index', 'tf.bin'), '<u2', info['postings']),
+                    'doclen': self._memmap(self._path('index', 'doclen.bin'), '<i4', self.size),
+                    'avgdl': info['avgdl'] or 1.0,
+                }
+        return self._index
+
+    def doc_term_matrix(self):
+        """
+        Posts x terms matrix of term frequencies (scipy.sparse CSR), built by
+        transposing the inverted index on first use. Column j is the term
+        `terms()[j]`.
+        """
+        from scipy import sparse
+
+        index = self._load_index()
+        with self._lock:
+            if 'forward' not in index:
+                inverted = sparse.csr_matrix(
+                    (np.asarray(index['tf'], dtype=np.float32), np.asarray(index['docs']), np.asarray(index['indptr'])),
+                    shape=(len(index['term_list']), self.size))
+                index['forward'] = inverted.T.tocsr()
+        return index['forward']
+
+    def terms(self) -> list:
+        return self._load_index()['term_list']
+
+    def term_id(self, term: str):
+        """
+        Id of an indexed term (a token from `tokenize`), or None.
+        """
+        return self._load_index()['terms'].get(term)
+
+    def document_frequencies(self) -> np.ndarray:
+        """
+        How many posts contain each term, by term id.
+        """
+        return np.diff(self._load_index()['indptr'])
+
+    def postings(self, term: str) -> tuple:
+        """
+        (doc ids, term frequencies) for one term, straight from the index.
+        """
+        index = self._load_index()
+        term_id = index['terms'].get(term)
+        if term_id is None:
+            return np.zeros(0, dtype='<i4'), np.zeros(0, dtype='<u2')
+        start, end = index['indptr'][term_id], index['indptr'][term_id + 1]
+        return index['docs'][start:end], index['tf'][start:end]
+
+    def search(self, query: str, k: int = 100) -> tuple:
+        """
+        Top `k` posts for `query` by BM25. Returns (doc ids, scores), best first.
+        """
+        index = self._load_index()
+        docs = []
+        weights = []
+        for term in set(tokenize(query)):
+            term_docs, tf = self.postings(term)
+            if not len(term_docs):
+                continue
+            idf = math.log(1 + (self.size - len(term_docs) + 0.5) / (len(term_docs) + 0.5))
+            tf = tf.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * index['doclen'][term_docs] / index['avgdl'])
+            docs.append(term_docs)
+            weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # One scatter-add over every posting - cheaper than sorting the
+        # matches even when the score array spans the whole corpus
+        scores = np.bincount(np.concatenate(docs), weights=np.concatenate(weights), minlength=self.size)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        top = np.argpartition(-scores, k - 1)[:k] if k < self.size else np.arange(self.size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top.astype(np.int64), scores[top]
+
+    def post(self, doc: int) -> dict:
+        return {
+            'competitor': self.dictionaries['competitor'][self.column('competitor')[doc]],
+            'platform': self.dictionaries['platform'][self.column('platform')[doc]],
+            'format': self.dictionaries['format'][self.column('format')[doc]],
+            'posted_at': int(self.column('posted_at')[doc]),
+            'likes': int(self.column('likes')[doc]),
+            'comments': int(self.column('comments')[doc]),
+            'shares': int(self.column('shares')[doc]),
+            'views': int(self.column('views')[doc]),
+            'text': self.text(doc),
+            'hashtags': self.hashtags(doc),
+        }
+
+    def top_competitors(self, query: str, k: int = 5, posts_per_competitor: int = 3,
+                        candidates: int = 500) -> list:
+        """
+        Ranks competitors by the summed BM25 score of their best matching
+        posts (from the top `candidates`) and returns each with engagement
+        stats and its `posts_per_competitor` best posts.
+        """
+        docs, scores = self.search(query, candidates)
+        if not len(docs):
+            return []
+        owners = self.column('competitor')[docs]
+        engagement = self.engagement[docs]
+        totals = np.bincount(owners, weights=scores)
+        ranked = np.argsort(-totals)[:k]
+
+        results = []
+        for competitor in ranked[totals[ranked] > 0]:
+            mine = owners == competitor
+            name = self.dictionaries['competitor'][competitor]
+            results.append({
+                'competitor': name,
+                'profile': self.profiles.get(name, {}),
+                'score': float(totals[competitor]),
+                'matching_posts': int(mine.sum()),
+                'avg_engagement': float(engagement[mine].mean()),
+                'posts': [self.post(int(doc)) for doc in docs[mine][:posts_per_competitor]],
+            })
+        return results
+
+
+def corpus_dir() -> str:
+    return os.getenv("CORPUS_DIR", DEFAULT_CORPUS_DIR)
+
+
+def corpus_snapshot(directory: str = None):
+    """
+    Identifies the data currently in the store, for keying caches of results
+    derived from it: changes whenever posts are loaded or the store is
+    replaced. None when there is no store.
+    """
+    directory = directory or corpus_dir()
+    meta = _read_json(os.path.join(directory, 'meta.json'), None)
+    if not meta:
+        return None
+    return f"{os.path.abspath(directory)}:{meta.get('version')}:{meta['posts']}:{meta['text_bytes']}"
+
+
+_corpora = {}
+_corpora_lock = threading.Lock()
+
+
+def get_corpus(directory: str = None):
+    """
+    The shared Corpus for `directory` (CORPUS_DIR by default), or None when
+    no store exists yet. Reopened automatically after new posts are written.
+    """
+    directory = directory or corpus_dir()
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    version = os.stat(meta_path).st_mtime_ns
+    with _corpora_lock:
+        cached = _corpora.get(directory)
+        if cached is None or cached[0] != version:
+            cached = (version, Corpus(directory))
+            _corpora[directory] = cached
+        return cached[1]
+
+
+def build_corpus(paths: list, directory: str = None) -> dict:
+    """
+    Loads JSONL/CSV files of posts and profiles into the store and (re)builds
+    the search index. Returns the store meta.
+    """
+    with CorpusWriter(directory) as writer:
+        for path in paths:
+            for record in read_records(path):
+                writer.add(record)
+    build_index(writer.directory)
+    return _read_json(os.path.join(writer.directory, 'meta.json'), {})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    meta = build_corpus(sys.argv[1:])
+    print(f"✅ {meta['posts']:,} posts, {meta['index']['terms']:,} terms indexed")
@@ -0,0 +1,220 @@
+"""
+CPU-only text embeddings and an approximate nearest-neighbour index.
+
+Embeddings use the hashing trick: every token is mapped to one of DIM
+buckets with a +/-1 sign, so there is no model to download or train and the
+same text always lands on the same vector. Similar vocabularies give
+similar vectors, which is all the clustering and lookups here need.
+
+IVFIndex is an inverted-file index: vectors are bucketed by their nearest
+k-means centroid and a query only scans the buckets of its `nprobe` closest
+centroids, so lookups stay sub-linear as the collection grows. It is stored
+as raw arrays plus meta.json, like the corpus.
+"""
+import json
+import math
+import os
+import threading
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from corpus import tokenize
+
+DIM = 256
+
+
+def hashing_projection(tokens: list, dim: int = DIM):
+    """
+    tokens x dim sparse matrix with a single +/-1 per row - multiplying term
+    weights by it gives their hashed embedding.
+    """
+    hashes = np.array([zlib.crc32(token.encode('utf-8')) for token in tokens], dtype=np.int64)
+    signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+    return sparse.csr_matrix((signs, (np.arange(len(tokens)), hashes % dim)), shape=(len(tokens), dim))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embed_texts(texts: list, dim: int = DIM) -> np.ndarray:
+    """
+    Unit-length hashed embeddings of short texts (e.g. topics), with
+    sublinear term frequencies.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        unique, counts = np.unique(tokens, return_counts=True)
+        weights = (1 + np.log(counts)).astype(np.float32)
+        vectors[row] = hashing_projection(list(unique), dim).T @ weights
+    return normalize_rows(vectors)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> tuple:
+    """
+    Spherical k-means (cosine similarity) on unit vectors, k-means++ seeded.
+    Returns (centroids, labels).
+    """
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(vectors)))
+    centroids = [vectors[rng.integers(len(vectors))]]
+    distance = 1 - vectors @ centroids[0]
+    for _ in range(1, k):
+        weights = np.maximum(distance, 0) ** 2
+        total = weights.sum()
+        pick = rng.choice(len(vectors), p=weights / total) if total > 0 else rng.integers(len(vectors))
+        centroids.append(vectors[pick])
+        distance = np.minimum(distance, 1 - vectors @ vectors[pick])
+    centroids = np.array(centroids, dtype=np.float32)
+
+    labels = np.zeros(len(vectors), dtype=np.int64)
+    for iteration in range(iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if iteration and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=k) == 0
+        # Re-seed empty clusters on the points furthest from their centroid
+        if empty.any():
+            fit = np.einsum('ij,ij->i', vectors, centroids[labels])
+            sums[empty] = vectors[np.argsort(fit)[:empty.sum()]]
+        centroids = normalize_rows(sums)
+    return centroids, labels
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit vectors with integer ids, persisted
+    under `directory` (None keeps it in memory only). `build` trains the
+    coarse centroids; `add` appends to the nearest existing buckets without
+    retraining.
+    """
+
+    def __init__(self, directory: str, dim: int = DIM):
+        self.directory = directory
+        self.dim = dim
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.lists = np.zeros(0, dtype=np.int64)
+        self.meta = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        if self.directory is None or not os.path.exists(self._path('meta.json')):
+            return
+        with open(self._path('meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.dim = self.meta['dim']
+        size, nlist = self.meta['size'], self.meta['nlist']
+        self.centroids = np.fromfile(self._path('centroids.bin'), dtype='<f4',
+                                     count=nlist * self.dim).reshape(nlist, self.dim)
+        self.ids = np.fromfile(self._path('ids.bin'), dtype='<i8', count=size)
+        self.vectors = np.fromfile(self._path('vectors.bin'), dtype='<f4', count=size * self.dim).reshape(size, self.dim)
+        self.lists = np.fromfile(self._path('lists.bin'), dtype='<i8', count=size)
+        self._order()
+
+    def save(self, **extra) -> None:
+        """
+        Writes the index; `extra` is kept in meta.json for the caller.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for name, array in [('centroids.bin', self.centroids.astype('<f4')), ('ids.bin', self.ids.astype('<i8')),
+                            ('vectors.bin', self.vectors.astype('<f4')), ('lists.bin', self.lists.astype('<i8'))]:
+            array.tofile(self._path(f'{name}.tmp'))
+            os.replace(self._path(f'{name}.tmp'), self._path(name))
+        self.meta.update(extra, dim=self.dim, size=len(self.ids), nlist=len(self.centroids))
+        tmp = self._path('meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._path('meta.json'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _order(self) -> None:
+        # Members of each bucket as one slice of a sorted permutation
+        self._by_list = np.argsort(self.lists, kind='stable')
+        self._offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.lists, minlength=len(self.centroids)), out=self._offsets[1:])
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray, nlist: int = None, sample: int = 20_000) -> None:
+        """
+        Trains ~sqrt(n) centroids on a sample and buckets every vector.
+        """
+        with self._lock:
+            nlist = nlist or max(1, int(math.sqrt(len(vectors))))
+            rng = np.random.default_rng(0)
+            training = vectors if len(vectors) <= sample else vectors[rng.choice(len(vectors), sample, replace=False)]
+            self.centroids, _ = kmeans(training, nlist, iterations=10)
+            self.ids = np.asarray(ids, dtype=np.int64)
+            self.vectors = np.asarray(vectors, dtype=np.float32)
+            self.lists = self._assign(self.vectors)
+            self._order()
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if not len(self.centroids):
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int64)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Adds vectors to their nearest buckets; an id already in the index
+        has its vector replaced and moves bucket if need be. An untrained
+        index starts with the first vector as its only centroid.
+        """
+        with self._lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if not len(self.centroids):
+                self.centroids = vectors[:1].copy()
+            lists = self._assign(vectors)
+            existing = np.isin(ids, self.ids)
+            if existing.any():
+                order = np.argsort(self.ids)
+                at = order[np.searchsorted(self.ids, ids[existing], sorter=order)]
+                self.vectors = self.vectors.copy()
+                self.vectors[at], self.lists[at] = vectors[existing], lists[existing]
+                ids, vectors, lists = ids[~existing], vectors[~existing], lists[~existing]
+            self.ids = np.concatenate([self.ids, ids])
+            self.vectors = np.concatenate([self.vectors, vectors])
+            self.lists = np.concatenate([self.lists, lists])
+            self._order()
+
+    def balanced(self, max_ratio: float = 4.0) -> bool:
+        """
+        Whether the buckets trained by `build` still fit the index: about
+        sqrt(n) of them, none holding more than `max_ratio` times the
+        average. Once vectors added since have skewed that, lookups scan
+        too much and it is time to build again.
+        """
+        if not len(self.ids):
+            return True
+        nlist = len(self.centroids)
+        largest = int(np.diff(self._offsets).max())
+        return len(self.ids) <= 4 * nlist ** 2 and largest <= max(max_ratio * len(self.ids) / nlist, 1)
+
+    def search(self, vector: np.ndarray, k: int = 10, nprobe: int = 8) -> tuple:
+        """
+        Approximate top-k by cosine similarity: scans only the buckets of the
+        `nprobe` nearest centroids. Returns (ids, similarities), best first.
+        """
+        if not len(self.ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        probe = np.argsort(-(self.centroids @ vector))[:nprobe]
+        members = np.concatenate([self._by_list[self._offsets[b]:self._offsets[b + 1]] for b in probe])
+        scores = self.vectors[members] @ vector
+        top = np.argsort(-scores)[:k]
+        return self.ids[members[top]], scores[top]
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from crewai.llms.base_llm import BaseLLM
+from pydantic import PrivateAttr
+
+from pipeline import current_stage
+from tracing import estimate_tokens
+
+# Vocabulary for the generated answers - enough variety to look like a report
+_WORDS = (
+    "audience engagement hook carousel thread video creator brand niche growth "
+    "strategy content format trend insight authority community story value "
+    "framework playbook benchmark launch workflow automation tutorial case study "
+    "template checklist opportunity gap angle positioning retention reach"
+).split()
+
+_TOOL = re.compile(r"Tool Name:\s*(.+?)\nTool Arguments:\s*(.+?)\nTool Description:", re.DOTALL)
+_TOPIC = re.compile(r"Topic:\s*(.+)")
+
+
+class FakeLLMError(RuntimeError):
+    """
+    Injected failure, shaped like a provider error with an HTTP status code.
+    """
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Fake LLM injected failure (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class FakeLLM(BaseLLM):
+    """
+    Offline, deterministic stand-in for the Gemini client. The same prompt
+    always produces the same answer. Latency, stragglers (a `slow_rate`
+    share of calls taking `slow_factor` times longer), answer length and
+    failure rate are configurable so the pipeline can be benchmarked and regression-tested
+    without network access. Every call is logged with the pipeline stage it
+    ran in (see `usage`).
+    """
+
+    latency: float = 0.2
+    jitter: float = 0.1
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    completion_tokens: int = 300
+    failure_rate: float = 0.0
+    failure_status: int = 503
+    use_tools: bool = True
+    seed: int = 0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: list = PrivateAttr(default_factory=list)
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context) -> None:
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls) -> "FakeLLM":
+        """
+        Builds a FakeLLM from FAKE_LLM_* environment variables.
+        """
+        return cls(
+            model=os.getenv("FAKE_LLM_MODEL", "fake-llm"),
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.2")),
+            jitter=float(os.getenv("FAKE_LLM_JITTER", "0.1")),
+            slow_rate=float(os.getenv("FAKE_LLM_SLOW_RATE", "0")),
+            slow_factor=float(os.getenv("FAKE_LLM_SLOW_FACTOR", "10")),
+            completion_tokens=int(os.getenv("FAKE_LLM_TOKENS", "300")),
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+            failure_status=int(os.getenv("FAKE_LLM_FAILURE_STATUS", "503")),
+            use_tools=os.getenv("FAKE_LLM_USE_TOOLS", "1") != "0",
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+    def supports_function_calling(self) -> bool:
+        # Answer in CrewAI's text ReAct format rather than native tool calls
+        return False
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        used_tool = any(message.get("role") == "assistant" and "Action:" in str(message.get("content", ""))
+                        for message in messages)
+
+        with self._lock:
+            delay = max(0.0, self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+            if self._rng.random() < self.slow_rate:
+                delay *= self.slow_factor
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(delay)
+
+        if fail:
+            self._record(prompt, "", delay, failed=True)
+            raise FakeLLMError(self.failure_status)
+
+        answer = self._answer(prompt, used_tool)
+        self._record(prompt, answer, delay)
+        return answer
+
+    def _answer(self, prompt: str, used_tool: bool) -> str:
+        # Call the agent's first tool once, then answer
+        tool = _TOOL.search(prompt)
+        if self.use_tools and tool and not used_tool:
+            topic = _TOPIC.search(prompt)
+            try:
+                required = json.loads(tool.group(2)).get("required", [])
+            except ValueError:
+                required = ["topic"]
+            arguments = {name: topic.group(1).strip() if name == "topic" and topic else "" for name in required}
+            return (f"Thought: I should gather data first\n"
+                    f"Action: {tool.group(1).strip()}\n"
+                    f"Action Input: {json.dumps(arguments)}")
+
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        lines = []
+        words = 0
+        while words < self.completion_tokens:
+            if len(lines) % 6 == 0:
+                line = "## " + " ".join(rng.choice(_WORDS) for _ in range(3)).title()
+            else:
+                line = f"{len(lines) % 6}. " + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 16)))
+            lines.append(line)
+            words += len(line.split())
+        return "Thought: I now know the final answer\nFinal Answer: " + "\n".join(lines)
+
+    def _record(self, prompt: str, answer: str, latency: float, failed: bool = False) -> None:
+        with self._lock:
+            self._calls.append({
+                "stage": current_stage.get(),
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(answer) if answer else 0,
+                "latency": latency,
+                "failed": failed,
+            })
+
+    def usage(self, reset: bool = False) -> list:
+        """
+        Every call made so far as dicts with stage, prompt_tokens,
+        completion_tokens, latency and failed.
+        """
+        with self._lock:
+            calls = list(self._calls)
+            if reset:
+                self._calls.clear()
+        return calls
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
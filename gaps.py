@@ -0,0 +1,176 @@
+"""
+Content-gap scoring behind find_content_gaps.
+
+The topic's niche (its best BM25 matches in the corpus) is turned into a
+sparse competitor x subtopic coverage matrix - subtopics being the index
+terms, weighted by TF-IDF - and every subtopic is scored on demand (how much
+more engagement posts about it get than the niche average) against supply
+(how many of the niche's competitors cover it). Everything stays in
+scipy.sparse; the only dense arrays are per-competitor or per-subtopic
+vectors.
+"""
+import re
+import weakref
+
+import numpy as np
+from scipy import sparse
+
+from corpus import get_corpus, tokenize
+
+# Posts that make up a niche, and the evidence a subtopic needs to be scored
+GAP_NICHE_POSTS = 20_000
+MIN_SUBTOPIC_POSTS = 5
+MIN_TERM_LENGTH = 3
+
+# Share of a competitor's niche posts (TF-IDF weighted) that counts as
+# covering a subtopic
+COVERAGE_THRESHOLD = 0.02
+
+# Competitors named per gap, biggest first
+NAMED_PER_GAP = 5
+
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])?\s*@?")
+
+# subtopic_terms() per corpus view - a view keeps the index it first loaded,
+# so its mask never goes stale
+_subtopic_terms = weakref.WeakKeyDictionary()
+
+
+def parse_competitors(competitors_list: str, corpus) -> np.ndarray:
+    """
+    Competitor ids named in a free-form list (comma, semicolon or line
+    separated, bullets allowed), matched case-insensitively.
+    """
+    ids = {name.lower(): i for i, name in enumerate(corpus.dictionaries['competitor'])}
+    names = [_LIST_ITEM.sub("", part).strip().lower() for part in re.split(r"[,;\n]", competitors_list or "")]
+    return np.unique([ids[name] for name in names if name in ids]).astype(np.int64)
+
+
+def subtopic_terms(corpus) -> np.ndarray:
+    """
+    Mask of the index terms that can be subtopics at all: in at least
+    MIN_SUBTOPIC_POSTS posts corpus-wide, at least MIN_TERM_LENGTH
+    characters and not a number. Computed once per corpus view.
+    """
+    mask = _subtopic_terms.get(corpus)
+    if mask is None:
+        mask = corpus.document_frequencies() >= MIN_SUBTOPIC_POSTS
+        candidates = np.flatnonzero(mask)
+        terms = np.array(corpus.terms(), dtype=object)[candidates].astype(str)
+        mask[candidates] = (np.char.str_len(terms) >= MIN_TERM_LENGTH) & ~np.char.isdigit(terms)
+        _subtopic_terms[corpus] = mask
+    return mask
+
+
+def term_idf(corpus) -> np.ndarray:
+    """
+    Every index term's IDF over the whole corpus.
+    """
+    return np.log(1 + len(corpus) / (1 + corpus.document_frequencies())).astype(np.float32)
+
+
+def coverage_matrix(corpus, docs: np.ndarray, competitors: np.ndarray = None, idf: np.ndarray = None) -> tuple:
+    """
+    Sparse competitor x subtopic coverage for the given posts: each row is
+    one competitor's TF-IDF weight per subtopic, normalized to sum to 1, so a
+    cell is the share of that competitor's niche content about the
+    subtopic. Restricted to `competitors` when given. `idf` (one weight per
+    term) replaces the corpus's current IDF. Returns (matrix, competitor
+    ids, posts per competitor).
+    """
+    owners = corpus.column('competitor')[docs].astype(np.int64)
+    if competitors is not None and len(competitors):
+        keep = np.isin(owners, competitors)
+        docs, owners = docs[keep], owners[keep]
+    rows, owner_index = np.unique(owners, return_inverse=True)
+
+    tf = corpus.doc_term_matrix()[docs]
+    if idf is None:
+        idf = term_idf(corpus)
+    tfidf = tf.multiply(idf[np.newaxis, :]).tocsr()
+    # L1-normalize each post so long posts don't dominate their author's row
+    post_weight = np.asarray(tfidf.sum(axis=1)).ravel()
+    tfidf = sparse.diags(1 / np.maximum(post_weight, 1e-9)) @ tfidf
+
+    membership = sparse.csr_matrix((np.ones(len(docs), dtype=np.float32), (owner_index, np.arange(len(docs)))),
+                                   shape=(len(rows), len(docs)))
+    posts_per_competitor = np.asarray(membership.sum(axis=1)).ravel()
+    coverage = sparse.diags(1 / np.maximum(posts_per_competitor, 1)) @ (membership @ tfidf)
+    return coverage.tocsr(), rows, posts_per_competitor
+
+
+def score_gaps(topic: str, competitors_list: str = "", limit: int = 10, corpus=None) -> dict:
+    """
+    Ranked content gaps for the topic's niche, or None without a corpus or
+    matching posts. A subtopic's gap score is its engagement lift (average
+    engagement of niche posts mentioning it / niche average) times the share
+    of competitors that do not cover it, so the top gaps are subtopics the
+    audience rewards but few competitors produce. `competitors_list`, when
+    it names known competitors, limits supply to those accounts.
+    """
+    corpus = corpus or get_corpus()
+    if corpus is None:
+        return None
+    docs, _ = corpus.search(topic, GAP_NICHE_POSTS)
+    if not len(docs):
+        return None
+    docs = np.sort(docs)
+
+    named = parse_competitors(competitors_list, corpus)
+    coverage, competitors, posts_per_competitor = coverage_matrix(corpus, docs, named if len(named) else None)
+    if not len(competitors):
+        return None
+
+    # Demand from every niche post, supply from the competitors in scope
+    mentions = corpus.doc_term_matrix()[docs]
+    mentions.data[:] = 1
+    engagement = corpus.engagement[docs].astype(np.float64)
+    posts_mentioning = np.asarray(mentions.sum(axis=0)).ravel()
+    engagement_mentioning = mentions.T @ engagement
+    lift = np.divide(engagement_mentioning / max(engagement.mean(), 1e-9), posts_mentioning,
+                     out=np.zeros_like(engagement_mentioning), where=posts_mentioning > 0)
+
+    covered = coverage.copy()
+    covered.data = (covered.data >= COVERAGE_THRESHOLD).astype(np.float32)
+    covered.eliminate_zeros()
+    covering = np.asarray(covered.sum(axis=0)).ravel()
+    uncovered_share = 1 - covering / len(competitors)
+
+    terms = corpus.terms()
+    eligible = (posts_mentioning >= MIN_SUBTOPIC_POSTS) & subtopic_terms(corpus)
+    # The topic's own words are covered by every niche post by construction
+    query_terms = [corpus.term_id(term) for term in tokenize(topic)]
+    eligible[[term for term in query_terms if term is not None]] = False
+
+    score = np.where(eligible, lift * uncovered_share, 0.0)
+    candidates = np.flatnonzero(score)
+    ranked = candidates[np.argsort(-score[candidates], kind='stable')][:limit]
+
+    # Largest competitors first when naming who covers or misses a gap
+    by_size = np.argsort(-posts_per_competitor)
+    columns = coverage.tocsc()
+    names = corpus.dictionaries['competitor']
+    gaps = []
+    for term in ranked:
+        column = columns[:, term]
+        shares = np.zeros(len(competitors))
+        shares[column.indices] = column.data
+        covered_by = [i for i in np.argsort(-shares) if shares[i] >= COVERAGE_THRESHOLD]
+        missed_by = by_size[shares[by_size] < COVERAGE_THRESHOLD]
+        gaps.append({
+            'subtopic': terms[term],
+            'score': float(score[term]),
+            'engagement_lift': float(lift[term]),
+            'posts': int(posts_mentioning[term]),
+            'covering': len(covered_by),
+            'covered_by': [(names[competitors[i]], float(shares[i])) for i in covered_by[:NAMED_PER_GAP]],
+            'missed_by': [names[competitors[i]] for i in missed_by[:NAMED_PER_GAP]],
+        })
+    return {
+        'topic': topic,
+        'posts': len(docs),
+        'competitors': len(competitors),
+        'named_competitors': len(named),
+        'subtopics': int(eligible.sum()),
+        'gaps': gaps,
+    }
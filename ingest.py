@@ -0,0 +1,157 @@
+"""
+Streaming bulk loader for the corpus store (see corpus.py).
+
+Source files - JSONL or CSV, optionally gzipped - are read in fixed-size
+chunks of lines, parsed, normalized and hashed on a pool of worker
+processes, and appended to the store by a single writer that drops posts it
+has already seen. Only a bounded number of chunks is ever in flight, so
+memory stays flat however large the dumps are. Re-running it on a daily
+export only adds the new posts, and the search index is then extended
+rather than rebuilt.
+
+    python ingest.py dump.jsonl.gz profiles.csv [--dir data/corpus]
+                     [--workers 4] [--chunk-lines 5000] [--replace]
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from corpus import CorpusWriter, build_index, corpus_dir, is_csv, normalize_record, open_source, post_key
+
+CHUNK_LINES = 5_000
+
+# Chunks queued per worker - enough to keep them busy, few enough to bound memory
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+PROGRESS_EVERY_S = 5.0
+
+
+def iter_chunks(path: str, chunk_lines: int = CHUNK_LINES):
+    """
+    Yields lists of up to `chunk_lines` raw records: undecoded JSON lines, or
+    row dicts for CSV (whose quoted fields may span lines, so they are split
+    here rather than in the workers).
+    """
+    with open_source(path) as f:
+        rows = csv.DictReader(f) if is_csv(path) else (line for line in f if line.strip())
+        while True:
+            chunk = list(islice(rows, chunk_lines))
+            if not chunk:
+                return
+            yield chunk
+
+
+def parse_chunk(chunk: list) -> tuple:
+    """
+    Decodes and normalizes one chunk. Returns ([(kind, row, key)], errors,
+    skipped), with the post_key precomputed for posts; `errors` counts
+    records that could not be read and `skipped` readable ones that are
+    neither a post nor a profile (e.g. no competitor).
+    """
+    parsed = []
+    errors = skipped = 0
+    for raw in chunk:
+        try:
+            normalized = normalize_record(json.loads(raw) if isinstance(raw, str) else raw)
+        except (ValueError, AttributeError, TypeError):
+            errors += 1
+            continue
+        if normalized is None:
+            skipped += 1
+            continue
+        kind, row = normalized
+        parsed.append((kind, row, post_key(row) if kind == 'post' else None))
+    return parsed, errors, skipped
+
+
+def _parsed_chunks(paths: list, workers: int, chunk_lines: int):
+    chunks = (chunk for path in paths for chunk in iter_chunks(path, chunk_lines))
+    if workers <= 1:
+        yield from map(parse_chunk, chunks)
+        return
+    # apply_async with a bounded window instead of Pool.imap, which would
+    # read the whole input ahead of the workers
+    with multiprocessing.Pool(workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(parse_chunk, (chunk,)))
+            if len(in_flight) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+
+def ingest(paths: list, directory: str = None, workers: int = None, chunk_lines: int = CHUNK_LINES,
+           replace: bool = False, on_progress=None) -> dict:
+    """
+    Loads source files into the store (appending unless `replace`) and
+    brings the search index up to date. `on_progress(stats)` is called after
+    every chunk. Returns the load stats.
+    """
+    directory = directory or corpus_dir()
+    if replace and os.path.isdir(directory):
+        shutil.rmtree(directory)
+    workers = workers or os.cpu_count() or 1
+    stats = {'records': 0, 'posts': 0, 'profiles': 0, 'duplicates': 0, 'errors': 0, 'skipped': 0}
+    started = time.perf_counter()
+
+    with CorpusWriter(directory) as writer:
+        for parsed, errors, skipped in _parsed_chunks(paths, workers, chunk_lines):
+            stats['errors'] += errors
+            stats['skipped'] += skipped
+            stats['records'] += len(parsed) + errors + skipped
+            for kind, row, key in parsed:
+                if kind == 'profile':
+                    writer.add_profile(row)
+                    stats['profiles'] += 1
+                elif writer.add_post(row, key):
+                    stats['posts'] += 1
+            stats['duplicates'] = writer.duplicates
+            stats['load_s'] = time.perf_counter() - started
+            if on_progress:
+                on_progress(stats)
+
+    if stats['posts'] or not writer.meta.get('index'):
+        start = time.perf_counter()
+        stats['index'] = build_index(directory)
+        stats['index_s'] = time.perf_counter() - start
+    stats['total_posts'] = writer.meta['posts']
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="JSONL/CSV files of posts and profiles (.gz allowed)")
+    parser.add_argument("--dir", help=f"store location (default: CORPUS_DIR or {corpus_dir()})")
+    parser.add_argument("--workers", type=int, help="parsing processes (default: one per core)")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    parser.add_argument("--replace", action="store_true", help="drop the existing store instead of appending")
+    args = parser.parse_args()
+
+    last = [0.0]
+
+    def progress(stats):
+        if stats['load_s'] - last[0] >= PROGRESS_EVERY_S:
+            last[0] = stats['load_s']
+            print(f"... {stats['records']:,} records, {stats['posts']:,} new posts, "
+                  f"{stats['duplicates']:,} duplicates ({stats['records'] / stats['load_s']:,.0f} records/s)",
+                  file=sys.stderr)
+
+    stats = ingest(args.paths, args.dir, args.workers, args.chunk_lines, args.replace, progress)
+    print(f"✅ {stats['posts']:,} new posts, {stats['profiles']:,} profiles, {stats['duplicates']:,} duplicates, "
+          f"{stats['errors']:,} unreadable and {stats['skipped']:,} skipped records in {stats['load_s']:.1f}s - "
+          f"{stats['total_posts']:,} posts in the store")
+    if 'index' in stats:
+        print(f"   index: {stats['index']['terms']:,} terms, {stats['index']['postings']:,} postings "
+              f"in {stats['index_s']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""
+Background job queue for reports.
+
+The Streamlit app no longer runs reports inside the script run: it submits
+a job to a queue kept in a SQLite file and follows the job's events from
+there. Reports run on a pool of worker processes (see `work`), so a browser
+refresh or a dropped connection loses nothing, and the number of reports
+running at once is set by the worker count rather than by how many people
+have the page open. A worker that dies mid-report has its job put back on
+the queue, and the retry resumes the run from its checkpoints.
+
+    python jobs.py [--workers 2] [--idle-exit 600]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+from rate_limit import lane
+
+DEFAULT_JOB_QUEUE_PATH = os.path.join(".cache", "jobs.sqlite3")
+DEFAULT_JOB_TTL = 7 * 24 * 3600
+
+# Worker processes the app starts when none are running (0 = run them
+# separately with `python jobs.py`)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# How often followers and idle workers check the queue
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+# Workers refresh their heartbeat this often; a running job whose heartbeat
+# is older than STALE_AFTER is taken to have lost its worker
+HEARTBEAT_S = 5.0
+STALE_AFTER = 30.0
+
+# Attempts per job before a job that keeps losing its worker is failed
+MAX_ATTEMPTS = 3
+
+# Workers the app starts exit after this long without a job
+APP_WORKER_IDLE_EXIT = 600
+
+
+# Batch-lane jobs (see rate_limit.LANES) are claimed after interactive ones
+_IS_BATCH = "IFNULL(json_extract(request, '$.lane'), 'interactive') = 'batch'"
+
+
+class JobFailed(RuntimeError):
+    """
+    Raised by `follow` when the job failed, with the worker's error message.
+    """
+
+
+class JobQueue:
+    """
+    Jobs and their event streams in a single SQLite file, shared by the app
+    and the worker processes.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_JOB_TTL):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    run_id TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL,
+                    flight_key TEXT,
+                    waiters INTEGER NOT NULL DEFAULT 0
+                )""")
+            # Queues created before jobs could be coalesced
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'flight_key' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN flight_key TEXT")
+                conn.execute("ALTER TABLE jobs ADD COLUMN waiters INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_flight ON jobs (flight_key, status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    job_id TEXT,
+                    heartbeat_at REAL NOT NULL
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, request: dict, flight_key: str = None) -> str:
+        """
+        Queues a job - 'report' (a request for iter_multi_brand_intelligence)
+        or 'regenerate' (one for iter_regenerate_section). Returns its id.
+        With a `flight_key` (see agents.request_flight_key), a job with the
+        same key that is still queued or running is returned instead, and
+        counts one more waiter.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT job_id FROM jobs WHERE flight_key = ? AND status IN ('queued', 'running')
+                ORDER BY created_at LIMIT 1""", (flight_key,)).fetchone() if flight_key else None
+            if row:
+                job_id = row[0]
+                conn.execute("UPDATE jobs SET waiters = waiters + 1 WHERE job_id = ?", (job_id,))
+            else:
+                job_id = uuid.uuid4().hex[:12]
+                conn.execute("""
+                    INSERT INTO jobs (job_id, kind, request, status, created_at, flight_key)
+                    VALUES (?, ?, ?, 'queued', ?, ?)""",
+                             (job_id, kind, json.dumps(request, ensure_ascii=False), now, flight_key))
+                self._prune(conn, now)
+            conn.execute("COMMIT")
+        return job_id
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM jobs WHERE status IN ('finished', 'failed') AND finished_at < ?",
+                     (now - self.ttl_seconds,))
+        conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+        conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - self.ttl_seconds,))
+
+    def claim(self, worker_id: str):
+        """
+        Marks the next queued job - the oldest interactive one, else the
+        oldest batch one - as running on this worker and returns it, or None
+        when the queue is empty.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # One statement, so two workers can never claim the same job
+            row = conn.execute(f"""
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                                started_at = ?, heartbeat_at = ?
+                WHERE job_id = (SELECT job_id FROM jobs WHERE status = 'queued'
+                                ORDER BY {_IS_BATCH}, created_at LIMIT 1)
+                RETURNING job_id""", (worker_id, now, now)).fetchone()
+        return self.job(row[0]) if row else None
+
+    def add_event(self, job_id: str, event: dict) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT INTO job_events (job_id, event) VALUES (?, ?)",
+                         (job_id, json.dumps(event, ensure_ascii=False, default=str)))
+
+    def events(self, job_id: str, after: int = 0) -> list:
+        """
+        The job's events after sequence number `after`, as (seq, event) pairs.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                (job_id, after)).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    def set_run_id(self, job_id: str, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET run_id = ? WHERE job_id = ?", (run_id, job_id))
+
+    def finish(self, job_id: str, result=None, error: BaseException = None) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                         ('failed' if error else 'finished', json.dumps(result, ensure_ascii=False, default=str),
+                          str(error) if error else None, time.time(), job_id))
+
+    def job(self, job_id: str):
+        """
+        A job as a dict (request and result decoded), or None for an unknown
+        or pruned one. Queued jobs also carry 'ahead', the jobs before them.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job['status'] == 'queued':
+                job['ahead'] = conn.execute(f"""
+                    SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND ({_IS_BATCH}, created_at) < (
+                        SELECT {_IS_BATCH}, created_at FROM jobs WHERE job_id = ?)""", (job_id,)).fetchone()[0]
+        job['request'] = json.loads(job['request'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def heartbeat(self, worker_id: str, job_id: str = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO workers (worker_id, pid, host, job_id, heartbeat_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET job_id = excluded.job_id, heartbeat_at = excluded.heartbeat_at
+                """, (worker_id, os.getpid(), socket.gethostname(), job_id, now))
+            if job_id:
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                             (now, job_id))
+
+    def retire(self, worker_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?",
+                                (time.time() - STALE_AFTER,)).fetchone()[0]
+
+    def requeue_stale(self) -> int:
+        """
+        Puts running jobs whose worker stopped heartbeating back on the queue
+        (or fails them after MAX_ATTEMPTS). Their events are dropped, and a
+        report job resumes the run its lost worker had started. Returns how
+        many jobs were requeued or failed.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            stale = conn.execute("""
+                SELECT job_id, kind, request, attempts, run_id FROM jobs
+                WHERE status = 'running' AND heartbeat_at < ?""", (now - STALE_AFTER,)).fetchall()
+            for job_id, kind, request, attempts, run_id in stale:
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute("""
+                        UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ?""",
+                                 (f"Lost its worker {attempts} times", now, job_id))
+                    continue
+                request = json.loads(request)
+                if kind == 'report' and run_id:
+                    request['resume'] = run_id
+                conn.execute("""
+                    UPDATE jobs SET status = 'queued', worker = NULL, request = ? WHERE job_id = ?""",
+                             (json.dumps(request, ensure_ascii=False), job_id))
+                conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+        return len(stale)
+
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    """
+    Process-wide job queue, configured through JOB_QUEUE_PATH and JOB_TTL
+    (seconds a finished job and its events are kept).
+    """
+    return JobQueue(
+        os.getenv("JOB_QUEUE_PATH", DEFAULT_JOB_QUEUE_PATH),
+        ttl_seconds=float(os.getenv("JOB_TTL", DEFAULT_JOB_TTL)),
+    )
+
+
+def follow(job_id: str, poll_interval: float = POLL_INTERVAL):
+    """
+    Yields a job's events as they are written - from the start, so a
+    reconnecting page can replay a run - until its report_ready event.
+    While the job waits for a worker, yields {'type': 'job_queued', 'ahead'}
+    whenever its place in the queue changes, and {'type': 'job_restarted'}
+    if a lost worker's job starts over (drop what was shown and follow again).
+    Raises JobFailed if the job fails, KeyError for an unknown job.
+    """
+    queue = get_job_queue()
+    seen = 0
+    attempts = None
+    ahead = None
+    while True:
+        job = queue.job(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job {job_id!r} - it may have expired")
+        if attempts is not None and job['attempts'] != attempts and seen:
+            yield {'type': 'job_restarted'}
+            return
+        attempts = job['attempts']
+
+        for seen, event in queue.events(job_id, seen):
+            yield event
+            if event['type'] == 'report_ready':
+                return
+        if job['status'] == 'failed':
+            raise JobFailed(job['error'])
+        if job['status'] == 'finished':
+            return
+        if job['status'] == 'queued' and job['ahead'] != ahead:
+            ahead = job['ahead']
+            yield {'type': 'job_queued', 'ahead': ahead}
+        time.sleep(poll_interval)
+
+
+def run_job(queue: JobQueue, job: dict) -> None:
+    """
+    Runs one claimed job, writing its events to the queue as they happen.
+    """
+    from agents import iter_multi_brand_intelligence, iter_regenerate_section
+
+    request = job['request']
+    if job['kind'] == 'regenerate':
+        events = iter_regenerate_section(request['run_id'], request['section'], request.get('brand_name'))
+    else:
+        events = iter_multi_brand_intelligence(request['topic'], request['brand_names'], request['platforms'],
+                                               use_cache=request.get('use_cache', True),
+                                               resume=request.get('resume', True))
+    try:
+        # The job's lane sets its turn at the LLM rate limiter
+        with lane(request.get('lane', 'interactive')):
+            for event in events:
+                if event['type'] == 'planned':
+                    queue.set_run_id(job['job_id'], event['run_id'])
+                queue.add_event(job['job_id'], event)
+                if event['type'] == 'report_ready':
+                    queue.finish(job['job_id'], event['reports'])
+    except Exception as e:
+        queue.finish(job['job_id'], error=e)
+
+
+def work(idle_exit: float = None) -> None:
+    """
+    Worker process loop: claims queued jobs one at a time and runs them,
+    heartbeating so a crash is noticed. With `idle_exit`, returns after that
+    many seconds without a job.
+    """
+    queue = get_job_queue()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    current = {'job_id': None}
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_S):
+            queue.heartbeat(worker_id, current['job_id'])
+
+    queue.heartbeat(worker_id)
+    threading.Thread(target=beat, name="job-heartbeat", daemon=True).start()
+    idle_since = time.monotonic()
+    checked_at = 0.0
+    try:
+        while True:
+            if time.monotonic() - checked_at >= HEARTBEAT_S:
+                queue.requeue_stale()
+                checked_at = time.monotonic()
+            job = queue.claim(worker_id)
+            if job is None:
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    return
+                time.sleep(POLL_INTERVAL)
+                continue
+            current['job_id'] = job['job_id']
+            queue.heartbeat(worker_id, job['job_id'])
+            run_job(queue, job)
+            current['job_id'] = None
+            idle_since = time.monotonic()
+    finally:
+        stop.set()
+        queue.retire(worker_id)
+
+
+def serve(workers: int, idle_exit: float = None) -> None:
+    """
+    Runs `workers` worker processes, restarting any that crash, until they
+    have all exited idle or the supervisor is stopped.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+
+    def start():
+        process = context.Process(target=work, args=(idle_exit,), name="job-worker")
+        process.start()
+        return process
+
+    def stop(*_):
+        for process in processes:
+            process.terminate()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    processes.extend(start() for _ in range(workers))
+    while processes:
+        time.sleep(HEARTBEAT_S)
+        for process in list(processes):
+            if process.is_alive():
+                continue
+            if process.exitcode == 0:
+                processes.remove(process)  # exited idle
+            else:
+                processes[processes.index(process)] = start()
+
+
+_spawn_lock = threading.Lock()
+
+
+def ensure_workers() -> None:
+    """
+    Starts JOB_WORKERS worker processes in the background if none are
+    heartbeating. They exit again after APP_WORKER_IDLE_EXIT idle seconds.
+    """
+    if JOB_WORKERS <= 0:
+        return
+    with _spawn_lock:
+        if get_job_queue().live_workers():
+            return
+        # Same working directory and environment as the app, so the workers
+        # resolve the relative store paths (.cache/..., data/corpus) to the
+        # same files it does
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--workers", str(JOB_WORKERS),
+                          "--idle-exit", str(APP_WORKER_IDLE_EXIT)], start_new_session=True)
+        # Wait for the first heartbeat so the next check sees them
+        deadline = time.monotonic() + 30
+        while not get_job_queue().live_workers() and time.monotonic() < deadline:
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="worker processes")
+    parser.add_argument("--idle-exit", type=float, help="exit after this many seconds without a job")
+    args = parser.parse_args()
+    print(f"🛠️  {args.workers} job worker(s) on {get_job_queue().path}", file=sys.stderr)
+    serve(args.workers, args.idle_exit)
+
+
+if __name__ == "__main__":
+    main()
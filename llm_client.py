@@ -0,0 +1,313 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+from crewai.llms.base_llm import BaseLLM, call_stop_override
+from pydantic import ConfigDict, Field, PrivateAttr
+
+import tracing
+from rate_limit import RateLimiter
+
+# Threads the call attempts run on, so a call can be timed out or hedged
+# without blocking the stage that made it. Sized for every stage having a
+# hedge in flight.
+MAX_LLM_ATTEMPTS_IN_FLIGHT = int(os.getenv("MAX_LLM_ATTEMPTS_IN_FLIGHT", "32"))
+
+# Latencies of recent successful calls, for the hedge threshold
+LATENCY_WINDOW = 200
+
+# Completion size assumed when reserving rate-limit tokens for a call; the
+# reservation is corrected once the answer is in
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "500"))
+
+# HTTP statuses worth retrying besides 5xx server errors: request timeout,
+# conflict (a concurrent-request abort) and rate limit
+RETRYABLE_STATUSES = {408, 409, 429}
+
+_attempt_executor = None
+_attempt_executor_lock = threading.Lock()
+
+
+def _prompt_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content", "")) for message in messages)
+
+
+def get_attempt_executor() -> ThreadPoolExecutor:
+    global _attempt_executor
+    with _attempt_executor_lock:
+        if _attempt_executor is None:
+            _attempt_executor = ThreadPoolExecutor(max_workers=MAX_LLM_ATTEMPTS_IN_FLIGHT,
+                                                   thread_name_prefix="llm")
+        return _attempt_executor
+
+
+class LLMTimeoutError(TimeoutError):
+    """
+    A call attempt that ran past the policy's timeout.
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed call is worth trying again: timeouts, dropped
+    connections, and provider errors with a 408/409/429 or 5xx status.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUSES or status >= 500)
+
+
+class _CallHealth:
+    # Latencies and primary-model failures, one instance per ManagedLLM and
+    # shared by the shallow copies CrewAI makes of it for each task
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.primary_down_until = 0.0
+
+
+class CallPolicy:
+    """
+    How ManagedLLM handles slow and failing calls:
+    - `timeout`: seconds before an attempt is given up on (0 = no limit)
+    - `max_retries`: further attempts after a retryable failure, with
+      exponential backoff from `backoff_base` up to `backoff_max` seconds and
+      full jitter
+    - `hedge_percentile`: when an attempt runs longer than this percentile of
+      recent call latencies, a second identical request is sent and whichever
+      answers first is used (0 = off). Needs `hedge_min_samples` latencies.
+    - `fallback_after`: consecutive failures of the primary model after which
+      calls go to the fallback model for `fallback_cooldown` seconds
+    """
+
+    def __init__(self, timeout: float = 120.0, max_retries: int = 3, backoff_base: float = 1.0,
+                 backoff_max: float = 30.0, hedge_percentile: float = 0.0, hedge_min_samples: int = 20,
+                 fallback_after: int = 2, fallback_cooldown: float = 60.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.fallback_after = fallback_after
+        self.fallback_cooldown = fallback_cooldown
+
+    @classmethod
+    def from_env(cls) -> "CallPolicy":
+        """
+        Builds a policy from LLM_* environment variables.
+        """
+        return cls(
+            timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "30")),
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0")),
+            hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+            fallback_after=int(os.getenv("LLM_FALLBACK_AFTER", "2")),
+            fallback_cooldown=float(os.getenv("LLM_FALLBACK_COOLDOWN", "60")),
+        )
+
+    def backoff(self, retry: int) -> float:
+        # "Full jitter": a uniform wait up to the exponential cap, so clients
+        # that failed together do not retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+
+class ManagedLLM(BaseLLM):
+    """
+    Wraps the real LLM client so every call made by the agents goes through
+    one place. Each call is recorded on the current trace (see tracing.py)
+    with its latency and estimated prompt/completion tokens, and runs under
+    a CallPolicy: timed out, retried, hedged and moved to the `fallback`
+    model as configured, with retries, timeouts, hedges, hedge wins and
+    fallbacks counted on the trace. With a `limiter`, every request waits
+    for rate-limit capacity first (hedges are skipped rather than waited
+    for), and the waits are counted too.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseLLM
+    fallback: Optional[BaseLLM] = None
+    policy: CallPolicy = Field(default_factory=CallPolicy.from_env)
+    limiter: Optional[RateLimiter] = None
+
+    _health: _CallHealth = PrivateAttr(default_factory=_CallHealth)
+
+    @classmethod
+    def wrap(cls, inner: BaseLLM, fallback: BaseLLM = None, policy: CallPolicy = None,
+             limiter: RateLimiter = None) -> "ManagedLLM":
+        return cls(model=inner.model, provider=inner.provider, stop=list(inner.stop), inner=inner,
+                   fallback=fallback, policy=policy or CallPolicy.from_env(), limiter=limiter)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        prompt_tokens = tracing.estimate_tokens(_prompt_text(messages))
+        options = dict(tools=tools, callbacks=callbacks, available_functions=available_functions,
+                       from_task=from_task, from_agent=from_agent, response_model=response_model)
+        start = time.perf_counter()
+        try:
+            answer = self._call_with_policy(messages, options, prompt_tokens)
+        except Exception:
+            tracing.record_llm_call(prompt_tokens, 0, time.perf_counter() - start, failed=True)
+            raise
+        completion_tokens = tracing.estimate_tokens(answer) if isinstance(answer, str) else 0
+        tracing.record_llm_call(prompt_tokens, completion_tokens, time.perf_counter() - start)
+        return answer
+
+    def _call_with_policy(self, messages, options: dict, tokens: int):
+        llm = self._pick_llm()
+        if llm is not self.inner:
+            tracing.count('fallbacks')
+        retry = 0
+        while True:
+            try:
+                answer = self._attempt(llm, messages, options, tokens)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._failed(llm)
+                if retry >= self.policy.max_retries:
+                    raise
+                retry += 1
+                tracing.count('retries')
+                time.sleep(self.policy.backoff(retry))
+                if llm is self.inner and self._pick_llm() is not llm:
+                    llm = self.fallback
+                    tracing.count('fallbacks')
+                continue
+            self._succeeded(llm)
+            return answer
+
+    def _pick_llm(self) -> BaseLLM:
+        if self.fallback is None:
+            return self.inner
+        with self._health.lock:
+            return self.fallback if time.monotonic() < self._health.primary_down_until else self.inner
+
+    def _failed(self, llm: BaseLLM) -> None:
+        if llm is not self.inner:
+            return
+        health = self._health
+        with health.lock:
+            health.failures += 1
+            if health.failures >= self.policy.fallback_after:
+                health.primary_down_until = time.monotonic() + self.policy.fallback_cooldown
+                health.failures = 0
+
+    def _succeeded(self, llm: BaseLLM) -> None:
+        if llm is self.inner:
+            with self._health.lock:
+                self._health.failures = 0
+
+    def _hedge_delay(self):
+        percentile = self.policy.hedge_percentile
+        with self._health.lock:
+            if not percentile or len(self._health.latencies) < self.policy.hedge_min_samples:
+                return None
+            latencies = sorted(self._health.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    def _reserve(self, tokens: int, block: bool = True) -> bool:
+        # Rate-limit capacity for one request; False if not blocking and there is none
+        if self.limiter is None:
+            return True
+        waited = self.limiter.acquire(tokens + EXPECTED_COMPLETION_TOKENS, block=block)
+        if waited is None:
+            return False
+        if waited:
+            tracing.count('rate_limited')
+            tracing.count('rate_wait_s', waited)
+        return True
+
+    def _submit(self, llm: BaseLLM, messages, options: dict):
+        def run():
+            started = time.perf_counter()
+            try:
+                # CrewAI sets per-call stop words on the LLM the agent holds - pass them on
+                with call_stop_override(llm, self.stop_sequences):
+                    answer = llm.call(messages, **options)
+            except Exception:
+                if self.limiter is not None:
+                    self.limiter.settle(-EXPECTED_COMPLETION_TOKENS)
+                raise
+            if self.limiter is not None:
+                completion_tokens = tracing.estimate_tokens(answer) if isinstance(answer, str) else 0
+                self.limiter.settle(completion_tokens - EXPECTED_COMPLETION_TOKENS)
+            with self._health.lock:
+                self._health.latencies.append(time.perf_counter() - started)
+            return answer
+
+        # A context copy per request: the trace and stage follow it, and two
+        # requests of one hedge cannot share a context
+        return get_attempt_executor().submit(contextvars.copy_context().run, run)
+
+    def _attempt(self, llm: BaseLLM, messages, options: dict, tokens: int):
+        """
+        One request to `llm`, plus a hedge request if it is slower than the
+        hedge threshold. Returns the first answer; raises the last error if
+        every request failed, or LLMTimeoutError once the timeout passes
+        (the abandoned requests finish in the background).
+        """
+        self._reserve(tokens)
+        start = time.monotonic()
+        deadline = start + self.policy.timeout if self.policy.timeout else None
+        hedge_delay = self._hedge_delay()
+        requests = {self._submit(llm, messages, options): False}
+        hedged = False
+        error = None
+
+        while requests:
+            waits = []
+            if deadline is not None:
+                waits.append(deadline - time.monotonic())
+            if hedge_delay is not None and not hedged:
+                waits.append(start + hedge_delay - time.monotonic())
+            done, _ = wait(requests, timeout=max(0.0, min(waits)) if waits else None,
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                is_hedge = requests.pop(future)
+                if future.exception() is None:
+                    if is_hedge:
+                        tracing.count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+            if not requests:
+                break
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                tracing.count('timeouts')
+                raise LLMTimeoutError(f"LLM call timed out after {self.policy.timeout:.0f}s")
+            if hedge_delay is not None and not hedged and now >= start + hedge_delay:
+                hedged = True
+                if self._reserve(tokens, block=False):
+                    tracing.count('hedges')
+                    requests[self._submit(llm, messages, options)] = True
+        raise error
+
+    def supports_function_calling(self) -> bool:
+        check = getattr(self.inner, "supports_function_calling", None)
+        return bool(check and check())
+
+    def supports_stop_words(self) -> bool:
+        return self.inner.supports_stop_words()
+
+    def supports_multimodal(self) -> bool:
+        return self.inner.supports_multimodal()
+
+    def get_context_window_size(self) -> int:
+        return self.inner.get_context_window_size()
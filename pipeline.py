@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Process-wide cap on stages running at once, shared by every sync and async
+# pipeline so many reports can be in flight without a thread per report
+MAX_CONCURRENT_STAGES = int(os.getenv("MAX_CONCURRENT_STAGES", "8"))
+
+_stage_executor = None
+_stage_executor_lock = threading.Lock()
+
+# Name of the stage the current code runs under, for attributing LLM and
+# tool calls made deep inside CrewAI back to a pipeline stage
+current_stage = contextvars.ContextVar("current_stage", default=None)
+
+
+class Stage:
+    """
+    One node of the intelligence pipeline: a name, the stages whose outputs it
+    needs, and a callable that receives those outputs as a {name: output} dict.
+    """
+
+    def __init__(self, name: str, run, deps=()):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={list(self.deps)})"
+
+
+def get_stage_executor() -> ThreadPoolExecutor:
+    """
+    The shared thread pool every pipeline runs its stages on. Its size is the
+    global concurrency limit (MAX_CONCURRENT_STAGES).
+    """
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_STAGES,
+                                                 thread_name_prefix="stage")
+        return _stage_executor
+
+
+def _emit(on_event, event_type: str, stage: Stage, **details) -> None:
+    if on_event is not None:
+        on_event({'type': event_type, 'stage': stage.name, 'time': time.time(), **details})
+
+
+def _execute(stage: Stage, inputs: dict, on_event=None, queued_at: float = None):
+    """
+    Runs one stage, reporting stage_started / stage_finished / stage_failed
+    events to `on_event` from the worker thread running the stage.
+    stage_started carries `queued_at`, when the stage became ready to run, so
+    time spent waiting for a free worker can be told apart from run time.
+    """
+    current_stage.set(stage.name)
+    _emit(on_event, 'stage_started', stage, queued_at=queued_at)
+    try:
+        output = stage.run(inputs)
+    except Exception as e:
+        _emit(on_event, 'stage_failed', stage, error=e)
+        raise
+    _emit(on_event, 'stage_finished', stage, output=output)
+    return output
+
+
+def _restore(stages: list, completed: dict, on_event=None) -> dict:
+    # Outputs of stages finished by an earlier attempt, announced as
+    # stage_restored so listeners can show them without re-running them
+    restored = {}
+    for stage in stages:
+        if stage.name in (completed or {}):
+            restored[stage.name] = completed[stage.name]
+            _emit(on_event, 'stage_restored', stage, output=completed[stage.name])
+    return restored
+
+
+def _check_graph(stages: list) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names in pipeline: {names}")
+
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    # Kahn's algorithm - anything left over sits on a cycle
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while True:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Pipeline has a dependency cycle between: {sorted(remaining)}")
+
+
+def run_pipeline(stages: list, on_event=None, completed: dict = None) -> dict:
+    """
+    Runs every stage as soon as all of its dependencies have finished, so
+    independent stages overlap instead of waiting on each other.
+    Returns a {stage name: output} dict. The first failing stage stops new
+    stages from being scheduled and its exception is re-raised once the
+    stages already running have finished.
+    `on_event`, if given, is called with a dict for every stage that starts,
+    finishes or fails - from worker threads, so it must be thread-safe.
+    `completed` maps stage names to outputs kept from an earlier attempt;
+    those stages are not run again and only emit stage_restored.
+    """
+    _check_graph(stages)
+
+    pool = get_stage_executor()
+    outputs = _restore(stages, completed, on_event)
+    pending = [stage for stage in stages if stage.name not in outputs]
+    running = {}
+    error = None
+
+    while pending or running:
+        if error is None:
+            for stage in [s for s in pending if all(dep in outputs for dep in s.deps)]:
+                pending.remove(stage)
+                inputs = {dep: outputs[dep] for dep in stage.deps}
+                ctx = contextvars.copy_context()
+                running[pool.submit(ctx.run, _execute, stage, inputs, on_event, time.time())] = stage
+        elif not running:
+            break
+
+        if not running:
+            # Nothing runnable and nothing in flight - _check_graph rules
+            # this out, but never spin forever on a bad graph
+            raise RuntimeError(f"Pipeline stalled with stages still pending: {pending}")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage = running.pop(future)
+            try:
+                outputs[stage.name] = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+
+    if error is not None:
+        raise error
+    return outputs
+
+
+async def _arun_stage(stage: Stage, tasks: dict, on_event=None):
+    inputs = {dep: await tasks[dep] for dep in stage.deps}
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_stage_executor(), ctx.run, _execute, stage, inputs, on_event,
+                                      time.time())
+
+
+def _resolved(output) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(output)
+    return future
+
+
+def start_pipeline(stages: list, on_event=None, completed: dict = None) -> dict:
+    """
+    Schedules every stage on the running event loop and returns a
+    {stage name: asyncio.Task} dict straight away, so callers can await
+    individual stages and use their results as they finish. A stage whose
+    dependency fails raises that dependency's exception. Stages in
+    `completed` resolve to their kept output (see run_pipeline).
+    """
+    _check_graph(stages)
+
+    tasks = {name: _resolved(output) for name, output in _restore(stages, completed, on_event).items()}
+    remaining = [stage for stage in stages if stage.name not in tasks]
+    while remaining:
+        for stage in [s for s in remaining if all(dep in tasks for dep in s.deps)]:
+            remaining.remove(stage)
+            tasks[stage.name] = asyncio.ensure_future(_arun_stage(stage, tasks, on_event))
+    return tasks
+
+
+async def arun_pipeline(stages: list, on_event=None, completed: dict = None) -> dict:
+    """
+    Async counterpart of run_pipeline. On failure the stages that have not
+    started yet are cancelled and the first exception is re-raised.
+    """
+    tasks = start_pipeline(stages, on_event, completed)
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark as retrieved
+        raise
+    return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,220 @@
+"""
+Shared request and token rate limiter for LLM calls.
+
+Two token buckets - requests per minute and tokens per minute - live in a
+SQLite file, so every thread and every worker process drawing on the same
+API quota draws from the same buckets. A call that does not fit waits its
+turn instead of going out and coming back as a 429. Callers queue in
+lanes: 'interactive' runs (the app) are always served before 'batch' ones,
+and callers within a lane go first come, first served.
+"""
+import contextvars
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+DEFAULT_RATE_LIMIT_PATH = os.path.join(".cache", "rate_limit.sqlite3")
+
+# Lanes by priority, highest first
+LANES = ('interactive', 'batch')
+
+# Buckets hold this many seconds' worth of capacity, so a burst after a
+# quiet spell is absorbed without running far ahead of the per-minute rate
+BURST_S = 10.0
+
+# A waiter that has not checked in for this long is gone (its process died)
+WAITER_EXPIRY_S = 10.0
+
+# Longest a waiter sleeps between checks
+MAX_POLL_S = 0.5
+
+# Lane the current code's LLM calls queue in (see `lane`)
+current_lane = contextvars.ContextVar("current_lane", default=os.getenv("LLM_LANE", "interactive"))
+
+
+@contextmanager
+def lane(name: str):
+    """
+    Makes the LLM calls of the block (and of the runs it starts) queue in
+    the given lane.
+    """
+    if name not in LANES:
+        raise ValueError(f"Unknown lane {name!r}, expected one of {list(LANES)}")
+    token = current_lane.set(name)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets shared through a
+    SQLite file. A limit of 0 turns that bucket off.
+    """
+
+    def __init__(self, path: str, requests_per_minute: float, tokens_per_minute: float):
+        self.path = path
+        self.rates = {'requests': requests_per_minute / 60, 'tokens': tokens_per_minute / 60}
+        self.capacity = {name: rate * BURST_S for name, rate in self.rates.items()}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    level REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS waiters (
+                    waiter_id TEXT PRIMARY KEY,
+                    priority INTEGER NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    seen_at REAL NOT NULL
+                )""")
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.rates.values())
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _levels(self, conn: sqlite3.Connection, now: float) -> dict:
+        # Bucket levels refilled up to now
+        levels = {}
+        for name, rate in self.rates.items():
+            row = conn.execute("SELECT level, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            level, updated_at = row if row else (self.capacity[name], now)
+            levels[name] = min(self.capacity[name], level + (now - updated_at) * rate)
+        return levels
+
+    def _store(self, conn: sqlite3.Connection, levels: dict, now: float) -> None:
+        conn.executemany("INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                         [(name, level, now) for name, level in levels.items()])
+
+    def _try_take(self, conn: sqlite3.Connection, need: dict, waiter_id: str, priority: int,
+                  enqueued_at: float, now: float):
+        """
+        Takes `need` from the buckets if this caller is first in line and it
+        fits. Returns 0 on success, else the seconds to wait before trying
+        again.
+        """
+        conn.execute("DELETE FROM waiters WHERE seen_at < ?", (now - WAITER_EXPIRY_S,))
+        ahead = conn.execute("""
+            SELECT COUNT(*) FROM waiters WHERE waiter_id != ?
+            AND (priority < ? OR (priority = ? AND enqueued_at < ?))""",
+                             (waiter_id, priority, priority, enqueued_at)).fetchone()[0]
+        levels = self._levels(conn, now)
+        # A call bigger than a bucket goes once the bucket is full
+        short = {name: min(need[name], self.capacity[name]) - levels[name]
+                 for name in self.rates if self.rates[name]}
+        if not ahead and all(deficit <= 0 for deficit in short.values()):
+            self._store(conn, {name: levels[name] - need[name] if self.rates[name] else 0.0
+                               for name in self.rates}, now)
+            return 0.0
+        if ahead:
+            return MAX_POLL_S / 5
+        return max(deficit / self.rates[name] for name, deficit in short.items() if deficit > 0)
+
+    def acquire(self, tokens: int, lane: str = None, block: bool = True):
+        """
+        Takes one request and `tokens` tokens from the buckets, waiting for
+        capacity in the caller's lane (current_lane by default). Returns the
+        seconds spent waiting (0 if there was capacity straight away), or
+        None when `block` is False and the call would have had to wait.
+        """
+        if not self.enabled:
+            return 0.0
+        priority = LANES.index(lane or current_lane.get())
+        need = {'requests': 1, 'tokens': tokens}
+        waiter_id = uuid.uuid4().hex
+        started = time.time()
+        queued = False
+        waited = False
+        try:
+            while True:
+                now = time.time()
+                with self._connect() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    wait = self._try_take(conn, need, waiter_id, priority, started, now)
+                    if wait and block:
+                        conn.execute("""
+                            INSERT INTO waiters (waiter_id, priority, enqueued_at, seen_at) VALUES (?, ?, ?, ?)
+                            ON CONFLICT(waiter_id) DO UPDATE SET seen_at = excluded.seen_at""",
+                                     (waiter_id, priority, started, now))
+                        queued = True
+                    elif queued:
+                        conn.execute("DELETE FROM waiters WHERE waiter_id = ?", (waiter_id,))
+                        queued = False
+                    conn.execute("COMMIT")
+                if not wait:
+                    return time.time() - started if waited else 0.0
+                if not block:
+                    return None
+                time.sleep(min(max(wait, 0.01), MAX_POLL_S))
+                waited = True
+        finally:
+            if queued:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM waiters WHERE waiter_id = ?", (waiter_id,))
+
+    def settle(self, tokens: int) -> None:
+        """
+        Corrects the token bucket once a call's real size is known: `tokens`
+        more than was acquired (or fewer, if negative).
+        """
+        if not self.rates['tokens'] or not tokens:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            levels = self._levels(conn, now)
+            levels['tokens'] = min(self.capacity['tokens'], levels['tokens'] - tokens)
+            self._store(conn, levels, now)
+            conn.execute("COMMIT")
+
+    def stats(self) -> dict:
+        """
+        Callers waiting per lane and the capacity available right now.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT priority, COUNT(*) FROM waiters WHERE seen_at >= ? GROUP BY priority",
+                                (now - WAITER_EXPIRY_S,)).fetchall()
+            levels = self._levels(conn, now)
+        waiting = dict.fromkeys(LANES, 0)
+        waiting.update({LANES[priority]: count for priority, count in rows})
+        return {
+            'waiting': waiting,
+            'requests_available': levels['requests'] if self.rates['requests'] else None,
+            'tokens_available': levels['tokens'] if self.rates['tokens'] else None,
+            'requests_per_minute': self.rates['requests'] * 60,
+            'tokens_per_minute': self.rates['tokens'] * 60,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter() -> RateLimiter:
+    """
+    Process-wide limiter, configured through LLM_RATE_LIMIT_PATH,
+    LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE (0 = no limit).
+    Processes sharing the file share the limits.
+    """
+    return RateLimiter(
+        os.getenv("LLM_RATE_LIMIT_PATH", DEFAULT_RATE_LIMIT_PATH),
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000")),
+        tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "2000000")),
+    )
@@ -0,0 +1,116 @@
+"""
+Per-stage model routing and budgets.
+
+Every stage runs on one of two model tiers: 'fast' for summarising work
+(research, trends) and 'strong' where quality pays off (the platform
+posts). A stage routed 'escalate' runs on the fast tier first and is
+re-run on the strong tier only if its answer fails validation.
+
+Each stage also has a latency and a token budget. Budgets are soft: a stage
+that runs over is flagged on the trace rather than cut off, and a stage
+already over budget is not escalated.
+"""
+import os
+
+from compaction import extract_points
+
+TIERS = ('fast', 'strong')
+ROUTES = TIERS + ('escalate',)
+
+# Route per report section (post_<platform> stages share 'post').
+# LLM_ROUTE_<SECTION> (e.g. LLM_ROUTE_CONTENT_IDEAS=strong) overrides one.
+DEFAULT_ROUTES = {
+    'competitor_research': 'fast',
+    'trend_analysis': 'fast',
+    'content_gaps': 'escalate',
+    'content_ideas': 'escalate',
+    'post': 'strong',
+}
+
+# (seconds, tokens) per section. LLM_LATENCY_BUDGET_<SECTION> and
+# LLM_TOKEN_BUDGET_<SECTION> override one; 0 means no budget.
+DEFAULT_BUDGETS = {
+    'competitor_research': (60, 12000),
+    'trend_analysis': (45, 8000),
+    'content_gaps': (45, 8000),
+    'content_ideas': (90, 12000),
+    'post': (60, 6000),
+}
+
+# List items (or sentences) an answer needs to count as complete - the
+# prompts ask for 5-10 competitors, 5-7 gaps, 25-30 ideas
+MIN_POINTS = {
+    'competitor_research': 5,
+    'trend_analysis': 5,
+    'content_gaps': 5,
+    'content_ideas': 15,
+}
+MIN_POST_CHARS = 300
+
+
+def _section_key(section: str) -> str:
+    return 'post' if section.startswith('post_') else section
+
+
+def _routes() -> dict:
+    routes = {section: os.getenv(f"LLM_ROUTE_{section.upper()}", route)
+              for section, route in DEFAULT_ROUTES.items()}
+    unknown = {section: route for section, route in routes.items() if route not in ROUTES}
+    if unknown:
+        raise ValueError(f"Unknown LLM routes {unknown}, expected one of {list(ROUTES)}")
+    return routes
+
+
+STAGE_ROUTES = _routes()
+
+STAGE_BUDGETS = {
+    section: (float(os.getenv(f"LLM_LATENCY_BUDGET_{section.upper()}", seconds)),
+              int(os.getenv(f"LLM_TOKEN_BUDGET_{section.upper()}", tokens)))
+    for section, (seconds, tokens) in DEFAULT_BUDGETS.items()
+}
+
+
+def stage_route(section: str) -> str:
+    """
+    'fast', 'strong' or 'escalate' for a stage, by report section.
+    """
+    return STAGE_ROUTES.get(_section_key(section), 'fast')
+
+
+def stage_budget(section: str) -> tuple:
+    """
+    (latency seconds, tokens) budget for a stage; None for either means no
+    limit.
+    """
+    seconds, tokens = STAGE_BUDGETS.get(_section_key(section), (0, 0))
+    return seconds or None, tokens or None
+
+
+def validate(section: str, output: str):
+    """
+    Why a stage's answer is not good enough to keep, or None if it is:
+    empty, or too short for what the prompt asked for.
+    """
+    text = (output or '').strip()
+    if not text:
+        return "empty answer"
+    key = _section_key(section)
+    if key == 'post':
+        return f"post shorter than {MIN_POST_CHARS} characters" if len(text) < MIN_POST_CHARS else None
+    points = sum(len(points) for _, points in extract_points(text))
+    if points < MIN_POINTS.get(key, 0):
+        return f"{points} points, expected at least {MIN_POINTS[key]}"
+    return None
+
+
+def over_budget(section: str, seconds: float, tokens: int) -> list:
+    """
+    Which of a stage's budgets ('latency', 'tokens') the given usage exceeds.
+    """
+    latency_budget, token_budget = stage_budget(section)
+    over = []
+    if latency_budget is not None and seconds > latency_budget:
+        over.append('latency')
+    if token_budget is not None and tokens > token_budget:
+        over.append('tokens')
+    return over
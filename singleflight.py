@@ -0,0 +1,164 @@
+"""
+Process-wide coalescing of identical in-flight runs.
+
+The first caller for a key starts the run; anyone asking for the same key
+while it is still going attaches to it instead of starting another, and is
+replayed every event the run has produced so far before following the
+rest. The run itself is driven by its own thread, so it finishes (and its
+result is cached) even if every caller stops listening. Callers on an event
+loop follow the same runs through `afollow` without blocking the loop.
+"""
+import asyncio
+import contextvars
+import threading
+from functools import lru_cache
+
+
+class Flight:
+    """
+    One in-flight run: the events it has produced so far and whether it
+    has finished. `waiters` counts the callers that attached to it after
+    the one that started it.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.waiters = 0
+        self.events = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+        # (loop, asyncio.Event) of every async follower
+        self._wakers = []
+
+    def _notify(self) -> None:
+        # Called with _cond held
+        self._cond.notify_all()
+        for loop, wake in self._wakers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # the follower's loop has closed
+
+    def _pump(self, start) -> None:
+        try:
+            for event in start(self):
+                with self._cond:
+                    self.events.append(event)
+                    self._notify()
+        except BaseException as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._notify()
+
+    def follow(self):
+        """
+        Yields every event of the run from the first, then re-raises the
+        run's exception if it failed.
+        """
+        seen = 0
+        while True:
+            with self._cond:
+                while seen == len(self.events) and not self.done:
+                    self._cond.wait()
+                events = self.events[seen:]
+                done = self.done
+            seen += len(events)
+            yield from events
+            if done and seen == len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def afollow(self):
+        """
+        Async form of `follow`: waits for events on the running event loop
+        instead of blocking a thread.
+        """
+        waker = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._wakers.append(waker)
+        try:
+            seen = 0
+            while True:
+                with self._cond:
+                    events = self.events[seen:]
+                    done = self.done
+                    if not events and not done:
+                        waker[1].clear()
+                if not events and not done:
+                    await waker[1].wait()
+                    continue
+                seen += len(events)
+                for event in events:
+                    yield event
+                if done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            with self._cond:
+                self._wakers.remove(waker)
+
+
+class SingleFlight:
+    """
+    The runs in flight in this process, by key, with counts of runs started
+    and of callers coalesced onto a run already going.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def follow(self, key: str, start):
+        """
+        Yields the events of the run for `key`, starting it with
+        `start(flight)` - which returns an event iterator - unless one is
+        already in flight.
+        """
+        yield from self._join(key, start).follow()
+
+    async def afollow(self, key: str, start):
+        """
+        Async form of `follow`, for callers on an event loop. Runs started
+        here and by `follow` are the same, so sync and async callers of one
+        key share a run.
+        """
+        async for event in self._join(key, start).afollow():
+            yield event
+
+    def _join(self, key: str, start) -> Flight:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+            else:
+                flight = self._flights[key] = Flight(key)
+                self.started += 1
+                # The run keeps the starting caller's context (e.g. its rate-limit lane)
+                threading.Thread(target=contextvars.copy_context().run, args=(self._run, flight, start),
+                                 name="single-flight", daemon=True).start()
+        return flight
+
+    def _run(self, flight: Flight, start) -> None:
+        try:
+            flight._pump(start)
+        finally:
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'in_flight': len(self._flights), 'started': self.started, 'coalesced': self.coalesced}
+
+
+@lru_cache(maxsize=None)
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
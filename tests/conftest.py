@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read when the modules are imported: reports run on the offline FakeLLM,
+# with every store in a directory of their own
+_STORE_DIR = tempfile.mkdtemp(prefix="competitor-intelligence-tests-")
+os.environ.update(
+    LLM_BACKEND="fake",
+    AGENT_VERBOSE="0",
+    FAKE_LLM_LATENCY="0.01",
+    FAKE_LLM_JITTER="0",
+    LLM_BACKOFF_BASE="0.01",
+    TOPIC_SIMILARITY_THRESHOLD="0",
+    REPORT_CACHE_PATH=os.path.join(_STORE_DIR, "cache.sqlite3"),
+    TOPIC_CACHE_PATH=os.path.join(_STORE_DIR, "topics.sqlite3"),
+    TOOL_CACHE_PATH=os.path.join(_STORE_DIR, "tools.sqlite3"),
+    CHECKPOINT_PATH=os.path.join(_STORE_DIR, "checkpoints.sqlite3"),
+    TRACE_PATH=os.path.join(_STORE_DIR, "traces.jsonl"),
+    JOB_QUEUE_PATH=os.path.join(_STORE_DIR, "jobs.sqlite3"),
+    LLM_RATE_LIMIT_PATH=os.path.join(_STORE_DIR, "rate_limit.sqlite3"),
+    CORPUS_DIR=os.path.join(_STORE_DIR, "corpus"),
+    CREWAI_DISABLE_TELEMETRY="true",
+    OTEL_SDK_DISABLED="true",
+)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_STORE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    # CrewAI prints its task panels whatever the agents' verbosity
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@pytest.fixture
+def fake_llms() -> list:
+    """
+    The FakeLLMs behind the fast and strong tiers.
+    """
+    import agents
+    llms = (agents.get_llm('fast').inner, agents.get_llm('strong').inner)
+    return list({id(llm): llm for llm in llms}.values())
+
+
+@pytest.fixture
+def llm_calls(fake_llms):
+    """
+    LLM calls per pipeline stage made since the test started.
+    """
+    for llm in fake_llms:
+        llm.usage(reset=True)
+    return lambda: Counter(call['stage'] for llm in fake_llms for call in llm.usage())
@@ -0,0 +1,91 @@
+import random
+import shutil
+
+import numpy as np
+import pytest
+
+from archetypes import IDF_DRIFT_REBUILD, CompetitorIndex, niche_archetypes
+from corpus import Corpus, CorpusWriter, build_index
+
+NICHES = ["ai productivity tools automation workflow", "fitness coaching workout strength nutrition",
+          "personal finance budgeting investing savings"]
+
+
+def _append(directory: str, posts: int, competitors: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with CorpusWriter(directory) as writer:
+        for i in range(posts):
+            owner = rng.randrange(competitors)
+            words = NICHES[owner % len(NICHES)].split()
+            writer.add_post({'competitor': f"creator_{owner}", 'text': " ".join(rng.sample(words, 3)) + f" {seed} {i}",
+                             'platform': "instagram", 'format': "reel", 'posted_at': 1_700_000_000 + i,
+                             'likes': rng.randrange(100), 'comments': 1, 'shares': 0, 'views': 0, 'hashtags': []})
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = str(tmp_path / "corpus")
+    _append(directory, 600, 60, seed=1)
+    build_index(directory)
+    return directory
+
+
+def test_appended_posts_are_folded_into_the_stored_profiles(directory):
+    CompetitorIndex(Corpus(directory))
+    _append(directory, 200, 80, seed=2)  # 20 new competitors among them
+    corpus = Corpus(directory)
+
+    extended = CompetitorIndex(corpus)
+    shutil.rmtree(f"{directory}/competitors")
+    rebuilt = CompetitorIndex(corpus)
+
+    assert sorted(extended.index.ids) == sorted(rebuilt.index.ids) == list(range(80))
+    np.testing.assert_array_equal(extended.posts, rebuilt.posts)
+    np.testing.assert_allclose(extended.engagement, rebuilt.engagement)
+    assert extended.index.balanced()
+
+
+def test_appended_posts_are_weighted_with_the_stored_idf(directory):
+    built = CompetitorIndex(Corpus(directory))
+    _append(directory, 30, 60, seed=2)
+
+    extended = CompetitorIndex(Corpus(directory))
+
+    np.testing.assert_array_equal(extended.profile_idf[:len(built.idf)], built.idf)
+    assert 0 < extended.idf_drift() <= IDF_DRIFT_REBUILD
+
+
+def test_profiles_are_rebuilt_once_the_idf_has_drifted(directory):
+    CompetitorIndex(Corpus(directory))
+    _append(directory, 1200, 80, seed=2)
+    corpus = Corpus(directory)
+
+    extended = CompetitorIndex(corpus)
+    shutil.rmtree(f"{directory}/competitors")
+    rebuilt = CompetitorIndex(corpus)
+
+    np.testing.assert_array_equal(extended.profile_idf, rebuilt.idf)
+    assert extended.idf_drift() == 0
+    assert abs(extended.sums - rebuilt.sums).max() < 1e-6
+
+
+def test_profiles_are_read_back_from_disk(directory):
+    corpus = Corpus(directory)
+    built = CompetitorIndex(corpus)
+    loaded = CompetitorIndex(corpus)
+
+    np.testing.assert_array_equal(loaded.posts, built.posts)
+    assert (loaded.sums != built.sums).nnz == 0
+    np.testing.assert_array_equal(loaded.vectors(np.arange(10)), built.vectors(np.arange(10)))
+
+
+def test_archetypes_come_from_the_stored_profiles(directory):
+    corpus = Corpus(directory)
+    result = niche_archetypes("fitness workout", corpus)
+
+    index = CompetitorIndex(corpus)
+    assert result['competitors'] >= 20  # creator_1, creator_4, ... and any near misses
+    assert sum(archetype['competitors'] for archetype in result['archetypes']) == result['competitors']
+    top = result['archetypes'][0]
+    assert all(int(name.split('_')[1]) % 3 == 1 for name in top['representatives'])
+    assert top['posts'] <= index.posts.sum()
@@ -0,0 +1,42 @@
+import json
+
+from batch import DirectoryOutput, JsonlOutput, read_pairs
+
+
+def test_record_after_a_truncated_line_starts_a_new_line(tmp_path):
+    path = tmp_path / "reports.jsonl"
+    path.write_text(json.dumps({'key': "a"}) + "\n" + '{"key": "b", "rep', encoding='utf-8')
+    output = JsonlOutput(str(path))
+
+    output.write({'key': "c"})
+    output.write({'key': "d"})
+
+    assert output.done() == {"a", "c", "d"}
+    assert path.read_text(encoding='utf-8').splitlines()[2:] == ['{"key": "c"}', '{"key": "d"}']
+
+
+def test_new_jsonl_output(tmp_path):
+    output = JsonlOutput(str(tmp_path / "out" / "reports.jsonl"))
+    assert output.done() == set()
+
+    output.write({'key': "a"})
+
+    assert (tmp_path / "out" / "reports.jsonl").read_text(encoding='utf-8') == '{"key": "a"}\n'
+
+
+def test_directory_output(tmp_path):
+    output = DirectoryOutput(str(tmp_path / "reports"))
+    output.write({'key': "a", 'report': {}})
+
+    assert output.done() == {"a"}
+
+
+def test_read_pairs_dedupes_and_splits_platforms(tmp_path):
+    path = tmp_path / "pairs.csv"
+    path.write_text("topic,brand,platforms\nAI tools,Acme,linkedin;twitter\nai  tools,ACME,twitter linkedin\n"
+                    "fitness,Fit,\n", encoding='utf-8')
+
+    pairs = read_pairs(str(path))
+
+    assert [(pair['topic'], pair['brand_name'], pair['platforms']) for pair in pairs] == [
+        ("AI tools", "Acme", ["linkedin", "twitter"]), ("fitness", "Fit", [])]
@@ -0,0 +1,11 @@
+import agents
+
+
+def test_a_cached_report_makes_no_calls(llm_calls):
+    agents.generate_competitor_intelligence("cached topic", "Acme", ["linkedin"])
+    first_run = llm_calls()
+
+    report = agents.generate_competitor_intelligence("cached topic", "Acme", ["linkedin"])
+
+    assert report['cached']
+    assert llm_calls() == first_run
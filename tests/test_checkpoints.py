@@ -0,0 +1,77 @@
+import pytest
+
+import agents
+from checkpoints import get_checkpoint_store
+
+
+@pytest.fixture
+def fail_once(monkeypatch):
+    """
+    Makes the next run of each given stage raise TimeoutError.
+    """
+    failing = set()
+    task_runner = agents._task_runner
+
+    def flaky(task, section, focus=()):
+        run = task_runner(task, section, focus)
+
+        def wrapped(inputs):
+            if section in failing:
+                failing.discard(section)
+                raise TimeoutError(f"quota hit in {section}")
+            return run(inputs)
+        return wrapped
+
+    monkeypatch.setattr(agents, '_task_runner', flaky)
+    return failing.update
+
+
+def _stage_statuses(report: dict) -> dict:
+    return {stage['stage']: stage['status'] for stage in report['trace']['stages']}
+
+
+def test_a_failed_run_resumes_from_its_checkpoints(fail_once, llm_calls):
+    fail_once({'post_twitter'})
+    with pytest.raises(TimeoutError):
+        agents.generate_competitor_intelligence("resume topic", "Acme", ["linkedin", "twitter"])
+    store = get_checkpoint_store()
+    run_id = store.latest_run(agents.run_request_key("resume topic", ["Acme"], ["linkedin", "twitter"]))
+    assert 'post_twitter' not in store.run(run_id)['stages']
+    first_run = llm_calls()
+
+    report = agents.generate_competitor_intelligence("Resume  topic", "acme", ["linkedin", "twitter"])
+
+    assert report['run_id'] == run_id
+    assert set(llm_calls() - first_run) == {'post_twitter'}
+    assert store.run(run_id)['status'] == 'finished'
+
+
+def test_resume_false_starts_over(fail_once, llm_calls):
+    fail_once({'post_linkedin'})
+    with pytest.raises(TimeoutError):
+        agents.generate_competitor_intelligence("fresh start topic", "Acme", ["linkedin"])
+    first_run = llm_calls()
+
+    report = agents.generate_competitor_intelligence("fresh start topic", "Acme", ["linkedin"], resume=False)
+
+    assert set(llm_calls() - first_run) >= {'competitor_research', 'trend_analysis', 'post_linkedin'}
+    assert report['run_id'] is not None
+
+
+def test_a_stage_whose_input_changed_is_stale(fail_once, llm_calls):
+    fail_once({'post_linkedin'})
+    with pytest.raises(TimeoutError):
+        agents.generate_competitor_intelligence("stale topic", "Acme", ["linkedin"])
+    store = get_checkpoint_store()
+    run_id = store.latest_run(agents.run_request_key("stale topic", ["Acme"], ["linkedin"]))
+    saved = store.run(run_id)['stages']
+    gaps = next(name for name in saved if name.endswith('content_gaps'))
+    # The gaps are edited after the ideas were made from them
+    store.save_stage(run_id, gaps, "edited gaps", saved[gaps]['input_hash'])
+    first_run = llm_calls()
+
+    report = agents.resume_intelligence(run_id)['Acme']
+
+    assert report['content_gaps'] == "edited gaps"
+    assert set(llm_calls() - first_run) == {'content_ideas', 'post_linkedin'}
+    assert _stage_statuses(report)['competitor_research'] == 'restored'
@@ -0,0 +1,160 @@
+import glob
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import corpus
+from corpus import Corpus, CorpusWriter, build_index
+
+
+def _post(i: int, words: str = "ai productivity tools") -> dict:
+    return {'competitor': f"creator_{i % 3}", 'text': f"{words} post {i}", 'platform': "linkedin",
+            'format': "text", 'posted_at': 1_700_000_000 + i * 3600, 'likes': 10 + i, 'comments': 1,
+            'shares': 0, 'views': 100, 'hashtags': ["ai"]}
+
+
+def _append(directory: str, start: int, count: int, **kwargs) -> None:
+    with CorpusWriter(directory) as writer:
+        for i in range(start, start + count):
+            writer.add_post(_post(i, **kwargs))
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "corpus")
+
+
+def test_posts_appended_during_an_index_build_are_kept(directory, monkeypatch):
+    _append(directory, 0, 3)
+    tokenize_posts = corpus._tokenize_posts
+
+    def append_meanwhile(*args, **kwargs):
+        _append(directory, 3, 2)
+        return tokenize_posts(*args, **kwargs)
+
+    monkeypatch.setattr(corpus, '_tokenize_posts', append_meanwhile)
+    assert build_index(directory)['posts'] == 3
+    monkeypatch.undo()
+
+    # Reopening the writer truncates the columns to meta.json - the two
+    # posts appended mid-build must still be counted there
+    _append(directory, 5, 1)
+    store = Corpus(directory)
+    assert len(store) == 6
+    assert [store.post(doc)['text'] for doc in range(6)] == [f"ai productivity tools post {i}" for i in range(6)]
+
+
+def test_a_writer_keeps_the_index_built_since_it_opened(directory):
+    _append(directory, 0, 3)
+    writer = CorpusWriter(directory)
+    info = build_index(directory)
+
+    writer.add_post(_post(3))
+    writer.close()
+
+    assert Corpus(directory).meta['index'] == info
+
+
+
+def test_readers_that_find_the_index_stale_build_it_once(directory, monkeypatch):
+    _append(directory, 0, 5)
+    views = [Corpus(directory), Corpus(directory)]
+    tokenize_posts = corpus._tokenize_posts
+    builds = []
+
+    def slow_tokenize(*args, **kwargs):
+        builds.append(args[3])
+        time.sleep(0.1)  # long enough for the other reader to find the index stale
+        return tokenize_posts(*args, **kwargs)
+
+    monkeypatch.setattr(corpus, '_tokenize_posts', slow_tokenize)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.update({i: views[i].search("productivity")[0]}))
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert builds == [range(0, 5)]
+    assert sorted(results[0].tolist()) == sorted(results[1].tolist()) == [0, 1, 2, 3, 4]
+    assert not glob.glob(f"{directory}/**/*.tmp", recursive=True)
+
+
+def test_a_view_catches_up_with_an_index_covering_newer_posts(directory):
+    _append(directory, 0, 3)
+    store = Corpus(directory)
+    _append(directory, 3, 2, words="sustainable fashion thrift")
+
+    docs, _ = store.search("thrift")
+
+    assert len(store) == 5
+    assert [store.post(int(doc))['text'] for doc in sorted(docs)] == [
+        "sustainable fashion thrift post 3", "sustainable fashion thrift post 4"]
+
+
+def _index_arrays(directory: str) -> dict:
+    index_dir = f"{directory}/index"
+    return {name: np.fromfile(f"{index_dir}/{name}.bin", dtype=dtype)
+            for name, dtype in [('indptr', '<i8'), ('docs', '<i4'), ('tf', '<u2'), ('doclen', '<i4')]}
+
+
+def test_extending_the_index_matches_a_full_build(directory, tmp_path):
+    _append(directory, 0, 5)
+    build_index(directory)
+    _append(directory, 5, 4, words="sustainable fashion thrift")
+    extended = build_index(directory)
+    arrays, terms = _index_arrays(directory), Corpus(directory).terms()
+
+    rebuilt_dir = str(tmp_path / "rebuilt")
+    _append(rebuilt_dir, 0, 5)
+    _append(rebuilt_dir, 5, 4, words="sustainable fashion thrift")
+    rebuilt = build_index(rebuilt_dir)
+
+    assert extended == rebuilt
+    assert Corpus(rebuilt_dir).terms() == terms
+    for name, array in _index_arrays(rebuilt_dir).items():
+        np.testing.assert_array_equal(arrays[name], array)
+
+
+def test_appended_posts_are_searchable(directory):
+    _append(directory, 0, 5)
+    assert len(Corpus(directory).search("thrift")[0]) == 0
+
+    _append(directory, 5, 2, words="sustainable fashion thrift")
+    docs, _ = Corpus(directory).search("thrift")  # the index is extended on first use
+
+    assert sorted(docs.tolist()) == [5, 6]
+    assert Corpus(directory).meta['index']['posts'] == 7
+
+
+def test_duplicate_posts_are_skipped(directory):
+    _append(directory, 0, 3)
+    with CorpusWriter(directory) as writer:
+        for i in range(4):
+            writer.add_post(_post(i))
+
+    assert writer.duplicates == 3
+    assert len(Corpus(directory)) == 4
+
+    # Across flushes, and within one load
+    with CorpusWriter(directory, batch_size=2) as writer:
+        for i in [9, 2, 8, 7, 9]:
+            writer.add_post(_post(i))
+
+    assert writer.duplicates == 2
+    assert writer._seen.tolist() == sorted(writer._seen.tolist())
+    assert len(Corpus(directory)) == 7
+
+
+def test_bytes_a_crashed_writer_left_are_dropped(directory):
+    _append(directory, 0, 3)
+    with open(f"{directory}/likes.bin", 'ab') as f:
+        f.write(b"\0" * 8)  # half a batch, never committed to meta.json
+
+    _append(directory, 3, 1)
+
+    store = Corpus(directory)
+    assert [store.post(doc)['likes'] for doc in range(4)] == [10, 11, 12, 13]
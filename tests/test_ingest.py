@@ -0,0 +1,19 @@
+import json
+
+from corpus import Corpus
+from ingest import ingest
+
+
+def test_records_that_are_not_loaded_are_counted(tmp_path):
+    post = {'competitor': "creator", 'text': "ai tools post", 'platform': "linkedin", 'likes': 3}
+    lines = [json.dumps(post), json.dumps(post), "{not json", json.dumps({'text': "no competitor"}),
+             json.dumps({'competitor': "creator", 'followers': 100})]
+    source = tmp_path / "dump.jsonl"
+    source.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    directory = str(tmp_path / "corpus")
+
+    stats = ingest([str(source)], directory, workers=1)
+
+    assert stats['records'] == 5
+    assert (stats['posts'], stats['duplicates'], stats['errors'], stats['skipped'], stats['profiles']) == (1, 1, 1, 1, 1)
+    assert len(Corpus(directory)) == 1
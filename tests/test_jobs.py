@@ -0,0 +1,101 @@
+import contextlib
+import io
+
+import pytest
+
+import jobs
+from jobs import JobFailed, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+def _report(topic: str, **request) -> dict:
+    return {'topic': topic, 'brand_names': ["Acme"], 'platforms': ["linkedin"], **request}
+
+
+def test_interactive_jobs_are_claimed_before_batch_ones(queue):
+    batch = queue.submit('report', _report("one", lane='batch'))
+    first = queue.submit('report', _report("two"))
+    second = queue.submit('report', _report("three"))
+
+    assert queue.job(batch)['ahead'] == 2
+    assert [queue.claim("worker")['job_id'] for _ in range(3)] == [first, second, batch]
+    assert queue.claim("worker") is None
+
+
+def test_identical_requests_join_the_queued_job(queue):
+    job_id = queue.submit('report', _report("one"), flight_key="key")
+
+    assert queue.submit('report', _report("one"), flight_key="key") == job_id
+    assert queue.submit('report', _report("one"), flight_key="other") != job_id
+    assert queue.job(job_id)['waiters'] == 1
+
+    queue.claim("worker")
+    queue.finish(job_id, {'Acme': {}})
+    assert queue.submit('report', _report("one"), flight_key="key") != job_id  # finished - a new run
+
+
+def test_events_and_result(queue):
+    job_id = queue.submit('report', _report("one"))
+    queue.claim("worker")
+    queue.add_event(job_id, {'type': 'planned'})
+    queue.add_event(job_id, {'type': 'report_ready'})
+    queue.finish(job_id, {'Acme': {'summary': "done"}})
+
+    events = queue.events(job_id)
+    assert [event['type'] for _, event in events] == ['planned', 'report_ready']
+    assert queue.events(job_id, after=events[0][0]) == events[1:]
+    job = queue.job(job_id)
+    assert (job['status'], job['result'], job['attempts']) == ('finished', {'Acme': {'summary': "done"}}, 1)
+
+
+def test_a_job_that_lost_its_worker_resumes_its_run(queue, monkeypatch):
+    job_id = queue.submit('report', _report("one"))
+    queue.claim("worker")
+    queue.set_run_id(job_id, "run-1")
+    queue.add_event(job_id, {'type': 'planned'})
+    monkeypatch.setattr(jobs, 'STALE_AFTER', -1)
+
+    assert queue.requeue_stale() == 1
+    job = queue.job(job_id)
+    assert (job['status'], job['request']['resume']) == ('queued', "run-1")
+    assert queue.events(job_id) == []
+
+
+def test_a_job_that_keeps_losing_its_worker_fails(queue, monkeypatch):
+    job_id = queue.submit('report', _report("one"))
+    monkeypatch.setattr(jobs, 'STALE_AFTER', -1)
+    for _ in range(jobs.MAX_ATTEMPTS):
+        queue.claim("worker")
+        queue.requeue_stale()
+
+    assert queue.job(job_id)['status'] == 'failed'
+
+
+def test_run_job_writes_the_report_and_its_events():
+    queue = jobs.get_job_queue()
+    job_id = queue.submit('report', _report("job queue topic", use_cache=False))
+    job = queue.claim("worker")
+    assert job['job_id'] == job_id
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        jobs.run_job(queue, job)
+
+    types = [event['type'] for event in jobs.follow(job_id)]
+    assert types[0] == 'planned' and types[-1] == 'report_ready'
+    job = queue.job(job_id)
+    assert job['status'] == 'finished' and job['run_id']
+    assert job['result']['Acme']['posts_by_platform']['linkedin']
+
+
+def test_following_a_failed_job_raises():
+    queue = jobs.get_job_queue()
+    job_id = queue.submit('report', _report("failing topic"))
+    queue.claim("worker")
+    queue.finish(job_id, error=TimeoutError("quota"))
+
+    with pytest.raises(JobFailed, match="quota"):
+        list(jobs.follow(job_id))
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+import tracing
+from fake_llm import FakeLLM, FakeLLMError
+from llm_client import CallPolicy, LLMTimeoutError, ManagedLLM, is_retryable
+from pipeline import current_stage
+
+
+class FlakyLLM(FakeLLM):
+    """
+    FakeLLM whose first `failures` calls fail with a 503.
+    """
+    failures: int = 0
+
+    def call(self, messages, **options):
+        with self._lock:
+            fail = self.failures > 0
+            self.failures -= fail
+        if fail:
+            self._record(str(messages), "", 0.0, failed=True)
+            raise FakeLLMError(503)
+        return super().call(messages, **options)
+
+
+def _llm(model: str = "primary", **overrides) -> FlakyLLM:
+    fields = dict(latency=0.0, jitter=0.0, use_tools=False, completion_tokens=20)
+    fields.update(overrides)
+    return FlakyLLM(model=model, **fields)
+
+
+def _policy(**overrides) -> CallPolicy:
+    settings = dict(timeout=5.0, max_retries=3, backoff_base=0.001, backoff_max=0.001, fallback_after=2,
+                    fallback_cooldown=60.0)
+    settings.update(overrides)
+    return CallPolicy(**settings)
+
+
+@pytest.fixture
+def trace():
+    with tracing.start_trace("topic", ["brand"]) as trace:
+        current_stage.set("stage")
+        yield trace
+
+
+def _totals(trace) -> dict:
+    return trace.summary()['totals']
+
+
+def test_retryable_errors():
+    assert is_retryable(FakeLLMError(503))
+    assert is_retryable(FakeLLMError(429))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(FakeLLMError(400))
+
+
+def test_a_retryable_failure_is_retried(trace):
+    primary = _llm(failures=2)
+
+    answer = ManagedLLM.wrap(primary, policy=_policy(fallback_after=10)).call("prompt")
+
+    assert "Final Answer" in answer
+    assert len(primary.usage()) == 3
+    assert _totals(trace)['retries'] == 2
+    assert _totals(trace)['llm_calls'] == 1
+
+
+def test_retries_stop_at_max_retries(trace):
+    primary = _llm(failures=100)
+
+    with pytest.raises(FakeLLMError):
+        ManagedLLM.wrap(primary, policy=_policy(max_retries=2, fallback_after=10)).call("prompt")
+
+    assert len(primary.usage()) == 3
+    assert _totals(trace)['retries'] == 2
+    assert _totals(trace)['llm_errors'] == 1
+
+
+def test_a_non_retryable_error_is_not_retried(trace):
+    primary = _llm(failure_rate=1.0, failure_status=400)
+
+    with pytest.raises(FakeLLMError):
+        ManagedLLM.wrap(primary, policy=_policy()).call("prompt")
+
+    assert len(primary.usage()) == 1
+    assert _totals(trace)['retries'] == 0
+
+
+def test_calls_move_to_the_fallback_after_repeated_failures(trace):
+    primary, fallback = _llm(failures=100), _llm("fallback")
+    llm = ManagedLLM.wrap(primary, fallback, _policy(fallback_after=2))
+
+    llm.call("first")   # primary fails twice, the second retry goes to the fallback
+    llm.call("second")  # straight to the fallback while the primary cools down
+
+    assert len(primary.usage()) == 2
+    assert len(fallback.usage()) == 2
+    assert _totals(trace)['fallbacks'] == 2
+    assert _totals(trace)['retries'] == 2
+
+
+def test_the_primary_is_used_again_after_the_cooldown(trace):
+    primary, fallback = _llm(failures=2), _llm("fallback")
+    llm = ManagedLLM.wrap(primary, fallback, _policy(fallback_after=2, fallback_cooldown=0.05))
+
+    llm.call("first")
+    time.sleep(0.1)
+    llm.call("second")
+
+    assert [call['failed'] for call in primary.usage()] == [True, True, False]
+    assert len(fallback.usage()) == 1
+
+
+def test_a_slow_call_times_out(trace):
+    slow = _llm(latency=0.5)
+
+    with pytest.raises(LLMTimeoutError):
+        ManagedLLM.wrap(slow, policy=_policy(timeout=0.05, max_retries=1)).call("prompt")
+
+    assert _totals(trace)['timeouts'] == 2
+    assert _totals(trace)['retries'] == 1
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pipeline import Stage, arun_pipeline, run_pipeline, start_pipeline
+
+
+def _recording(log: list, name: str, result=None, delay: float = 0.0, error: Exception = None):
+    def run(inputs):
+        log.append(('start', name, sorted(inputs)))
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        log.append(('finish', name))
+        return result if result is not None else f"{name}({','.join(inputs[dep] for dep in sorted(inputs))})"
+    return run
+
+
+def _diamond(log: list, **overrides) -> list:
+    # research -> (trends, gaps) -> ideas
+    runs = {name: _recording(log, name) for name in ('research', 'trends', 'gaps', 'ideas')}
+    runs.update(overrides)
+    return [
+        Stage('ideas', runs['ideas'], deps=('trends', 'gaps')),
+        Stage('trends', runs['trends'], deps=('research',)),
+        Stage('gaps', runs['gaps'], deps=('research',)),
+        Stage('research', runs['research']),
+    ]
+
+
+def test_stages_run_after_their_dependencies_with_their_outputs():
+    log = []
+    outputs = run_pipeline(_diamond(log))
+
+    assert outputs['ideas'] == "ideas(gaps(research()),trends(research()))"
+    order = [entry[:2] for entry in log]
+    for stage, deps in [('trends', ['research']), ('gaps', ['research']), ('ideas', ['trends', 'gaps'])]:
+        assert all(order.index(('finish', dep)) < order.index(('start', stage)) for dep in deps)
+
+
+def test_independent_stages_overlap():
+    running, overlapped = set(), []
+    lock = threading.Lock()
+
+    def run(name):
+        def stage(inputs):
+            with lock:
+                running.add(name)
+            time.sleep(0.05)
+            with lock:
+                overlapped.append(len(running))
+                running.discard(name)
+            return name
+        return stage
+
+    run_pipeline([Stage('a', run('a')), Stage('b', run('b'))])
+
+    assert max(overlapped) == 2
+
+
+def test_first_failure_is_raised_after_running_stages_settle():
+    log = []
+    stages = _diamond(log, trends=_recording(log, 'trends', error=TimeoutError("trends timed out")),
+                      gaps=_recording(log, 'gaps', delay=0.1))
+
+    with pytest.raises(TimeoutError, match="trends timed out"):
+        run_pipeline(stages)
+
+    assert ('finish', 'gaps') in log  # already running - allowed to finish
+    assert not any(entry[1] == 'ideas' for entry in log)
+
+
+def test_failure_events():
+    events = []
+    stages = _diamond([], gaps=_recording([], 'gaps', error=ValueError("bad gaps")))
+
+    with pytest.raises(ValueError):
+        run_pipeline(stages, on_event=events.append)
+
+    failed = [event for event in events if event['type'] == 'stage_failed']
+    assert [(event['stage'], str(event['error'])) for event in failed] == [('gaps', "bad gaps")]
+
+
+def test_completed_stages_are_restored_not_run():
+    log, events = [], []
+    outputs = run_pipeline(_diamond(log), on_event=events.append,
+                           completed={'research': "kept", 'trends': "kept trends"})
+
+    assert {entry[1] for entry in log} == {'gaps', 'ideas'}
+    assert outputs['ideas'] == "ideas(gaps(kept),kept trends)"
+    assert sorted(event['stage'] for event in events if event['type'] == 'stage_restored') == ['research', 'trends']
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage('a', None, deps=('b',)), Stage('b', None, deps=('a',))], "cycle"),
+    ([Stage('a', None, deps=('missing',))], "unknown stages"),
+    ([Stage('a', None), Stage('a', None)], "Duplicate"),
+])
+def test_bad_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        run_pipeline(stages)
+
+
+def test_started_stages_can_be_awaited_one_by_one():
+    async def main():
+        tasks = start_pipeline(_diamond([]))
+        research = await tasks['research']
+        ideas = await tasks['ideas']
+        return research, ideas
+
+    assert asyncio.run(main()) == ("research()", "ideas(gaps(research()),trends(research()))")
+
+
+def test_dependents_of_a_failed_stage_raise_its_error():
+    log = []
+
+    async def main():
+        tasks = start_pipeline(_diamond(log, research=_recording(log, 'research', error=ConnectionError("down"))))
+        with pytest.raises(ConnectionError, match="down"):
+            await tasks['ideas']
+        with pytest.raises(ConnectionError):
+            await tasks['trends']
+
+    asyncio.run(main())
+    assert [entry[1] for entry in log] == ['research']
+
+
+def test_arun_pipeline_raises_the_first_failure():
+    stages = _diamond([], ideas=_recording([], 'ideas', error=RuntimeError("ideas failed")))
+
+    with pytest.raises(RuntimeError, match="ideas failed"):
+        asyncio.run(arun_pipeline(stages))
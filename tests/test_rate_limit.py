@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from rate_limit import RateLimiter, current_lane, lane
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "rate_limit.sqlite3")
+
+
+def test_requests_beyond_the_burst_wait(path):
+    limiter = RateLimiter(path, requests_per_minute=60, tokens_per_minute=0)  # a burst of 10
+
+    assert [limiter.acquire(1, block=False) for _ in range(10)] == [0.0] * 10
+    assert limiter.acquire(1, block=False) is None
+
+
+def test_tokens_are_settled_once_known(path):
+    limiter = RateLimiter(path, requests_per_minute=0, tokens_per_minute=600)  # a burst of 100 tokens
+
+    assert limiter.acquire(80, block=False) == 0.0
+    assert limiter.acquire(50, block=False) is None
+    limiter.settle(-60)  # the call used 60 tokens fewer than reserved
+    assert limiter.acquire(50, block=False) == 0.0
+
+
+def test_a_call_bigger_than_the_bucket_goes_once_it_is_full(path):
+    limiter = RateLimiter(path, requests_per_minute=0, tokens_per_minute=600)
+
+    assert limiter.acquire(500, block=False) == 0.0
+    assert limiter.acquire(1, block=False) is None
+
+
+def test_a_blocked_call_waits_for_capacity(path):
+    limiter = RateLimiter(path, requests_per_minute=0, tokens_per_minute=600)  # 10 tokens a second
+    limiter.acquire(100)
+
+    waited = limiter.acquire(2)
+
+    assert 0.1 < waited < 1.0
+
+
+def test_limiters_on_one_file_share_the_buckets(path):
+    first = RateLimiter(path, requests_per_minute=60, tokens_per_minute=0)
+    second = RateLimiter(path, requests_per_minute=60, tokens_per_minute=0)
+    for _ in range(10):
+        first.acquire(1)
+
+    assert second.acquire(1, block=False) is None
+
+
+def test_no_limits(path):
+    limiter = RateLimiter(path, requests_per_minute=0, tokens_per_minute=0)
+
+    assert not limiter.enabled
+    assert limiter.acquire(10 ** 9, block=False) == 0.0
+
+
+def test_interactive_calls_go_before_batch_ones(path):
+    limiter = RateLimiter(path, requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(100)
+    served = []
+
+    def call(name):
+        limiter.acquire(3, lane=name)
+        served.append(name)
+
+    batch = threading.Thread(target=call, args=('batch',))
+    batch.start()
+    time.sleep(0.02)  # the batch call is queued first
+    interactive = threading.Thread(target=call, args=('interactive',))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+
+    assert served == ['interactive', 'batch']
+
+
+def test_lane_sets_the_current_lane():
+    with lane('batch'):
+        assert current_lane.get() == 'batch'
+    assert current_lane.get() == 'interactive'
+    with pytest.raises(ValueError):
+        with lane('bulk'):
+            pass
@@ -0,0 +1,28 @@
+import pytest
+
+import agents
+
+
+def test_regenerate_section_reruns_it_and_what_depends_on_it(llm_calls):
+    report = agents.generate_competitor_intelligence("regenerate topic", "Acme", ["linkedin", "twitter"],
+                                                     use_cache=False)
+    first_run = llm_calls()
+
+    regenerated = agents.regenerate_section(report['run_id'], 'content_ideas')['Acme']
+
+    assert set(llm_calls() - first_run) == {'content_ideas', 'post_linkedin', 'post_twitter'}
+    assert regenerated['run_id'] == report['run_id']
+    assert regenerated['competitor_research'] == report['competitor_research']
+    statuses = {stage['stage']: stage['status'] for stage in regenerated['trace']['stages']}
+    assert statuses['content_gaps'] == 'restored' and statuses['content_ideas'] == 'finished'
+
+
+def test_regenerate_rejects_unknown_sections_and_runs(llm_calls):
+    report = agents.generate_competitor_intelligence("regenerate errors", "Acme", ["linkedin"], use_cache=False)
+
+    with pytest.raises(ValueError, match="Unknown report section"):
+        agents.regenerate_section(report['run_id'], 'summary')
+    with pytest.raises(ValueError, match="no brand"):
+        agents.regenerate_section(report['run_id'], 'content_ideas', brand_name="Other")
+    with pytest.raises(ValueError, match="No checkpoints"):
+        agents.regenerate_section("no-such-run", 'content_ideas')
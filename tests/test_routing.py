@@ -0,0 +1,29 @@
+import pytest
+
+import agents
+
+
+@pytest.fixture
+def two_tiers(monkeypatch):
+    """
+    Gives the fast and strong tiers FakeLLMs of their own, so 'escalate'
+    stages can escalate.
+    """
+    monkeypatch.setitem(agents.TIER_MODELS, 'fast', 'fake-fast')
+    monkeypatch.setitem(agents.TIER_MODELS, 'strong', 'fake-strong')
+    agents.get_agents.cache_clear()
+    yield
+    agents.get_agents.cache_clear()
+
+
+def test_an_escalated_stage_gets_real_tool_results(two_tiers, monkeypatch):
+    monkeypatch.setattr(agents, 'validate', lambda section, output: "too short")
+
+    report = agents.generate_competitor_intelligence("escalated tool topic", "Acme", ["linkedin"],
+                                                     use_cache=False)
+
+    gaps = next(stage for stage in report['trace']['stages'] if stage['stage'] == 'content_gaps')
+    assert gaps['tier'] == 'strong' and gaps['escalations'] == 1
+    # Both attempts called find_content_gaps; the strong one was answered from the tool cache
+    assert gaps['tool_calls'] == 2 and gaps['tool_cache_hits'] == 1
+    assert gaps['tool_calls_blocked'] == 0
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import agents
+from singleflight import SingleFlight, get_single_flight
+
+
+def _gated_run(gate: threading.Event, starts: list, events=("a", "b", "c"), error: Exception = None):
+    def start(flight):
+        starts.append(flight.key)
+        yield events[0]
+        gate.wait(5)
+        yield from events[1:]
+        if error is not None:
+            raise error
+    return start
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _follow_in_thread(flights: SingleFlight, key: str, start, results: dict, name: str) -> threading.Thread:
+    def follow():
+        try:
+            results[name] = list(flights.follow(key, start))
+        except Exception as e:
+            results[name] = e
+    thread = threading.Thread(target=follow)
+    thread.start()
+    return thread
+
+
+def test_identical_requests_share_one_run():
+    flights, gate, starts, results = SingleFlight(), threading.Event(), [], {}
+    first = flights.follow("key", _gated_run(gate, starts))
+    assert next(first) == "a"
+
+    threads = [_follow_in_thread(flights, "key", _gated_run(gate, starts), results, name) for name in ("x", "y")]
+    _wait_for(lambda: flights.stats()['coalesced'] == 2)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert list(first) == ["b", "c"]
+    assert results == {"x": ["a", "b", "c"], "y": ["a", "b", "c"]}  # replayed from the first event
+    assert starts == ["key"]
+    assert flights.stats() == {'in_flight': 0, 'started': 1, 'coalesced': 2}
+
+
+def test_a_failed_run_raises_for_every_caller():
+    flights, gate, starts, results = SingleFlight(), threading.Event(), [], {}
+    start = _gated_run(gate, starts, error=TimeoutError("quota"))
+    first = flights.follow("key", start)
+    next(first)
+    thread = _follow_in_thread(flights, "key", start, results, "x")
+    _wait_for(lambda: flights.stats()['coalesced'] == 1)
+    gate.set()
+    thread.join(5)
+
+    with pytest.raises(TimeoutError):
+        list(first)
+    assert isinstance(results["x"], TimeoutError)
+    assert starts == ["key"]
+
+
+def test_a_finished_run_is_not_joined():
+    flights, gate, starts = SingleFlight(), threading.Event(), []
+    gate.set()
+
+    assert list(flights.follow("key", _gated_run(gate, starts))) == ["a", "b", "c"]
+    # The run leaves the table just after its last event is delivered
+    _wait_for(lambda: not flights.stats()['in_flight'])
+    assert list(flights.follow("key", _gated_run(gate, starts))) == ["a", "b", "c"]
+    assert starts == ["key", "key"]
+
+
+def test_different_keys_run_separately():
+    flights, gate, starts = SingleFlight(), threading.Event(), []
+
+    threads = [_follow_in_thread(flights, key, _gated_run(gate, starts), {}, key) for key in ("one", "two")]
+    _wait_for(lambda: len(starts) == 2)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(starts) == ["one", "two"]
+    assert flights.stats()['coalesced'] == 0
+
+
+def test_async_followers_share_the_run_with_sync_ones():
+    flights, gate, starts = SingleFlight(), threading.Event(), []
+    results = {}
+    thread = _follow_in_thread(flights, "key", _gated_run(gate, starts), results, "sync")
+    _wait_for(lambda: flights.stats()['in_flight'])
+
+    async def follow():
+        return [event async for event in flights.afollow("key", _gated_run(gate, starts))]
+
+    async def release_and_follow():
+        follower = asyncio.ensure_future(follow())
+        await asyncio.sleep(0.01)
+        gate.set()
+        return await follower
+
+    assert asyncio.run(release_and_follow()) == ["a", "b", "c"]
+    thread.join(5)
+    assert results["sync"] == ["a", "b", "c"]
+    assert starts == ["key"] and flights.stats()['coalesced'] == 1
+
+
+def test_identical_report_requests_are_coalesced(fake_llms, llm_calls):
+    alone = agents.generate_competitor_intelligence("coalesced solo topic", "Acme", ["linkedin"], use_cache=False)
+    solo_calls = llm_calls()
+    flights = get_single_flight()
+    coalesced = flights.stats()['coalesced']
+    results = {}
+
+    def request(name, brand_name):
+        results[name] = agents.generate_competitor_intelligence("coalesced topic", brand_name, ["linkedin"],
+                                                                use_cache=False)
+
+    for llm in fake_llms:
+        llm.latency = 0.05  # long enough for the others to join
+    try:
+        threads = [threading.Thread(target=request, args=(name, brand_name))
+                   for name, brand_name in [("first", "Acme"), ("second", "acme"), ("third", " ACME ")]]
+        threads[0].start()
+        _wait_for(lambda: flights.stats()['in_flight'])
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+    finally:
+        for llm in fake_llms:
+            llm.latency = 0.01
+
+    assert flights.stats()['coalesced'] == coalesced + 2
+    assert len({report['run_id'] for report in results.values()}) == 1
+    assert results['first']['trace']['coalesced'] == 2
+    assert sum((llm_calls() - solo_calls).values()) == sum(solo_calls.values())
+    assert alone['run_id'] != results['first']['run_id']
+
+
+def test_identical_async_report_requests_are_coalesced(fake_llms, llm_calls):
+    agents.generate_competitor_intelligence("async coalesced solo topic", "Acme", ["linkedin"], use_cache=False)
+    solo_calls = llm_calls()
+    flights = get_single_flight()
+    coalesced = flights.stats()['coalesced']
+
+    async def both():
+        return await asyncio.gather(*(
+            agents.agenerate_competitor_intelligence("async coalesced topic", brand_name, ["linkedin"],
+                                                     use_cache=False)
+            for brand_name in ("Acme", "acme")))
+
+    for llm in fake_llms:
+        llm.latency = 0.05
+    try:
+        first, second = asyncio.run(both())
+    finally:
+        for llm in fake_llms:
+            llm.latency = 0.01
+
+    assert flights.stats()['coalesced'] == coalesced + 1
+    assert first['run_id'] == second['run_id'] and first['trace']['coalesced'] == 1
+    assert sum((llm_calls() - solo_calls).values()) == sum(solo_calls.values())
+
+
+def test_astart_resolves_each_section_and_the_report(llm_calls):
+    async def start():
+        futures = agents.astart_competitor_intelligence("astart topic", "Acme", ["linkedin"], use_cache=False)
+        return {name: await future for name, future in futures.items()}
+
+    outputs = asyncio.run(start())
+
+    assert set(outputs) == {'competitor_research', 'trend_analysis', 'content_gaps', 'content_ideas',
+                            'post_linkedin', 'platform_posts', 'report'}
+    assert outputs['report']['content_ideas'] == outputs['content_ideas']
+    assert outputs['report']['posts_by_platform']['linkedin'] == outputs['post_linkedin']
@@ -0,0 +1,62 @@
+import pytest
+
+from topic_cache import TopicCache, topic_terms
+
+OUTPUTS = {'competitor_research': "research", 'trend_analysis': "trends"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TopicCache(str(tmp_path / "topics.db"))
+
+
+def test_topic_terms_ignore_order_plurals_and_product_words():
+    assert topic_terms("AI productivity tools") == {'ai', 'productivity', 'tool'}
+    assert topic_terms("productivity AI apps") == topic_terms("AI productivity tools")
+    assert topic_terms("AI tools for productivity") == topic_terms("AI productivity tools")
+
+
+@pytest.mark.parametrize("topic", ["productivity AI apps", "AI tools for productivity", "ai  Productivity TOOLS"])
+def test_rephrased_topic_reuses_outputs(cache, topic):
+    cache.set("AI productivity tools", "config", OUTPUTS)
+
+    match = cache.lookup(topic, "config")
+
+    assert match is not None
+    assert match['topic'] == "AI productivity tools"
+    assert match['outputs'] == OUTPUTS
+
+
+@pytest.mark.parametrize("stored, topic", [
+    ("ai productivity tools", "ai tools"),  # broader
+    ("ai tools", "ai productivity tools"),  # narrower
+    ("ai tools", "ai marketing tools"),
+    ("AI productivity tools", "AI marketing tools"),
+])
+def test_different_topic_is_not_reused(cache, stored, topic):
+    cache.set(stored, "config", OUTPUTS)
+
+    assert cache.lookup(topic, "config") is None
+
+
+def test_outputs_are_only_reused_for_the_same_config(cache):
+    cache.set("AI productivity tools", "config", OUTPUTS)
+
+    assert cache.lookup("productivity AI apps", "other config") is None
+
+
+def test_expired_topic_is_not_reused(tmp_path):
+    cache = TopicCache(str(tmp_path / "topics.db"), ttl_seconds=-1)
+    cache.set("AI productivity tools", "config", OUTPUTS)
+
+    assert cache.lookup("AI productivity tools", "config") is None
+
+
+def test_topics_stored_by_another_process_are_found(tmp_path):
+    path = str(tmp_path / "topics.db")
+    reader = TopicCache(path)
+    assert reader.lookup("AI productivity tools", "config") is None
+
+    TopicCache(path).set("AI productivity tools", "config", OUTPUTS)
+
+    assert reader.lookup("productivity AI apps", "config")['outputs'] == OUTPUTS
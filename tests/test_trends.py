@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+import trends
+from corpus import Corpus, CorpusWriter
+from trends import DAY, TrendStore
+
+
+def test_posts_dated_past_the_day_field_are_left_out(tmp_path):
+    directory = str(tmp_path / "corpus")
+    with CorpusWriter(directory) as writer:
+        for i, posted_at in enumerate([1_700_000_000, 1_700_003_600, 70_000 * DAY]):
+            writer.add_post({'competitor': "creator", 'text': f"post {i}", 'platform': "linkedin",
+                             'format': "text", 'posted_at': posted_at, 'likes': 10, 'comments': 1, 'shares': 0,
+                             'views': 100, 'hashtags': ["ai"]})
+
+    store = TrendStore(directory)
+    store.refresh(Corpus(directory))
+
+    daily = store.snapshot()['daily']
+    assert daily['posts'].sum() == 2
+    assert np.all(daily['keys'] & 0xFFFF == 1_700_000_000 // DAY)
+
+
+def test_keys_that_do_not_fit_their_fields_are_rejected():
+    tags = np.array([1, 2], dtype=np.int64)
+    with pytest.raises(ValueError, match="format"):
+        trends._pack(tags, np.array([3, 4]), np.array([0, 1 << 16]))
+    with pytest.raises(ValueError, match="hashtag"):
+        trends._pack(np.array([1 << 31]), np.array([3]))
@@ -0,0 +1,125 @@
+"""
+Memoization and a per-run call budget for the analyzer tools.
+
+Tool results are kept in a ResultCache table keyed on the tool, its
+normalized arguments and the corpus snapshot, so the same question about the
+same data is answered once - across stages, reports and processes - until
+TOOL_CACHE_TTL expires it or new posts are loaded. Within a run, an agent
+repeating a call it already made in the same stage, or going past
+TOOL_CALL_BUDGET calls, gets a short note instead of the output again; an
+escalated stage starts over with a clean record (see forget_stage_calls).
+"""
+import functools
+import inspect
+import os
+import threading
+import weakref
+from collections import Counter
+from functools import lru_cache
+
+import tracing
+from cache import DEFAULT_CACHE_PATH, ResultCache, make_cache_key, normalize_text
+from corpus import corpus_snapshot
+from pipeline import current_stage
+from tracing import current_trace
+
+DEFAULT_TOOL_CACHE_TTL = 6 * 3600
+DEFAULT_TOOL_CACHE_MAX_ENTRIES = 5000
+
+# Tool calls one report may make across all its stages
+TOOL_CALL_BUDGET = int(os.getenv("TOOL_CALL_BUDGET", "30"))
+
+# Bump when a tool's output format changes so old entries stop matching
+TOOL_CACHE_VERSION = 1
+
+REPEATED_CALL_NOTE = ("You already called {tool} with these arguments in this task and its result is above. "
+                      "Use that result instead of calling the tool again.")
+BUDGET_NOTE = ("The tool-call budget for this report ({budget} calls) is used up. "
+               "Continue with the information you already have.")
+
+
+@lru_cache(maxsize=None)
+def get_tool_cache() -> ResultCache:
+    """
+    Process-wide cache for tool results, configured through TOOL_CACHE_PATH
+    (the report cache file by default), TOOL_CACHE_TTL (seconds) and
+    TOOL_CACHE_MAX_ENTRIES.
+    """
+    return ResultCache(
+        os.getenv("TOOL_CACHE_PATH", os.getenv("REPORT_CACHE_PATH", DEFAULT_CACHE_PATH)),
+        ttl_seconds=float(os.getenv("TOOL_CACHE_TTL", DEFAULT_TOOL_CACHE_TTL)),
+        max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", DEFAULT_TOOL_CACHE_MAX_ENTRIES)),
+        table="tool_results",
+    )
+
+
+# Calls made so far per run, dropped with the run's Trace
+_calls = weakref.WeakKeyDictionary()
+_calls_lock = threading.Lock()
+
+
+def _blocked_note(trace, stage: str, key: str, tool: str):
+    with _calls_lock:
+        calls = _calls.setdefault(trace, Counter())
+        if calls[(stage, key)]:
+            return REPEATED_CALL_NOTE.format(tool=tool)
+        if sum(calls.values()) >= TOOL_CALL_BUDGET:
+            return BUDGET_NOTE.format(budget=TOOL_CALL_BUDGET)
+        calls[(stage, key)] += 1
+    return None
+
+
+def forget_stage_calls(stage: str) -> None:
+    """
+    Drops the current run's record of the calls made in `stage`, so a rerun
+    of the stage (an escalation to the strong tier) gets real results for
+    the calls the first attempt made and a budget of its own for them.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return
+    with _calls_lock:
+        calls = _calls.get(trace)
+        for entry in [entry for entry in calls or () if entry[0] == stage]:
+            del calls[entry]
+
+
+def tool_call_key(func, *args, **kwargs) -> str:
+    """
+    Cache key of a tool call: the tool, its arguments (text normalized as
+    for report keys) and the data they are answered from.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: normalize_text(value) if isinstance(value, str) else value
+                 for name, value in bound.arguments.items()}
+    return make_cache_key(tool=func.__name__, arguments=arguments, data=corpus_snapshot(),
+                          version=TOOL_CACHE_VERSION)
+
+
+def memoized_tool(func):
+    """
+    Serves repeated tool calls from the tool cache and enforces the per-run
+    budget, counting hits, misses and blocked calls on the current trace.
+    Apply it under @traced_tool so cached calls are still traced.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = tool_call_key(func, *args, **kwargs)
+        trace = current_trace.get()
+        if trace is not None:
+            note = _blocked_note(trace, current_stage.get(), key, func.__name__)
+            if note:
+                tracing.count('tool_calls_blocked')
+                return note
+
+        cache = get_tool_cache()
+        result = cache.get(key)
+        if result is not None:
+            tracing.count('tool_cache_hits')
+            return result
+        tracing.count('tool_cache_misses')
+        result = func(*args, **kwargs)
+        cache.set(key, result)
+        return result
+    return wrapper
@@ -0,0 +1,189 @@
+"""
+Near-duplicate topic cache for the topic-level stages.
+
+"AI productivity tools", "AI tools for productivity" and "productivity AI
+apps" all get the same competitor research and trend analysis, but miss
+the exact-key report cache. Here every topic whose research and trends
+were run is stored with its outputs, and a new topic is looked up by
+cosine similarity in an IVFIndex. Above TOPIC_SIMILARITY_THRESHOLD the
+stored outputs are reused instead of running those stages again.
+
+Topics are compared by their terms (topic_terms): word order, plurals and
+interchangeable product words ("apps", "tools", "software") do not count,
+so the three topics above share one set of terms. A topic whose terms are
+a strict subset or superset of a stored one's ("AI tools" against "AI
+marketing tools") is narrower or broader than it, and never reused however
+close the two are.
+
+Topics live in a SQLite table shared by every process; each process keeps
+its own in-memory index and adds the topics other processes stored since
+it last looked.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_SECONDS, normalize_text
+from corpus import tokenize
+from embeddings import IVFIndex, embed_texts
+
+DEFAULT_TOPIC_SIMILARITY = 0.8
+DEFAULT_TOPIC_MAX_ENTRIES = 5000
+
+# Nearest topics checked per lookup - closer ones may be expired or stored
+# under another configuration
+SEARCH_K = 10
+
+# The index is retrained once it has grown to this many times the size it
+# was trained at, so buckets stay balanced as topics are added
+RETRAIN_GROWTH = 2
+MIN_TRAIN_SIZE = 256
+
+# Words for what kind of product a topic is about, which do not make two
+# topics different ("AI productivity apps" is "AI productivity tools")
+GENERIC_TERMS = frozenset("""
+app application platform product program service software solution suite tool utility
+""".split())
+
+
+def topic_terms(topic: str) -> frozenset:
+    """
+    The terms a topic is compared by: its words without stopwords, in the
+    singular, with every generic product word as 'tool'.
+    """
+    terms = set()
+    for token in tokenize(topic):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.add('tool' if token in GENERIC_TERMS else token)
+    return frozenset(terms)
+
+
+def _embed_terms(topics: list):
+    return embed_texts([" ".join(sorted(topic_terms(topic))) for topic in topics])
+
+
+class TopicCache:
+    """
+    Topic-level stage outputs by topic, with a similarity lookup. `config`
+    identifies what the outputs were produced with (model, prompts, ...):
+    only outputs stored under the same one are reused. A `threshold` of 0
+    turns lookups off.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 threshold: float = DEFAULT_TOPIC_SIMILARITY, max_entries: int = DEFAULT_TOPIC_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.index = IVFIndex(None)
+        self._synced_id = 0
+        self._trained_size = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    topic_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE (normalized, config)
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _sync(self, conn: sqlite3.Connection) -> None:
+        # Indexes topics stored (by any process) since the last sync
+        rows = conn.execute("SELECT topic_id, normalized FROM topics WHERE topic_id > ? ORDER BY topic_id",
+                            (self._synced_id,)).fetchall()
+        if not rows:
+            return
+        ids = [topic_id for topic_id, _ in rows]
+        self.index.add(ids, _embed_terms([normalized for _, normalized in rows]))
+        self._synced_id = ids[-1]
+        if len(self.index) >= max(MIN_TRAIN_SIZE, self._trained_size * RETRAIN_GROWTH):
+            self.index.build(self.index.ids, self.index.vectors)
+            self._trained_size = len(self.index)
+
+    def lookup(self, topic: str, config: str):
+        """
+        The most similar stored topic above the threshold, as {'topic',
+        'similarity', 'outputs'}, or None. Topics narrower or broader than
+        this one are passed over.
+        """
+        if not self.threshold:
+            return None
+        terms = topic_terms(topic)
+        vector = _embed_terms([topic])[0]
+        if not vector.any():
+            return None  # nothing but stopwords to compare
+        with self._lock, self._connect() as conn:
+            self._sync(conn)
+            ids, similarities = self.index.search(vector, k=SEARCH_K)
+            for topic_id, similarity in zip(ids.tolist(), similarities.tolist()):
+                if similarity < self.threshold:
+                    break
+                row = conn.execute("""
+                    SELECT topic, normalized, outputs FROM topics
+                    WHERE topic_id = ? AND config = ? AND created_at >= ?""",
+                                   (topic_id, config, time.time() - self.ttl_seconds)).fetchone()
+                if row is None:
+                    continue
+                stored_terms = topic_terms(row[1])
+                if terms < stored_terms or terms > stored_terms:
+                    continue
+                return {'topic': row[0], 'similarity': round(min(similarity, 1.0), 4),
+                        'outputs': json.loads(row[2])}
+        return None
+
+    def set(self, topic: str, config: str, outputs: dict) -> None:
+        """
+        Stores (or refreshes) a topic's stage outputs, then drops expired
+        topics and the oldest beyond `max_entries`.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT INTO topics (topic, normalized, config, outputs, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (normalized, config) DO UPDATE
+                SET topic = excluded.topic, outputs = excluded.outputs, created_at = excluded.created_at""",
+                         (topic, normalize_text(topic), config, json.dumps(outputs, ensure_ascii=False), now))
+            conn.execute("DELETE FROM topics WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute("""
+                DELETE FROM topics WHERE topic_id IN (
+                    SELECT topic_id FROM topics ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+
+
+@lru_cache(maxsize=None)
+def get_topic_cache() -> TopicCache:
+    """
+    Process-wide topic cache, configured through TOPIC_CACHE_PATH (the
+    report cache file by default), TOPIC_CACHE_TTL (seconds),
+    TOPIC_CACHE_MAX_ENTRIES and TOPIC_SIMILARITY_THRESHOLD (cosine
+    similarity, 0 = off).
+    """
+    return TopicCache(
+        os.getenv("TOPIC_CACHE_PATH", os.getenv("REPORT_CACHE_PATH", DEFAULT_CACHE_PATH)),
+        ttl_seconds=float(os.getenv("TOPIC_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+        threshold=float(os.getenv("TOPIC_SIMILARITY_THRESHOLD", DEFAULT_TOPIC_SIMILARITY)),
+        max_entries=int(os.getenv("TOPIC_CACHE_MAX_ENTRIES", DEFAULT_TOPIC_MAX_ENTRIES)),
+    )
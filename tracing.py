@@ -0,0 +1,282 @@
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pipeline import current_stage
+
+DEFAULT_TRACE_PATH = os.path.join(".cache", "traces.jsonl")
+
+# USD per million tokens, defaults to Gemini 1.5 Flash list prices
+PRICE_PER_MTOK_INPUT = float(os.getenv("LLM_PRICE_PER_MTOK_INPUT", "0.075"))
+PRICE_PER_MTOK_OUTPUT = float(os.getenv("LLM_PRICE_PER_MTOK_OUTPUT", "0.30"))
+
+# Trace of the report currently running, visible to LLM and tool calls made
+# from the pipeline's worker threads (contextvars follow the stage)
+current_trace = ContextVar("current_trace", default=None)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token) - close enough for sizing
+    prompts and costs without pulling in a tokenizer.
+    """
+    return max(1, len(text) // 4)
+
+
+def _new_stage_record(name: str) -> dict:
+    return {
+        'stage': name,
+        'status': 'pending',
+        'queued_at': None,
+        'started_at': None,
+        'finished_at': None,
+        'queue_s': 0.0,
+        'wall_s': 0.0,
+        'llm_calls': 0,
+        'llm_errors': 0,
+        'llm_s': 0.0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'tool_calls': 0,
+        'tool_s': 0.0,
+        'tool_cache_hits': 0,
+        'tool_cache_misses': 0,
+        'tool_calls_blocked': 0,
+        'retries': 0,
+        'timeouts': 0,
+        'hedges': 0,
+        'hedge_wins': 0,
+        'fallbacks': 0,
+        'rate_limited': 0,
+        'rate_wait_s': 0.0,
+        'context_tokens_raw': 0,
+        'context_tokens': 0,
+        'model': None,
+        'tier': None,
+        'escalations': 0,
+        'escalation_reason': None,
+        'latency_budget_s': None,
+        'token_budget': None,
+        'over_budget': [],
+    }
+
+
+class Trace:
+    """
+    Structured record of one report run: per-stage wall and queue time, LLM
+    calls, prompt/completion tokens, tool calls and retries. Feed it pipeline
+    events through `on_event`; LLM and tool calls are attributed to the stage
+    they run in via `current_stage`.
+    """
+
+    def __init__(self, topic: str, brands: list, cached: list = (), run_id: str = None):
+        self.run_id = run_id or new_run_id()
+        self.topic = topic
+        self.brands = list(brands)
+        self.cached = list(cached)
+        # Identical requests that attached to this run instead of starting their own
+        self.coalesced = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.status = 'running'
+        self.error = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> dict:
+        name = name or 'unattributed'
+        if name not in self.stages:
+            self.stages[name] = _new_stage_record(name)
+        return self.stages[name]
+
+    def on_event(self, event: dict) -> None:
+        """
+        Pipeline event hook (see pipeline.run_pipeline).
+        """
+        with self._lock:
+            record = self._stage(event['stage'])
+            if event['type'] == 'stage_restored':
+                record['status'] = 'restored'
+            elif event['type'] == 'stage_started':
+                record['status'] = 'running'
+                record['started_at'] = event['time']
+                record['queued_at'] = event.get('queued_at') or event['time']
+                record['queue_s'] = record['started_at'] - record['queued_at']
+            else:
+                record['status'] = 'finished' if event['type'] == 'stage_finished' else 'failed'
+                record['finished_at'] = event['time']
+                if record['started_at'] is not None:
+                    record['wall_s'] = record['finished_at'] - record['started_at']
+
+    def record_llm_call(self, stage: str, prompt_tokens: int, completion_tokens: int,
+                        seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            record = self._stage(stage)
+            record['llm_calls'] += 1
+            record['llm_errors'] += int(failed)
+            record['llm_s'] += seconds
+            record['prompt_tokens'] += prompt_tokens
+            record['completion_tokens'] += completion_tokens
+
+    def record_tool_call(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            record = self._stage(stage)
+            record['tool_calls'] += 1
+            record['tool_s'] += seconds
+
+    def count(self, stage: str, field: str, amount: int = 1) -> None:
+        """
+        Bumps a numeric field on a stage record (e.g. 'retries').
+        """
+        with self._lock:
+            record = self._stage(stage)
+            record[field] = record.get(field, 0) + amount
+
+    def note(self, stage: str, **fields) -> None:
+        """
+        Sets non-numeric fields on a stage record (e.g. the model it ran on).
+        """
+        with self._lock:
+            self._stage(stage).update(fields)
+
+    def close(self, error: Exception = None) -> None:
+        """
+        Marks the run finished (or failed) and writes it to the trace log.
+        """
+        self.finished_at = time.time()
+        self.status = 'failed' if error else 'finished'
+        self.error = str(error) if error else None
+        self.write()
+
+    def summary(self) -> dict:
+        """
+        JSON-serializable view of the trace with per-stage cost and totals.
+        Stage times are also given as offsets from the start of the run.
+        """
+        with self._lock:
+            stages = [dict(record) for record in self.stages.values()]
+        for record in stages:
+            record['cost_usd'] = (record['prompt_tokens'] * PRICE_PER_MTOK_INPUT
+                                  + record['completion_tokens'] * PRICE_PER_MTOK_OUTPUT) / 1e6
+            for field in ('queued_at', 'started_at', 'finished_at'):
+                if record[field] is not None:
+                    record[field.replace('_at', '_offset_s')] = record[field] - self.started_at
+        stages.sort(key=lambda record: record['started_at'] or float('inf'))
+
+        totals = {field: sum(record[field] for record in stages)
+                  for field in ('llm_calls', 'llm_errors', 'prompt_tokens', 'completion_tokens',
+                                'tool_calls', 'tool_cache_hits', 'tool_cache_misses', 'tool_calls_blocked',
+                                'retries', 'timeouts', 'hedges', 'hedge_wins', 'fallbacks',
+                                'rate_limited', 'rate_wait_s', 'escalations',
+                                'context_tokens_raw', 'context_tokens',
+                                'cost_usd')}
+        return {
+            'run_id': self.run_id,
+            'topic': self.topic,
+            'brands': self.brands,
+            'cached': self.cached,
+            'coalesced': self.coalesced,
+            'status': self.status,
+            'error': self.error,
+            'started_at': self.started_at,
+            'wall_s': (self.finished_at or time.time()) - self.started_at,
+            'totals': totals,
+            'models': {record['stage']: record['model'] for record in stages if record['model']},
+            'stages': stages,
+        }
+
+    def write(self, path: str = None) -> None:
+        """
+        Appends the summary as one JSON line to TRACE_PATH.
+        """
+        path = path or os.getenv("TRACE_PATH", DEFAULT_TRACE_PATH)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(self.summary(), ensure_ascii=False)
+        with _write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def start_trace(topic: str, brands: list, cached: list = (), run_id: str = None):
+    """
+    Makes a new Trace current for the block, then closes it - also when the
+    block raises.
+    """
+    trace = Trace(topic, brands, cached, run_id)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.close(e)
+        raise
+    else:
+        trace.close()
+    finally:
+        current_trace.reset(token)
+
+
+def record_llm_call(prompt_tokens: int, completion_tokens: int, seconds: float, failed: bool = False) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.record_llm_call(current_stage.get(), prompt_tokens, completion_tokens, seconds, failed)
+
+
+def count(field: str, amount: int = 1) -> None:
+    """
+    Bumps a counter on the current stage of the current trace, if any.
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.count(current_stage.get(), field, amount)
+
+
+def note(**fields) -> None:
+    """
+    Sets fields on the current stage of the current trace, if any.
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.note(current_stage.get(), **fields)
+
+
+def stage_tokens() -> int:
+    """
+    Prompt plus completion tokens the current stage has used so far.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return 0
+    with trace._lock:
+        record = trace._stage(current_stage.get())
+        return record['prompt_tokens'] + record['completion_tokens']
+
+
+def traced_tool(func):
+    """
+    Records each call of an analyzer tool on the current trace. Apply it
+    under CrewAI's @tool so the tool keeps its signature and docstring.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            trace = current_trace.get()
+            if trace is not None:
+                trace.record_tool_call(current_stage.get(), time.perf_counter() - start)
+    return wrapper
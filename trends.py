@@ -0,0 +1,340 @@
+"""
+Engagement trend engine behind analyze_trends.
+
+Posts from the corpus are rolled up into sparse daily aggregates keyed by
+(hashtag, format, day) plus an hour-of-week aggregate per hashtag, stored
+as raw arrays under <corpus>/trends. A rows_seen watermark lets `refresh`
+fold in only the posts appended since the last run. Trend signals for a
+niche are then computed with array operations over the aggregates of the
+niche's hashtags - never over individual posts.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from corpus import get_corpus
+
+DAY = 86400
+
+# Signal settings: days of history looked at, the recent period compared
+# with the one before it, the trailing window behind z-scores, the z-score
+# that counts as a spike, the momentum half-lives and the hashtags that
+# define a niche
+WINDOW_DAYS = 56
+GROWTH_DAYS = 7
+ZSCORE_DAYS = 14
+SPIKE_Z = 2.5
+FAST_HALF_LIFE = 7
+SLOW_HALF_LIFE = 28
+NICHE_TAGS = 15
+NICHE_POSTS = 2000
+
+# Rows folded in per pass during a refresh
+REFRESH_CHUNK = 1_000_000
+
+# (hashtag << 32) | (format << 16) | day - day counts from the Unix epoch
+_TAG_SHIFT = 32
+_FORMAT_SHIFT = 16
+_LOW16 = 0xFFFF
+# Largest hashtag id that keeps the packed key a positive int64
+_MAX_TAG = (1 << 31) - 1
+
+AGGREGATES = {
+    'daily': ('keys', 'posts', 'engagement'),
+    'hours': ('keys', 'posts', 'engagement'),
+}
+_DTYPES = {'keys': '<i8', 'posts': '<i8', 'engagement': '<f8'}
+
+
+def _pack(tags: np.ndarray, low: np.ndarray, formats: np.ndarray = None) -> np.ndarray:
+    """
+    Aggregate keys for (hashtag, format, day) or (hashtag, hour of week).
+    Raises ValueError for a field that does not fit its bits, which would
+    silently merge unrelated rows.
+    """
+    fields = [('hashtag', tags, _MAX_TAG), ('day or hour', low, _LOW16)]
+    if formats is not None:
+        fields.append(('format', formats, _LOW16))
+    for name, values, limit in fields:
+        if len(values) and (values.min() < 0 or values.max() > limit):
+            raise ValueError(f"Trend key {name} out of range: {values.min()}..{values.max()}, expected 0..{limit}")
+    keys = tags << _TAG_SHIFT | low
+    if formats is not None:
+        keys |= formats << _FORMAT_SHIFT
+    return keys
+
+
+def _merge(keys: np.ndarray, posts: np.ndarray, engagement: np.ndarray) -> tuple:
+    """
+    Sums rows sharing a key - the one step both a refresh and a rebuild use.
+    """
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return (keys,
+            np.bincount(inverse, weights=posts, minlength=len(keys)).astype(np.int64),
+            np.bincount(inverse, weights=engagement, minlength=len(keys)))
+
+
+class TrendStore:
+    """
+    The trend aggregates for one corpus, kept current with `refresh`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, 'trends')
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.rows_seen = 0
+        self.aggregates = {name: {field: np.zeros(0, dtype=_DTYPES[field]) for field in fields}
+                           for name, fields in AGGREGATES.items()}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        meta_path = self._path('meta.json')
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        for name, fields in AGGREGATES.items():
+            for field in fields:
+                path = self._path(f'{name}.{field}.bin')
+                size = meta['sizes'][name]
+                if not os.path.exists(path) or os.path.getsize(path) != size * np.dtype(_DTYPES[field]).itemsize:
+                    # Saved while this meta.json was being replaced - fold
+                    # the corpus in again
+                    self._reset()
+                    return
+                self.aggregates[name][field] = np.fromfile(path, dtype=_DTYPES[field], count=size)
+        self.rows_seen = meta['rows_seen']
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for name, fields in AGGREGATES.items():
+            for field in fields:
+                # Write-then-rename, like the corpus arrays, so other
+                # processes never load a half-written file
+                path = self._path(f'{name}.{field}.bin')
+                self.aggregates[name][field].tofile(f'{path}.tmp')
+                os.replace(f'{path}.tmp', path)
+        tmp = self._path('meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'rows_seen': self.rows_seen,
+                       'sizes': {name: len(agg['keys']) for name, agg in self.aggregates.items()}}, f)
+        os.replace(tmp, self._path('meta.json'))
+
+    def snapshot(self) -> dict:
+        """
+        The aggregates as of the last completed fold - arrays of one
+        aggregate always have the same length.
+        """
+        with self._lock:
+            return {name: dict(agg) for name, agg in self.aggregates.items()}
+
+    def refresh(self, corpus) -> int:
+        """
+        Folds the posts added since the last refresh into the aggregates and
+        persists them. Returns how many posts were new.
+        """
+        with self._lock:
+            if self.rows_seen > len(corpus):
+                # The store was rebuilt smaller - start over
+                self._reset()
+            start = self.rows_seen
+            for chunk in range(start, len(corpus), REFRESH_CHUNK):
+                self._fold(corpus, chunk, min(chunk + REFRESH_CHUNK, len(corpus)))
+            if len(corpus) > start:
+                self.rows_seen = len(corpus)
+                self._save()
+            return len(corpus) - start
+
+    def _fold(self, corpus, start: int, end: int) -> None:
+        tag_start = corpus.column('tag_start')[start:end]
+        tag_count = corpus.column('tag_count')[start:end].astype(np.int64)
+        total = int(tag_count.sum())
+        if not total:
+            return
+
+        # Rows are appended in order, so their hashtags form one contiguous slice
+        first = int(tag_start[0])
+        tags = np.asarray(corpus.tag_ids()[first:first + total], dtype=np.int64)
+        rows = np.repeat(np.arange(start, end), tag_count)
+
+        posted_at = corpus.column('posted_at')[rows]
+        # Undated posts, and dates past the 16-bit day field (year 2149),
+        # are left out
+        dated = (posted_at > 0) & (posted_at // DAY <= _LOW16)
+        tags, rows, posted_at = tags[dated], rows[dated], posted_at[dated]
+        formats = corpus.column('format')[rows].astype(np.int64)
+        engagement = (corpus.column('likes')[rows] + corpus.column('comments')[rows]
+                      + corpus.column('shares')[rows]).astype(np.float64)
+        days = posted_at // DAY
+        hour_of_week = ((days + 3) % 7) * 24 + (posted_at % DAY) // 3600  # 1970-01-01 was a Thursday
+
+        ones = np.ones(len(tags))
+        for name, keys in [('daily', _pack(tags, days, formats)), ('hours', _pack(tags, hour_of_week))]:
+            agg = self.aggregates[name]
+            merged = _merge(
+                np.concatenate([agg['keys'], keys]),
+                np.concatenate([agg['posts'], ones]),
+                np.concatenate([agg['engagement'], engagement]),
+            )
+            self.aggregates[name] = dict(zip(AGGREGATES[name], merged))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_trend_store(corpus) -> TrendStore:
+    """
+    The up-to-date TrendStore for `corpus`, shared within the process.
+    """
+    with _stores_lock:
+        store = _stores.get(corpus.directory)
+        if store is None:
+            store = _stores[corpus.directory] = TrendStore(corpus.directory)
+    store.refresh(corpus)
+    return store
+
+
+def niche_hashtags(corpus, topic: str, limit: int = NICHE_TAGS) -> np.ndarray:
+    """
+    Hashtag ids that define the topic's niche: the hashtags of its best
+    matching posts, weighted by BM25 score.
+    """
+    docs, scores = corpus.search(topic, NICHE_POSTS)
+    if not len(docs):
+        return np.zeros(0, dtype=np.int64)
+    tags, counts = corpus.post_hashtags(docs)
+    if not len(tags):
+        return np.zeros(0, dtype=np.int64)
+    weights = np.bincount(tags, weights=np.repeat(scores, counts))
+    ranked = np.argsort(-weights)[:limit]
+    return ranked[weights[ranked] > 0]
+
+
+def _decayed(series: np.ndarray, half_life: float) -> np.ndarray:
+    # Most recent day last
+    ages = np.arange(series.shape[-1])[::-1]
+    weights = 0.5 ** (ages / half_life)
+    return (series * weights).sum(axis=-1) / weights.sum()
+
+
+def _signals(posts: np.ndarray, engagement: np.ndarray) -> dict:
+    """
+    Growth, momentum and spike signals for a [n, days] block of daily series.
+    """
+    recent = engagement[:, -GROWTH_DAYS:].sum(axis=1)
+    prior = engagement[:, -2 * GROWTH_DAYS:-GROWTH_DAYS].sum(axis=1)
+    recent_posts = posts[:, -GROWTH_DAYS:].sum(axis=1)
+    prior_posts = posts[:, -2 * GROWTH_DAYS:-GROWTH_DAYS].sum(axis=1)
+
+    # Rolling z-score of each day against the trailing ZSCORE_DAYS before it,
+    # from cumulative sums rather than a loop over windows
+    padded = np.concatenate([np.zeros((len(engagement), 1)), engagement], axis=1)
+    sums = np.cumsum(padded, axis=1)
+    squares = np.cumsum(padded ** 2, axis=1)
+    days = engagement.shape[1]
+    ends = np.arange(ZSCORE_DAYS, days)
+    mean = (sums[:, ends] - sums[:, ends - ZSCORE_DAYS]) / ZSCORE_DAYS
+    var = (squares[:, ends] - squares[:, ends - ZSCORE_DAYS]) / ZSCORE_DAYS - mean ** 2
+    z = (engagement[:, ends] - mean) / np.sqrt(np.maximum(var, 1e-9))
+    z[np.sqrt(np.maximum(var, 0)) < 1e-6] = 0.0
+    recent_z = z[:, -GROWTH_DAYS:] if z.shape[1] else np.zeros((len(engagement), 1))
+
+    slow = _decayed(engagement, SLOW_HALF_LIFE)
+    return {
+        'engagement_growth': (recent - prior) / np.maximum(prior, 1),
+        'post_growth': (recent_posts - prior_posts) / np.maximum(prior_posts, 1),
+        'recent_engagement': recent,
+        'recent_posts': recent_posts,
+        'momentum': np.divide(_decayed(engagement, FAST_HALF_LIFE), slow,
+                              out=np.zeros_like(slow), where=slow > 0),
+        'spike_z': recent_z.max(axis=1),
+        'spike_day': recent_z.argmax(axis=1) - recent_z.shape[1] + 1,  # days before the last day
+    }
+
+
+def niche_trends(topic: str, corpus=None) -> dict:
+    """
+    Trend signals for the topic's niche, or None without a corpus or a
+    matching niche:
+
+    - hashtags / formats: per-row growth of engagement and post volume over
+      the last GROWTH_DAYS vs the ones before, decay-weighted momentum
+      (fast vs slow half-life, >1 means accelerating) and the strongest
+      rolling z-score spike in the recent period
+    - best_hours / best_days: average engagement per post by UTC posting
+      hour and weekday
+    """
+    corpus = corpus or get_corpus()
+    if corpus is None:
+        return None
+    tags = niche_hashtags(corpus, topic)
+    if not len(tags):
+        return None
+    aggregates = get_trend_store(corpus).snapshot()
+
+    daily = aggregates['daily']
+    key_tags = daily['keys'] >> _TAG_SHIFT
+    rows = np.isin(key_tags, tags)
+    keys, posts, engagement = daily['keys'][rows], daily['posts'][rows], daily['engagement'][rows]
+    if not len(keys):
+        return None
+    days = keys & _LOW16
+    formats = (keys >> _FORMAT_SHIFT) & _LOW16
+    last_day = int(days.max())
+    in_window = days > last_day - WINDOW_DAYS
+    keys, posts, engagement = keys[in_window], posts[in_window], engagement[in_window]
+    day_index = (days[in_window] - (last_day - WINDOW_DAYS + 1)).astype(np.int64)
+    tag_order = np.sort(tags)
+    tag_index = np.searchsorted(tag_order, keys >> _TAG_SHIFT)
+    format_ids, format_index = np.unique(formats[in_window], return_inverse=True)
+
+    def block(index: np.ndarray, size: int, values: np.ndarray) -> np.ndarray:
+        flat = np.bincount(index * WINDOW_DAYS + day_index, weights=values, minlength=size * WINDOW_DAYS)
+        return flat.reshape(size, WINDOW_DAYS)
+
+    tag_signals = _signals(block(tag_index, len(tag_order), posts), block(tag_index, len(tag_order), engagement))
+    format_signals = _signals(block(format_index, len(format_ids), posts),
+                              block(format_index, len(format_ids), engagement))
+
+    hours = aggregates['hours']
+    rows = np.isin(hours['keys'] >> _TAG_SHIFT, tags)
+    hour_of_week = hours['keys'][rows] & _LOW16
+    by_hour = np.bincount(hour_of_week % 24, weights=hours['engagement'][rows], minlength=24)
+    posts_by_hour = np.bincount(hour_of_week % 24, weights=hours['posts'][rows], minlength=24)
+    by_day = np.bincount(hour_of_week // 24, weights=hours['engagement'][rows], minlength=7)
+    posts_by_day = np.bincount(hour_of_week // 24, weights=hours['posts'][rows], minlength=7)
+
+    def rows_of(names: list, signals: dict) -> list:
+        order = np.lexsort((-signals['recent_engagement'], -signals['momentum']))
+        return [{'name': names[i], **{field: float(values[i]) for field, values in signals.items()}}
+                for i in order if signals['recent_posts'][i] or signals['recent_engagement'][i]]
+
+    def averages(engagement: np.ndarray, posts: np.ndarray, labels: list) -> list:
+        # Ignore slots with too few posts to say anything
+        average = np.divide(engagement, posts, out=np.zeros_like(engagement), where=posts >= 3)
+        order = np.argsort(-average)
+        return [{'slot': labels[i], 'avg_engagement': float(average[i]), 'posts': int(posts[i])}
+                for i in order if average[i] > 0]
+
+    hashtags = corpus.dictionaries['hashtag']
+    format_names = corpus.dictionaries['format']
+    return {
+        'topic': topic,
+        'last_day': last_day * DAY,
+        'window_days': WINDOW_DAYS,
+        # A post carrying several of the niche's hashtags counts once per hashtag
+        'tagged_posts': int(posts.sum()),
+        'hashtags': rows_of([hashtags[i] for i in tag_order], tag_signals),
+        'formats': rows_of([format_names[i] or 'unspecified' for i in format_ids], format_signals),
+        'best_hours': averages(by_hour, posts_by_hour, [f"{hour:02d}:00" for hour in range(24)]),
+        'best_days': averages(by_day, posts_by_day, ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]),
+    }